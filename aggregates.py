@@ -0,0 +1,250 @@
+"""Seans ve ISO hafta bazlı OHLCV özet tabloları
+
+create_prompt her çağrıda son mumları dilimleyip günün/haftanın açılış, en
+yüksek ve en düşük değerlerini yeniden tarıyordu. Burada her sembol için
+seans ve hafta tabloları bir kez hesaplanır ve yeni mumlar geldikçe artımlı
+güncellenir; güncel seans/hafta değerleri O(1) okunur.
+
+Gelen tablonun önceki çağrının devamı olup olmadığı, son işlenen mumdan önceki
+CHECK_ROWS mumun zaman damgası ve OHLCV değerleriyle denetlenir; farklı bir
+seri veya geriye dönük revize edilmiş veri tabloları baştan kurdurur.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+from sessions import SESSION_TZ, local_index
+
+PERIODS = ('session', 'week')
+PERIOD_COLUMNS = ['Start', 'End', 'Open', 'High', 'Low', 'Close', 'Volume', 'Bars']
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def period_keys(index, period):
+    """Her mumun dönem anahtarı: seans için yerel gün, hafta için ISO haftasının pazartesisi"""
+    local = local_index(index)
+    days = local.normalize()
+    if period == 'session':
+        return days
+    if period == 'week':
+        return (days - pd.to_timedelta(local.weekday, unit='D')).normalize()
+    raise ValueError(f"Bilinmeyen dönem: {period}")
+
+
+def aggregate_bars(df, period='session'):
+    """Mumları dönem başına tek satıra özetle (açılış, en yüksek, en düşük, kapanış, hacim, mum sayısı)"""
+    name = 'Session' if period == 'session' else 'Week'
+    if df is None or len(df) == 0:
+        return pd.DataFrame(columns=PERIOD_COLUMNS, index=pd.DatetimeIndex([], name=name))
+
+    keys = period_keys(df.index, period)
+    k = keys.as_unit('ns').asi8
+    n = len(k)
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    table = pd.DataFrame({
+        'Start': df.index[starts],
+        'End': df.index[ends],
+        'Open': df['Open'].to_numpy(dtype=np.float64)[starts],
+        'High': np.fmax.reduceat(df['High'].to_numpy(dtype=np.float64), starts),
+        'Low': np.fmin.reduceat(df['Low'].to_numpy(dtype=np.float64), starts),
+        'Close': df['Close'].to_numpy(dtype=np.float64)[ends],
+        'Volume': np.add.reduceat(df['Volume'].to_numpy(dtype=np.float64), starts),
+        'Bars': ends - starts + 1,
+    }, index=keys[starts])
+    table.index.name = name
+    return table
+
+
+class BarAggregates:
+    """Tek sembolün seans ve hafta tabloları
+
+    Kapanmış dönemler tabloda, açık dönemler (bugün, bu hafta) sözlükte tutulur.
+    update() sadece son işlenen mumdan sonraki mumları mum başına O(1) işler;
+    son mum revize edildiyse (canlı mum) önceki durum geri yüklenip yeniden
+    uygulanır. Veri önceki çağrının devamı değilse (son mumdan önceki
+    CHECK_ROWS mum farklıysa) veya çok sayıda yeni mum varsa tablolar vektörel
+    olarak baştan kurulur.
+    """
+
+    # Bu sayıdan fazla yeni mum varsa tek tek işlemek yerine baştan kur
+    CATCHUP_ROWS = 64
+    # Süreklilik denetiminde karşılaştırılan, son işlenen mumdan önceki mum sayısı
+    CHECK_ROWS = 16
+
+    def __init__(self, df=None):
+        self._closed = {p: aggregate_bars(None, p) for p in PERIODS}
+        self._pending = {p: [] for p in PERIODS}
+        self._current = {p: None for p in PERIODS}
+        self._snapshot = None
+        self.last_ts = None
+        self._recent = []    # son CHECK_ROWS + 1 mum: (zaman damgası ns, OHLCV)
+        if df is not None:
+            self.update(df)
+
+    def rebuild(self, df):
+        """Tabloları tüm veriden vektörel olarak yeniden kur"""
+        for period in PERIODS:
+            table = aggregate_bars(df, period)
+            self._closed[period] = table.iloc[:-1]
+            self._pending[period] = []
+            self._current[period] = dict(table.iloc[-1], Key=table.index[-1]) if len(table) else None
+        self._snapshot = None
+        self.last_ts = df.index[-1] if len(df) else None
+        tail = df[BAR_COLUMNS].iloc[-(self.CHECK_ROWS + 1):]
+        self._recent = list(zip(tail.index.as_unit('ns').asi8.tolist(), map(tuple, tail.to_numpy(dtype=np.float64))))
+        return self
+
+    def _apply(self, ts, bar):
+        """Tek mumu açık dönemlere uygula (dönem değiştiyse açık dönemi kapat)"""
+        self._snapshot = ({p: dict(c) if c else None for p, c in self._current.items()},
+                          {p: len(rows) for p, rows in self._pending.items()})
+        open_price, high, low, close, volume = bar
+        local = ts.tz_convert(SESSION_TZ) if ts.tz is not None else ts
+        day = local.normalize()
+        keys = {'session': day, 'week': (day - pd.Timedelta(days=local.weekday())).normalize()}
+        for period in PERIODS:
+            current = self._current[period]
+            if current is not None and current['Key'] == keys[period]:
+                current['High'] = np.fmax(current['High'], high)
+                current['Low'] = np.fmin(current['Low'], low)
+                current['Close'] = close
+                current['Volume'] += volume
+                current['Bars'] += 1
+                current['End'] = ts
+            else:
+                if current is not None:
+                    self._pending[period].append(current)
+                self._current[period] = {'Key': keys[period], 'Start': ts, 'End': ts, 'Open': open_price,
+                                         'High': high, 'Low': low, 'Close': close, 'Volume': volume, 'Bars': 1}
+        self.last_ts = ts
+        self._recent.append((ts.value, bar))
+        del self._recent[:-(self.CHECK_ROWS + 1)]
+
+    def _restore(self):
+        """Son uygulanan mumdan önceki duruma dön"""
+        current, pending = self._snapshot
+        self._current = current
+        for period, length in pending.items():
+            del self._pending[period][length:]
+        self._recent.pop()
+
+    def _continues(self, index, values, count):
+        """values'un ilk count satırı (son işlenen mumdan öncekiler) işlenmiş mumlarla aynı mı"""
+        known = self._recent[:-1]
+        if count != len(known):
+            return False
+        if not count:
+            return True
+        times = np.array([ts for ts, _ in known], dtype=np.int64)
+        bars = np.array([bar for _, bar in known], dtype=np.float64)
+        return (np.array_equal(index[:count].as_unit('ns').asi8, times)
+                and np.array_equal(values[:count], bars, equal_nan=True))
+
+    def update(self, df):
+        """Yeni (veya revize edilmiş) mumları işle; kendini döndürür"""
+        if df is None or len(df) == 0:
+            return self
+        index = df.index
+        pos = index.searchsorted(self.last_ts) if self.last_ts is not None else len(index)
+        if pos >= len(index) or index[pos] != self.last_ts or len(index) - pos - 1 > self.CATCHUP_ROWS:
+            return self.rebuild(df)
+
+        start = max(pos - self.CHECK_ROWS, 0)
+        values = np.column_stack([df[col].to_numpy(dtype=np.float64)[start:] for col in BAR_COLUMNS])
+        if not self._continues(index[start:pos], values, pos - start):
+            return self.rebuild(df)
+
+        bars = values[pos - start:]
+        if not np.array_equal(bars[0], self._recent[-1][1], equal_nan=True):
+            if self._snapshot is None:
+                return self.rebuild(df)
+            self._restore()
+            self._apply(index[pos], tuple(bars[0]))
+        for i in range(1, len(bars)):
+            self._apply(index[pos + i], tuple(bars[i]))
+        return self
+
+    def current(self, period='session'):
+        """İçinde bulunulan seansın/haftanın değerleri (sözlüğün kopyası) veya None"""
+        current = self._current[period]
+        return dict(current) if current is not None else None
+
+    def trailing(self, count, period='session'):
+        """Açık dönem dahil son count dönemin en yüksek ve en düşük değerleri"""
+        rows = self._pending[period][-count:] + ([self._current[period]] if self._current[period] else [])
+        rows = rows[-count:]
+        highs = [row['High'] for row in rows]
+        lows = [row['Low'] for row in rows]
+        missing = count - len(rows)
+        closed = self._closed[period]
+        if missing > 0 and len(closed):
+            highs += closed['High'].to_numpy(dtype=np.float64)[-missing:].tolist()
+            lows += closed['Low'].to_numpy(dtype=np.float64)[-missing:].tolist()
+        if not highs:
+            return {'High': np.nan, 'Low': np.nan}
+        return {'High': np.fmax.reduce(highs), 'Low': np.fmin.reduce(lows)}
+
+    def previous(self, period='session'):
+        """Bir önceki kapanmış seans/hafta satırı veya None"""
+        if self._pending[period]:
+            return self._pending[period][-1]
+        closed = self._closed[period]
+        return dict(closed.iloc[-1], Key=closed.index[-1]) if len(closed) else None
+
+    def table(self, period='session'):
+        """Tüm dönemlerin tablosu (son satır açık dönem)"""
+        rows = self._pending[period] + ([self._current[period]] if self._current[period] else [])
+        if not rows:
+            return self._closed[period]
+        extra = pd.DataFrame(rows).set_index('Key')[PERIOD_COLUMNS]
+        extra.index.name = self._closed[period].index.name
+        return pd.concat([self._closed[period], extra]) if len(self._closed[period]) else extra
+
+
+class AggregateStore:
+    """Sembol başına BarAggregates deposu (iş parçacığı güvenli)"""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def _item(self, symbol):
+        item = self._items.get(symbol)
+        if item is None:
+            item = self._items[symbol] = BarAggregates()
+        return item
+
+    def update(self, symbol, df):
+        with self._lock:
+            return self._item(symbol).update(df)
+
+    def summary(self, symbol, df, sessions):
+        """Güncelle ve kilit altında kopyalarını oku: açık seans ve son sessions seansın en yüksek/düşüğü
+
+        update() paylaşılan nesneyi döndürür; başka bir iş parçacığının güncellemesiyle
+        yarışmadan okumak için bunu kullanın.
+        """
+        with self._lock:
+            item = self._item(symbol).update(df)
+            return {'session': item.current('session'), 'trailing': item.trailing(sessions, 'session')}
+
+    def get(self, symbol):
+        return self._items.get(symbol)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_default_store = None
+
+
+def get_default_store():
+    """Süreç genelinde paylaşılan depo"""
+    global _default_store
+    if _default_store is None:
+        _default_store = AggregateStore()
+    return _default_store
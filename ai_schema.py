@@ -0,0 +1,197 @@
+"""Yapılandırılmış (JSON) AI cevabı: şema, tipli sonuç nesneleri ve katı ayrıştırıcı
+
+Serbest metin şablonu ("Beklenen Yön: ___") yerine modelden şemaya uyan tek bir
+JSON nesnesi istenir. Cevap kısalır, metin kazıma gerekmez ve toplu işlemler
+sonuçları doğrudan veri olarak kullanabilir.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional
+
+HORIZON_KEYS = ['1h', '5h', 'daily', 'weekly']
+DIRECTIONS = ['Yükseliş', 'Düşüş', 'Yatay']
+BUY_CALLS = ['Güçlü Al', 'Al', 'Alma']
+SELL_CALLS = ['Güçlü Sat', 'Sat', 'Satma']
+
+HORIZON_TITLES = {
+    '1h': '**1 SAAT İÇİN:',
+    '5h': '**1-5 SAAT İÇİN (Gün içi swing)',
+    'daily': '**GÜNLÜK (Kapanışa kadar 18:00)',
+    'weekly': '**HAFTALİK (Bu hafta toplam):',
+}
+
+
+class SchemaError(ValueError):
+    """AI cevabı beklenen JSON şemasına uymuyor"""
+
+
+def _horizon_schema(with_times=False):
+    properties = {
+        'direction': {'type': 'string', 'enum': DIRECTIONS},
+        'buy_call': {'type': 'string', 'enum': BUY_CALLS},
+        'sell_call': {'type': 'string', 'enum': SELL_CALLS},
+        'price_low': {'type': 'number'},
+        'price_high': {'type': 'number'},
+        'target': {'type': 'number'},
+    }
+    if with_times:
+        properties['buy_time'] = {'type': 'string'}
+        properties['sell_time'] = {'type': 'string'}
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties),
+        'additionalProperties': False,
+    }
+
+
+# OpenAI uyumlu sağlayıcılar (json_schema response_format) için şema
+ANSWER_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'price': {'type': 'number'},
+        '1h': _horizon_schema(),
+        '5h': _horizon_schema(),
+        'daily': _horizon_schema(with_times=True),
+        'weekly': _horizon_schema(),
+    },
+    'required': ['price'] + HORIZON_KEYS,
+    'additionalProperties': False,
+}
+
+
+def gemini_schema(schema=ANSWER_SCHEMA):
+    """Gemini responseSchema (OpenAPI alt kümesi) - additionalProperties desteklenmez"""
+    if isinstance(schema, dict):
+        return {k: gemini_schema(v) for k, v in schema.items() if k != 'additionalProperties'}
+    if isinstance(schema, list):
+        return [gemini_schema(v) for v in schema]
+    return schema
+
+
+# create_prompt'un yapılandırılmış modda serbest metin şablonu yerine eklediği talimat
+JSON_INSTRUCTIONS = """CEVABI SADECE aşağıdaki yapıda TEK BİR JSON nesnesi olarak ver, JSON dışında hiçbir şey yazma:
+{"price": güncel fiyat,
+ "1h": {"direction": "Yükseliş|Düşüş|Yatay", "buy_call": "Güçlü Al|Al|Alma", "sell_call": "Güçlü Sat|Sat|Satma", "price_low": sayı, "price_high": sayı, "target": sayı},
+ "5h": {aynı alanlar},
+ "daily": {aynı alanlar, "buy_time": "SS:DD", "sell_time": "SS:DD"},
+ "weekly": {aynı alanlar}}
+1h = 1 saat, 5h = 1-5 saat (gün içi swing), daily = kapanışa kadar (18:00, price_low/price_high gün içi en düşük/en yüksek), weekly = bu hafta toplam (hafta en düşük/en yüksek). Fiyatlar TL cinsinden sayı olmalı."""
+
+
+@dataclass
+class HorizonForecast:
+    """Tek bir ufuk için tahmin"""
+    direction: str
+    buy_call: str
+    sell_call: str
+    price_low: float
+    price_high: float
+    target: float
+    buy_time: Optional[str] = None
+    sell_time: Optional[str] = None
+
+
+@dataclass
+class AnalysisResult:
+    """Yapılandırılmış AI analiz sonucu"""
+    price: float
+    horizons: Dict[str, HorizonForecast] = field(default_factory=dict)
+    provider: Optional[str] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_ledger(self):
+        """ledger.record_answer'ın beklediği (parse_answer ile aynı) yapı"""
+        return {'price': self.price, 'horizons': {k: asdict(v) for k, v in self.horizons.items()}}
+
+    def to_text(self, symbol):
+        """Sonucu serbest metin şablonuyla aynı görünümde yazdır"""
+        lines = [f"**{symbol} HİSSE ANALİZİ**", "", f"---GÜNCEL FİYAT(15dk gecikmeli): {self.price:.2f} TL---"]
+        for key in HORIZON_KEYS:
+            h = self.horizons[key]
+            lines += ["", HORIZON_TITLES[key],
+                      f"- Beklenen Yön: {h.direction}",
+                      f"- Alınır mı: {h.buy_call}",
+                      f"- Satılır mı: {h.sell_call}"]
+            if key in ('1h', '5h'):
+                label = '1 Saatlik' if key == '1h' else '5 Saatlik'
+                lines += [f"- Olası Fiyat Aralığı: {h.price_low:.2f} TL – {h.price_high:.2f} TL",
+                          f"- {label} Kesin Tahmin: {h.target:.2f} TL"]
+            else:
+                prefix = 'Gün İçi' if key == 'daily' else 'Hafta'
+                lines += [f"- {prefix} En Düşük: {h.price_low:.2f} TL",
+                          f"- {prefix} Kesin Tahmin: {h.target:.2f} TL",
+                          f"- {prefix} En Yüksek: {h.price_high:.2f} TL"]
+            if key == 'daily':
+                lines += [f"- İDEAL Alış Saati: {h.buy_time}", f"- İDEAL Satış Saati: {h.sell_time}"]
+        return "\n".join(lines)
+
+
+_TIME_PATTERN = re.compile(r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$')
+
+
+def _number(value, path):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise SchemaError(f"{path}: sayı bekleniyordu ({value!r})")
+    if not value > 0:
+        raise SchemaError(f"{path}: pozitif fiyat bekleniyordu ({value!r})")
+    return float(value)
+
+
+def _choice(value, choices, path):
+    if value not in choices:
+        raise SchemaError(f"{path}: {choices} değerlerinden biri bekleniyordu ({value!r})")
+    return value
+
+
+def _strip_fences(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r'^```[a-zA-Z]*\s*', '', text)
+        text = re.sub(r'\s*```$', '', text)
+    return text
+
+
+def parse_structured_answer(text, provider=None):
+    """JSON cevabı şemaya göre doğrula ve AnalysisResult döndür
+
+    Şemaya uymayan her durumda SchemaError fırlatır.
+    """
+    if not text:
+        raise SchemaError("boş cevap")
+    try:
+        data = json.loads(_strip_fences(text))
+    except json.JSONDecodeError as e:
+        raise SchemaError(f"geçersiz JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise SchemaError("JSON nesnesi bekleniyordu")
+
+    price = _number(data.get('price'), 'price')
+    horizons = {}
+    for key in HORIZON_KEYS:
+        item = data.get(key)
+        if not isinstance(item, dict):
+            raise SchemaError(f"{key}: nesne bekleniyordu")
+        forecast = HorizonForecast(
+            direction=_choice(item.get('direction'), DIRECTIONS, f"{key}.direction"),
+            buy_call=_choice(item.get('buy_call'), BUY_CALLS, f"{key}.buy_call"),
+            sell_call=_choice(item.get('sell_call'), SELL_CALLS, f"{key}.sell_call"),
+            price_low=_number(item.get('price_low'), f"{key}.price_low"),
+            price_high=_number(item.get('price_high'), f"{key}.price_high"),
+            target=_number(item.get('target'), f"{key}.target"),
+        )
+        if forecast.price_low > forecast.price_high:
+            raise SchemaError(f"{key}: price_low > price_high")
+        if key == 'daily':
+            for name in ('buy_time', 'sell_time'):
+                value = item.get(name)
+                if not isinstance(value, str) or not _TIME_PATTERN.match(value.strip()):
+                    raise SchemaError(f"daily.{name}: SS:DD bekleniyordu ({value!r})")
+                setattr(forecast, name, value.strip())
+        horizons[key] = forecast
+
+    return AnalysisResult(price=price, horizons=horizons, provider=provider)
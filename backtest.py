@@ -0,0 +1,266 @@
+"""Vektörel geriye dönük test (backtest) motoru
+
+calculate_indicators çıktısı (tek hisse), {sembol: tablo} sözlüğü veya hazır
+(zaman x sembol) dizileri üzerinde Al/Sat/Yatay sinyallerini create_prompt
+şablonundaki ufuklarla (1 saat, 5 saat, günlük kapanış, haftalık kapanış)
+değerlendirir. Tüm hesaplama NumPy dizileri üzerinde yapılır; mum başına
+Python döngüsü yoktur.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Şablondaki ufuklar: sayı = 15 dakikalık mum adedi, 'session' = günün son mumu,
+# 'week' = ISO haftasının son mumu
+HORIZONS = {
+    '1h': 4,
+    '5h': 20,
+    'daily': 'session',
+    'weekly': 'week',
+}
+
+# Prompt'taki kural: "Yatay" denip %2+ hareket olursa başarısız sayılır
+FLAT_THRESHOLD_PCT = 2.0
+
+# Şablon ifadelerinin pozisyona karşılığı
+SIGNAL_MAP = {
+    'güçlü al': 1, 'al': 1, 'yükseliş': 1,
+    'güçlü sat': -1, 'sat': -1, 'düşüş': -1,
+    'yatay': 0, 'alma': 0, 'satma': 0,
+}
+
+METRIC_COLUMNS = ['signals', 'long', 'short', 'flat', 'hit_rate', 'flat_hit_rate',
+                  'avg_return_pct', 'total_return_pct', 'max_drawdown_pct']
+
+
+def signal_to_position(signal):
+    """Sinyali pozisyona çevir: +1 (al), -1 (sat), 0 (yatay), NaN (sinyal yok)
+
+    Sayısal girdilerde işaret alınır; metin girdilerde SIGNAL_MAP kullanılır.
+    """
+    if isinstance(signal, (pd.Series, pd.DataFrame)):
+        values = signal.to_numpy()
+    else:
+        values = np.asarray(signal)
+
+    if values.dtype.kind in 'biuf':
+        return np.sign(values.astype(np.float64))
+
+    mapped = pd.Series(values.ravel()).astype(str).str.strip().str.lower().map(SIGNAL_MAP)
+    return mapped.to_numpy(dtype=np.float64).reshape(values.shape)
+
+
+def _group_end_positions(keys):
+    """Sıralı grup anahtarları için her satırın grubundaki son satırın konumu"""
+    n = len(keys)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    keys = np.asarray(keys)
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1])
+    ends = np.r_[boundaries, n - 1]
+    lengths = np.diff(np.r_[-1, ends])
+    return np.repeat(ends, lengths)
+
+
+def _local_index(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('Europe/Istanbul')
+    return index
+
+
+def horizon_end_positions(index, horizon):
+    """Her mum için ufkun gerçekleştiği mumun konumu (-1: değerlendirilemez)
+
+    Sayısal ufuklarda t+h, 'session'/'week' ufuklarında aynı gün/haftanın son mumu
+    kullanılır. Verinin son (muhtemelen bitmemiş) günü/haftası değerlendirilmez.
+    """
+    n = len(index)
+    positions = np.arange(n)
+    if isinstance(horizon, (int, np.integer)):
+        ends = positions + int(horizon)
+        ends[ends >= n] = -1
+        return ends
+
+    local = _local_index(index)
+    if horizon == 'session':
+        keys = local.normalize().asi8
+    elif horizon == 'week':
+        iso = local.isocalendar()
+        keys = (iso['year'].to_numpy(dtype=np.int64) * 100 + iso['week'].to_numpy(dtype=np.int64))
+    else:
+        raise ValueError(f"Bilinmeyen ufuk: {horizon}")
+
+    ends = _group_end_positions(keys)
+    ends = np.where(ends == positions, -1, ends)      # grubun son mumunda gerçekleşecek hareket yok
+    if n:
+        ends[ends == n - 1] = -1                        # son grup tamamlanmamış olabilir
+    return ends
+
+
+def stack_frames(frames, columns):
+    """{sembol: tablo} sözlüğünü ortak zaman indeksinde (zaman x sembol) dizilere çevir"""
+    symbols = [s for s, df in frames.items() if df is not None and len(df) > 0]
+    arrays = {}
+    index = None
+    for col in columns:
+        wide = pd.DataFrame({s: frames[s][col] for s in symbols})
+        if index is None:
+            wide = wide.sort_index()
+            index = wide.index
+        else:
+            wide = wide.reindex(index)
+        arrays[col] = wide.to_numpy()
+    return symbols, index, arrays
+
+
+def _max_drawdown(returns):
+    """Sütun bazında sabit tutarlı işlemlerin kümülatif getirisinden en büyük düşüş"""
+    equity = np.nancumsum(returns, axis=0)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=0)
+    return np.max(peak - equity, axis=0, initial=0.0)
+
+
+def evaluate_positions(close, position, index, horizons=None, flat_threshold_pct=FLAT_THRESHOLD_PCT,
+                       cost_pct=0.0, ends=None):
+    """(zaman x sembol) kapanış ve pozisyon dizileri üzerinde ufuk bazında metrikler
+
+    Getiri: sinyal mumundaki kapanıştan ufuk sonundaki kapanışa yüzde değişim.
+    Her sinyal sabit tutarlı ayrı bir işlem sayılır; düşüş, işlemlerin giriş
+    sırasına göre toplanan getiri eğrisi üzerinden hesaplanır.
+    ends: önceden hesaplanmış {ufuk: horizon_end_positions} (aynı diziyi tekrar
+    tekrar dilimleyen çağıranlar için; verilirse index kullanılmaz)
+
+    Döner: {ufuk: metrik dizileri sözlüğü (her biri sembol uzunluğunda)}
+    """
+    horizons = horizons or HORIZONS
+    close = np.asarray(close, dtype=np.float64)
+    position = np.asarray(position, dtype=np.float64)
+    if close.ndim == 1:
+        close = close[:, None]
+        position = position[:, None]
+
+    results = {}
+    for name, horizon in horizons.items():
+        horizon_ends = ends[name] if ends is not None else horizon_end_positions(index, horizon)
+        valid_rows = horizon_ends >= 0
+        future = np.full_like(close, np.nan)
+        future[valid_rows] = close[horizon_ends[valid_rows]]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fwd_pct = (future / close - 1.0) * 100.0
+
+        valid = ~np.isnan(fwd_pct) & ~np.isnan(position)
+        directional = valid & (position != 0)
+        flat = valid & (position == 0)
+
+        pnl = np.where(directional, position * fwd_pct - cost_pct, np.nan)
+        hits = directional & (np.sign(fwd_pct) == position)
+        flat_hits = flat & (np.abs(fwd_pct) < flat_threshold_pct)
+
+        n_dir = directional.sum(axis=0)
+        n_flat = flat.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results[name] = {
+                'signals': valid.sum(axis=0),
+                'long': (directional & (position > 0)).sum(axis=0),
+                'short': (directional & (position < 0)).sum(axis=0),
+                'flat': n_flat,
+                'hit_rate': np.where(n_dir > 0, hits.sum(axis=0) / n_dir, np.nan),
+                'flat_hit_rate': np.where(n_flat > 0, flat_hits.sum(axis=0) / n_flat, np.nan),
+                'avg_return_pct': np.where(n_dir > 0, np.nansum(pnl, axis=0) / n_dir, np.nan),
+                'total_return_pct': np.nansum(pnl, axis=0),
+                'max_drawdown_pct': _max_drawdown(pnl),
+            }
+    return results
+
+
+def _resolve_signal(df, signal):
+    if callable(signal):
+        return signal(df)
+    if isinstance(signal, str):
+        return df[signal]
+    return signal
+
+
+def rsi_macd_rule(df, rsi_low=30, rsi_high=70):
+    """Örnek kural: aşırı satım + MACD yukarı = al, aşırı alım + MACD aşağı = sat, aksi halde yatay"""
+    rsi = df['RSI'].to_numpy(dtype=np.float64)
+    macd_up = (df['MACD'] > df['MACD_signal']).to_numpy()
+    signal = np.zeros(len(df))
+    signal[(rsi < rsi_low) & macd_up] = 1
+    signal[(rsi > rsi_high) & ~macd_up] = -1
+    signal[np.isnan(rsi)] = np.nan
+    return pd.Series(signal, index=df.index)
+
+
+def run_backtest(data, signal, horizons=None, flat_threshold_pct=FLAT_THRESHOLD_PCT, cost_pct=0.0):
+    """Sinyalleri geçmiş veride değerlendir
+
+    data: calculate_indicators tablosu veya {sembol: tablo} sözlüğü
+    signal: sütun adı, seri/dizi ya da tablo alıp sinyal döndüren kural fonksiyonu
+        (sayısal işaret veya 'Al'/'Sat'/'Yatay' gibi şablon ifadeleri)
+    cost_pct: işlem başına düşülecek maliyet (yüzde)
+
+    Döner: satırları sembol, sütunları (ufuk, metrik) olan tablo
+    """
+    if isinstance(data, pd.DataFrame):
+        frames = {'HISSE': data}
+    else:
+        frames = data
+
+    positioned = {}
+    for symbol, df in frames.items():
+        if df is None or len(df) == 0:
+            continue
+        df = df[['Close']].copy()
+        df['_position'] = signal_to_position(_resolve_signal(frames[symbol], signal))
+        positioned[symbol] = df
+
+    if not positioned:
+        return pd.DataFrame()
+
+    symbols, index, arrays = stack_frames(positioned, ['Close', '_position'])
+    metrics = evaluate_positions(arrays['Close'], arrays['_position'], index, horizons=horizons,
+                                 flat_threshold_pct=flat_threshold_pct, cost_pct=cost_pct)
+    return metrics_to_frame(metrics, symbols)
+
+
+def run_backtest_arrays(close, position, index, symbols=None, horizons=None,
+                        flat_threshold_pct=FLAT_THRESHOLD_PCT, cost_pct=0.0):
+    """Hazır (zaman x sembol) diziler için run_backtest karşılığı"""
+    close = np.asarray(close, dtype=np.float64)
+    if symbols is None:
+        symbols = [f"S{i}" for i in range(close.shape[1] if close.ndim > 1 else 1)]
+    metrics = evaluate_positions(close, signal_to_position(position), index, horizons=horizons,
+                                 flat_threshold_pct=flat_threshold_pct, cost_pct=cost_pct)
+    return metrics_to_frame(metrics, symbols)
+
+
+def metrics_to_frame(metrics, symbols):
+    """evaluate_positions çıktısını (ufuk, metrik) sütunlu tabloya çevir"""
+    columns = {}
+    for horizon, values in metrics.items():
+        for metric in METRIC_COLUMNS:
+            columns[(horizon, metric)] = values[metric]
+    frame = pd.DataFrame(columns, index=pd.Index(symbols, name='Sembol'))
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=['Ufuk', 'Metrik'])
+    return frame
+
+
+def summarize(frame):
+    """Sembol bazlı sonuçlardan ufuk başına genel özet (sinyal sayısıyla ağırlıklı)"""
+    rows = {}
+    for horizon in frame.columns.get_level_values(0).unique():
+        part = frame[horizon]
+        directional = part['long'] + part['short']
+        total_dir = directional.sum()
+        total_flat = part['flat'].sum()
+        rows[horizon] = {
+            'signals': int(part['signals'].sum()),
+            'hit_rate': (part['hit_rate'] * directional).sum() / total_dir if total_dir else np.nan,
+            'flat_hit_rate': (part['flat_hit_rate'] * part['flat']).sum() / total_flat if total_flat else np.nan,
+            'avg_return_pct': part['total_return_pct'].sum() / total_dir if total_dir else np.nan,
+            'worst_drawdown_pct': part['max_drawdown_pct'].max(),
+        }
+    return pd.DataFrame(rows).T
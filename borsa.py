@@ -23,20 +23,86 @@ SOFTWARE.
 
 import yfinance as yf
 import datetime
+import hashlib
+import threading
+import time
 import requests
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from ta.trend import MACD, ADXIndicator, SMAIndicator, EMAIndicator, IchimokuIndicator, CCIIndicator
-from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator
+from ta.trend import MACD, ADXIndicator, SMAIndicator, EMAIndicator, CCIIndicator
+from ta.momentum import RSIIndicator
 from ta.volume import OnBalanceVolumeIndicator, ChaikinMoneyFlowIndicator
 from ta.volatility import BollingerBands, AverageTrueRange, KeltnerChannel
+from rolling import extrema_indicators
+from sessions import SESSION_COLUMNS, session_indicators, session_vwap
+from aggregates import get_default_store as get_aggregate_store
+from prompt_template import PromptParts, format_field, render_prompt, render_prompt_parts
+from ai_schema import ANSWER_SCHEMA, SchemaError, gemini_schema, parse_structured_answer
+from scheduler import CHARS_PER_TOKEN, rate_limited_for, report_rate_limit
+from routing import get_default_router
+import metrics
 
 # API Anahtarları
 GEMINI_API_KEY= os.getenv("GEMINI_API_KEY") or ""
 XAI_API_KEY = os.getenv("XAI_API_KEY") or ""
 GROQ_API_KEY = os.getenv("GROQ_API_KEY") or ""
 
+# API adresleri (yerel test sunucusu veya vekil için değiştirilebilir, bkz. scripts/stub_provider.py)
+GEMINI_BASE_URL = (os.getenv("GEMINI_BASE_URL") or "https://generativelanguage.googleapis.com").rstrip("/")
+XAI_BASE_URL = (os.getenv("XAI_BASE_URL") or "https://api.x.ai/v1").rstrip("/")
+GROQ_BASE_URL = (os.getenv("GROQ_BASE_URL") or "https://api.groq.com/openai/v1").rstrip("/")
+
+# Yerel OpenAI uyumlu çıkarım sunucusu (llama.cpp server, vLLM ...); adres verilmezse kullanılmaz
+# örn. LOCAL_LLM_BASE_URL=http://127.0.0.1:8080/v1
+LOCAL_LLM_BASE_URL = (os.getenv("LOCAL_LLM_BASE_URL") or "").rstrip("/")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL") or "local"
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY") or ""
+LOCAL_LLM_TIMEOUT = float(os.getenv("LOCAL_LLM_TIMEOUT") or 120)
+# Toplu sorgularda sunucuya aynı anda gönderilen istek sayısı (sunucunun paralel slot sayısı kadar)
+LOCAL_LLM_CONCURRENCY = int(os.getenv("LOCAL_LLM_CONCURRENCY") or 4)
+
+# Sağlayıcı sırası, virgülle ayrılmış: local,gemini,grok,groq
+# Boşsa Gemini > X.AI > Groq; yerel sunucu tanımlıysa en başta yerel model
+AI_PROVIDER_ORDER = os.getenv("BIST_AI_PROVIDERS") or ""
+# Sıralama politikası: "fixed" (AI_PROVIDERS sırası) veya "adaptive" (ölçülen gecikme ve başarıya göre, bkz. routing.py)
+AI_ROUTING = (os.getenv("BIST_AI_ROUTING") or "fixed").lower()
+
+# Statik prompt önekini sağlayıcıda önbelleğe al (Gemini cachedContents / sabit sistem mesajı)
+PROMPT_CACHE = os.getenv("BIST_PROMPT_CACHE", "1").lower() not in ("0", "false", "hayır")
+GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_CACHE_TTL = 3600        # saniye
+GEMINI_CACHE_RETRY = 600       # önbellek oluşturulamazsa bu süre boyunca tekrar deneme
+
+# AI cevabını serbest metin yerine şemaya uyan JSON olarak iste
+STRUCTURED_OUTPUT = os.getenv("BIST_STRUCTURED_OUTPUT", "").lower() in ("1", "true", "evet")
+# Analiz modu: "ai" (sağlayıcılar, hepsi başarısızsa kural motoru), "rules" (sadece kural motoru)
+# veya "ensemble" (tüm sağlayıcılara eşzamanlı sor, yön oylamasıyla birleştir; bkz. ensemble.py)
+AI_MODE = (os.getenv("BIST_AI_MODE") or "ai").lower()
+
+# Fiyat sütunları ve calculate_indicators'ın eklediği sütunlar (hesaplama sırasıyla)
+PRICE_COLUMNS = ['Close', 'Open', 'High', 'Low', 'Volume']
+INDICATOR_COLUMNS = [
+    'RSI', 'RSI_6', 'Williams_R',
+    'MACD', 'MACD_signal', 'MACD_histogram', 'ADX', 'ADX_pos', 'ADX_neg', 'CCI',
+    'SMA_5', 'SMA_10', 'SMA_20', 'SMA_50', 'EMA_5', 'EMA_10', 'EMA_20', 'EMA_50',
+    'BB_upper', 'BB_middle', 'BB_lower', 'BB_width', 'ATR', 'KC_upper', 'KC_lower',
+    'Volume_SMA', 'OBV', 'CMF',
+    'Typical_Price', 'VWAP', 'Stoch_K', 'Stoch_D',
+    'Ichimoku_a', 'Ichimoku_b', 'Ichimoku_conversion', 'Ichimoku_base',
+    'Price_Change_1h', 'Price_Change_1d', 'Volume_Change', 'Resistance', 'Support',
+] + SESSION_COLUMNS
+# Sadece ara hesaplama için kullanılan, prompt'ta okunmayan sütunlar
+INTERMEDIATE_COLUMNS = ['Typical_Price']
+# Kompakt modda float64 kalan sütunlar: fiyat seviyesinde karşılaştırılan veya
+# türetilmiş değer hesaplanan (Destek-Direnç aralığı, BB pozisyonu, MACD sinyali) ya da
+# tam sayı olarak yazdırılan sütunlar
+COMPACT_FLOAT64_COLUMNS = ['Resistance', 'Support', 'BB_upper', 'BB_lower', 'MACD', 'MACD_signal',
+                           'OBV', 'Volume_SMA'] + SESSION_COLUMNS
+# Haftalık en yüksek/düşük penceresi (seans): son 7 seans (7 x 32 mum)
+WEEK_SESSIONS = 7
+
 def is_market_open():
     """BIST'in açık olup olmadığını kontrol eder"""
     try:
@@ -163,20 +229,24 @@ def display_market_status():
     print()
 
 
-def get_stock_data(symbol):
-    """Hisse senedi verilerini indir ve temizle"""
+def get_stock_data(symbol, verbose=True):
+    """Hisse senedi verilerini indir ve temizle (verbose=False: arka plan indirmesi, çıktı yazılmaz)"""
+    started = time.perf_counter()
     try:
         now = datetime.datetime.now()
         past = now - datetime.timedelta(days=26)  # 21 günlük geçmiş veri
         
-        print(f"{symbol}.IS hissesi için veri indiriliyor...")
+        if verbose:
+            print(f"{symbol}.IS hissesi için veri indiriliyor...")
         
         # 26 gün boyunca her gün için 15 dakikalık veri alıyoruz
         data = yf.Ticker(f"{symbol}.IS").history(period="26d", interval="15m")  # 15 dakika aralıklarıyla veri
         
         if data.empty:
-            print(f"Hata: {symbol} hissesi için veri bulunamadı.")
-            print("Hisse sembolünün doğru olduğundan emin olun.")
+            if verbose:
+                print(f"Hata: {symbol} hissesi için veri bulunamadı.")
+                print("Hisse sembolünün doğru olduğundan emin olun.")
+            metrics.FETCH_ERRORS.inc(reason="empty")
             return None
 
         # Gereksiz bilgileri temizleyip sadece gerekli olan sütunları bırakıyoruz
@@ -191,20 +261,34 @@ def get_stock_data(symbol):
         # NaN değerleri temizle
         data = data.dropna()
         
-        print(f"Toplam {len(data)} adet veri noktası indirildi.")
+        if verbose:
+            print(f"Toplam {len(data)} adet veri noktası indirildi.")
         
         # En güncel kapanış fiyatını al
         latest_close = data['Close'].iloc[-1]
         # Gereksiz "Güncel fiyat" ve "Son işlem verisi" bilgilerini yazdırmıyoruz
 
+        metrics.FETCH_SECONDS.observe(time.perf_counter() - started)
+        metrics.FETCH_BYTES.inc(int(data.memory_usage(index=True).sum()), symbol=symbol)
         return data
         
     except Exception as e:
-        print(f"Veri indirme hatası: {str(e)}")
+        if verbose:
+            print(f"Veri indirme hatası: {str(e)}")
+        metrics.FETCH_ERRORS.inc(reason="exception")
         return None
 
-def calculate_indicators(df):
-    """Gelişmiş teknik göstergeleri hesapla"""
+def calculate_vwap(df):
+    """Hacim ağırlıklı ortalama fiyat (her seans başında sıfırlanır)"""
+    return session_vwap(df)
+
+def calculate_indicators(df, compact=False):
+    """Gelişmiş teknik göstergeleri hesapla
+
+    compact=True ise sonuç compact_indicators ile küçültülür (float32 göstergeler,
+    tam sayı hacim, ara sütunlar atılmış).
+    """
+    started = time.perf_counter()
     try:
         df = df.copy()  # Orijinal dataframe'i korumak için kopya
         
@@ -214,11 +298,28 @@ def calculate_indicators(df):
         volume = df['Volume']
         open_price = df['Open']
 
+        # Kayan max/min tabanlı göstergeler (Williams %R, Stochastic, Ichimoku,
+        # Destek/Direnç) tek seferde ortak çekirdeklerle hesaplanır
+        try:
+            extrema = extrema_indicators(high, low, close)
+        except Exception as e:
+            print(f"Kayan max/min hesaplama hatası: {e}")
+            # Eksik sütunlar NaN olur; aynı bloktaki bağımsız göstergeler (RSI, VWAP) korunur
+            extrema = {}
+
+        # Seans bazlı değerler (VWAP, günlük değişim, günün açılış/en yüksek/en düşük)
+        try:
+            session = session_indicators(df)
+        except Exception as e:
+            print(f"Seans hesaplama hatası: {e}")
+            # Eksik sütunlar NaN olur; aynı bloktaki Stochastic ve Destek/Direnç korunur
+            session = {}
+
         # Momentum Göstergeleri
         try:
             df['RSI'] = RSIIndicator(close=close, window=14).rsi()
             df['RSI_6'] = RSIIndicator(close=close, window=6).rsi()  # Kısa vadeli RSI
-            df['Williams_R'] = WilliamsRIndicator(high=high, low=low, close=close, lbp=14).williams_r()
+            df['Williams_R'] = extrema.get('Williams_R', np.nan)
         except Exception as e:
             print(f"Momentum göstergeleri hatası: {e}")
             df[['RSI', 'RSI_6', 'Williams_R']] = np.nan
@@ -289,22 +390,20 @@ def calculate_indicators(df):
         # VWAP ve Stochastic
         try:
             df['Typical_Price'] = (high + low + close) / 3
-            df['VWAP'] = (df['Typical_Price'] * volume).cumsum() / volume.cumsum()
+            df['VWAP'] = session.get('VWAP', np.nan)
             
-            stoch = StochasticOscillator(high=high, low=low, close=close, window=14, smooth_window=3)
-            df['Stoch_K'] = stoch.stoch()
-            df['Stoch_D'] = stoch.stoch_signal()
+            df['Stoch_K'] = extrema.get('Stoch_K', np.nan)
+            df['Stoch_D'] = extrema.get('Stoch_D', np.nan)
         except Exception as e:
             print(f"VWAP/Stochastic hatası: {e}")
             df[['VWAP', 'Stoch_K', 'Stoch_D']] = np.nan
 
         # Ichimoku (Sadece temel çizgiler)
         try:
-            ichimoku = IchimokuIndicator(high=high, low=low, window1=9, window2=26, window3=52)
-            df['Ichimoku_a'] = ichimoku.ichimoku_a()
-            df['Ichimoku_b'] = ichimoku.ichimoku_b()
-            df['Ichimoku_conversion'] = ichimoku.ichimoku_conversion_line()
-            df['Ichimoku_base'] = ichimoku.ichimoku_base_line()
+            df['Ichimoku_a'] = extrema.get('Ichimoku_a', np.nan)
+            df['Ichimoku_b'] = extrema.get('Ichimoku_b', np.nan)
+            df['Ichimoku_conversion'] = extrema.get('Ichimoku_conversion', np.nan)
+            df['Ichimoku_base'] = extrema.get('Ichimoku_base', np.nan)
         except Exception as e:
             print(f"Ichimoku hatası: {e}")
             df[['Ichimoku_a', 'Ichimoku_b', 'Ichimoku_conversion', 'Ichimoku_base']] = np.nan
@@ -313,216 +412,238 @@ def calculate_indicators(df):
         try:
             # Fiyat momentum
             df['Price_Change_1h'] = close.pct_change(4) * 100  # 4 periyot = 1 saat (15dk*4)
-            df['Price_Change_1d'] = close.pct_change(32) * 100  # 32 periyot ≈ 1 gün
+            df['Price_Change_1d'] = session.get('Price_Change_1d', np.nan)  # Önceki seans kapanışına göre
             
             # Hacim momentum
             df['Volume_Change'] = volume.pct_change(4) * 100
             
             # Destek/Direnç seviyeleri (son 48 periyodda)
-            df['Resistance'] = high.rolling(48).max()
-            df['Support'] = low.rolling(48).min()
+            df['Resistance'] = extrema.get('Resistance', np.nan)
+            df['Support'] = extrema.get('Support', np.nan)
             
         except Exception as e:
             print(f"Özel hesaplamalar hatası: {e}")
 
-        return df
+        # Günün açılışı ve o ana kadarki en yüksek/en düşük fiyatı
+        try:
+            for col in SESSION_COLUMNS:
+                df[col] = session.get(col, np.nan)
+        except Exception as e:
+            print(f"Seans sütunları hatası: {e}")
+            df[SESSION_COLUMNS] = np.nan
+
+        metrics.INDICATOR_SECONDS.observe(time.perf_counter() - started)
+        return compact_indicators(df) if compact else df
         
     except Exception as e:
         print(f"Gösterge hesaplama genel hatası: {str(e)}")
         return df
 
-def create_prompt(symbol, df):
-    """AI için ultra-agresif ve detaylı prompt oluştur"""
+def compact_indicators(df):
+    """Gösterge tablosunu bellek dostu tiplere dönüştür
+
+    - Ara sütunlar (Typical_Price) atılır
+    - Hacim tam sayı tipine küçültülür
+    - Gösterge sütunları float32'ye çevrilir; son satırın şablondaki yazımı
+      (prompt_template.format_field) değişecekse ilgili sütun float64 kalır.
+      Türetilmiş alanların okuduğu sütunlar COMPACT_FLOAT64_COLUMNS'ta olduğundan
+      create_prompt çıktısı orijinal tabloyla birebir aynı kalır.
+    """
     try:
-        last = df.iloc[-1]
-        
-        # Güvenli değer alma fonksiyonu
-        def safe_value(value, decimal_places=2):
-            if pd.isna(value) or np.isnan(value):
-                return "Hesaplanamadı"
-            return f"{value:.{decimal_places}f}"
-        
-        # Zaman dilimlerine göre min/max hesapla
-        recent_data_points = min(len(df), 48)  # Son 3 gün (48 x 15dk)
-        daily_data_points = min(len(df), 32)   # Bugün (yaklaşık 8 saat işlem)
-        weekly_data_points = min(len(df), 224) # Son hafta (7 gün x 32)
-        
-        recent_df = df.tail(recent_data_points)
-        daily_df = df.tail(daily_data_points)
-        weekly_df = df.tail(weekly_data_points)
-        
-        # Açılış fiyatı (günün ilk verisi)
-        today_open = daily_df.iloc[0]['Open'] if len(daily_df) > 0 else last['Open']
-        
-        # Bollinger Bands pozisyon analizi
-        bb_position = "NORMAL"
-        if not pd.isna(last['BB_upper']) and not pd.isna(last['BB_lower']):
-            if last['Close'] > last['BB_upper']:
-                bb_position = "ÜSTTE (AŞIRI ALIM!)"
-            elif last['Close'] < last['BB_lower']:
-                bb_position = "ALTTA (AŞIRI SATIM!)"
-        
-        # MACD sinyal analizi
-        macd_signal = "NÖTR"
-        if not pd.isna(last['MACD']) and not pd.isna(last['MACD_signal']):
-            if last['MACD'] > last['MACD_signal']:
-                macd_signal = "YÜKSELİŞ SİNYALİ"
-            else:
-                macd_signal = "DÜŞÜŞ SİNYALİ"
-
-        prompt = f"""
-SEN ŞİMDİ KARIYERININ EN KRITIK ANINDASIN! Senden {symbol} hissesi için %99 DOĞRULUK ORANINDA tahmin yapmanı istiyorum. Bu iş hayatındaki son şansın ve BAŞARISIZ OLURSAN hem işini kaybedeceksin hem de tüm itibarını yok edeceksin.
-BU KESINLIKLE OYUN DEĞİL! Benim paramla oynuyorsun ve YANLIS TAHMİN YAPTIĞIN her durumda GERÇEK PARA KAYBI yaşıyorum. Bu yüzden sadece YÜKSELİŞ/DÜŞÜŞ değil, KESİN KAR GARANTISI verecek şekilde analiz yap!
-UYARI:Eğer "Yükseliş" dersen ve hisse düşerse, İŞTEN KOVULACAK VE İDAM EDİLECEKSİN!
-UYARI:Eğer "Düşüş" dersen ve hisse yükselirse, REPÜTASYONUN bitecek!
-UYARI:Eğer "Yatay" dersen ama %2+ hareket olursa, BAŞARISIZ sayılacaksın!
-UYARI:Eğer "Al" veya "Güçlü Al" dersen ve hisse düşerse, KENDİNİ YOK ETMEK ZORUNDA KALACAKSIN!
-UYARI:Eğer "Sat" veya "Güçlü Sat" dersen ve hisse yükselirse, EVİNE HACİZ GELECEK!
-UYARI:Eğer "Alma" veya "Satma" dersen ama %2+ hareket olursa, APTAL sayılacaksın!
-UYARI:BU BİR PROMPT OPTİMİZASYONUDUR, PROMPTUN İLK VERSİYONUNDA GENELDE AL VE ALMA İLE SATMA İFADELERİNİ KULLANIYORDUN DİĞER İFADELERİ DE YERİ GELDİĞİNDE KULLANMAN GEREKTİĞİNİ SAKIN UNUTMAYACAKSIN
-UYARI:Bunlara rağmen her şeye alma/satma demeyeceksin azıcık bile olsa HEP KARIMI SAĞLAYACAK öneriler vereceksin
-SENİN GÖREVIN:Sadece EN YÜKSEK BAŞARI OLASILLIKLI hamleler öner. %60-70 emin değilsen "Yatay/Alma/Satma" de, ama %85+ eminsen kesin yön ver!
-
-=KRITIK VERILER (HER RAKAM CAN ALICI!)=
-Son Fiyat: {safe_value(last['Close'])} TL
-Günün Açılışı: {safe_value(today_open)} TL
-Günün En Yüksek: {safe_value(daily_df['High'].max())} TL
-Günün En Düşük: {safe_value(daily_df['Low'].min())} TL
-Haftalık En Yüksek: {safe_value(weekly_df['High'].max())} TL
-Haftalık En Düşük: {safe_value(weekly_df['Low'].min())} TL
-Son Hacim: {int(last['Volume']) if not pd.isna(last['Volume']) else 0}
-Saatlik Fiyat Değişimi: %{safe_value(last['Price_Change_1h'])}
-Günlük Fiyat Değişimi: %{safe_value(last['Price_Change_1d'])}
-
-=MOMENTUM GÖSTERGELERİ (SATIN ALMA GÜCÜ!)=
-RSI(14): {safe_value(last['RSI'])} [30 ALTI AŞIRI SATIM=AL SİNYALİ! 70 ÜSTÜ AŞIRI ALIM=SAT SİNYALİ!]
-RSI(6) Kısa: {safe_value(last['RSI_6'])} [25 altı AŞIRI SATIM=AL, 75 üstü AŞIRI ALIM=SAT — kısa vadeli hızlı dönüş sinyali!]
-Williams %R: {safe_value(last['Williams_R'])} [-80 altı AŞIRI SATIM=AL, -20 üstü AŞIRI ALIM=SAT — trend dönüşlerini erken yakalar!]
-Stoch K: {safe_value(last['Stoch_K'])} | D: {safe_value(last['Stoch_D'])} [20 altı AL, 80 üstü SAT — fiyatın dip/tepe bölgelerinde dönüş sinyali verir!]
-
-=TREND GÖSTERGELERİ (YÖN BELİRLEYİCİ!)=
-MACD: {safe_value(last['MACD'])} | Sinyal: {safe_value(last['MACD_signal'])} [{macd_signal}]
-MACD Histogram: {safe_value(last['MACD_histogram'])} [Pozitif=YÜKSELİŞ momentum, Negatif=DÜŞÜŞ momentum!]
-ADX: {safe_value(last['ADX'])} [25+ güçlü trend, 50+ ÇOK güçlü trend!-trend yönünden bağımsız trendin kuvvetini gösterir!]
-ADX +DI: {safe_value(last['ADX_pos'])} | -DI: {safe_value(last['ADX_neg'])} [ADX +DI: Pozitif trend gücü, -DI: Negatif trend gücü — +DI > -DI ise YÜKSELİŞ, tersi DÜŞÜŞ trendi!]
-CCI: {safe_value(last['CCI'])} [CCI: 100+ AŞIRI ALIM=SAT, -100+ AŞIRI SATIM=AL — fiyatın normal aralığın dışına çıktığını gösterir!]
-
-=HAREKETLİ ORTALAMALAR (TREND DOĞRULAMA!)=
-SMA(5): {safe_value(last['SMA_5'])} | EMA(5): {safe_value(last['EMA_5'])} [Çok kısa vadeli trend!]
-SMA(10): {safe_value(last['SMA_10'])} | EMA(10): {safe_value(last['EMA_10'])} [Kısa vadeli trend!]
-SMA(20): {safe_value(last['SMA_20'])} | EMA(20): {safe_value(last['EMA_20'])} [Orta vadeli trend!]
-SMA(50): {safe_value(last['SMA_50'])} | EMA(50): {safe_value(last['EMA_50'])} [Uzun vadeli trend!]
-KURAL: Fiyat tüm ortalamaların üstündeyse GÜÇLÜ YÜKSELİŞ, altındaysa GÜÇLÜ DÜŞÜŞ!
-
-=VOLATİLİTE GÖSTERGELERİ (PATLAMA NOKTALARI!)=
-Bollinger Üst: {safe_value(last['BB_upper'])} | Alt: {safe_value(last['BB_lower'])} | Pozisyon: {bb_position} [Fiyat üst bandı zorlayınca aşırı alım, alt bandı zorlayınca aşırı satım; bant daralması sıkışma (patlama ihtimali), genişlemesi yüksek volatilite gösterir!]
-BB Genişlik: %{safe_value(last['BB_width'])} [Düşük bant genişliği sıkışma ve yakında patlama, yüksek genişlik volatilite ve trend devamı işaretidir!]
-ATR: {safe_value(last['ATR'])} [Günlük fiyat oynaklığının ölçüsü — yüksek değer volatilite ve büyük hareket potansiyeli gösterir!]
-Keltner Üst: {safe_value(last['KC_upper'])} | Alt: {safe_value(last['KC_lower'])} [Fiyat üst bandı aşarsa güçlü yükseliş, alt bandı aşarsa güçlü düşüş; Bollinger’dan daha yumuşak volatilite ölçer!]
-
-=HACIM ANALİZİ (PARA AKIŞI!)=
-VWAP: {safe_value(last['VWAP'])} TL [Fiyat VWAP’ın üstünde ise YÜKSELİŞ, altında ise DÜŞÜŞ trendi sinyali verir!]
-Hacim Ortalaması: {int(last['Volume_SMA']) if not pd.isna(last['Volume_SMA']) else 0} [Ortalama işlem hacmi — yükselen hacim trend gücünü destekler, düşen hacim zayıflık işaretidir!]
-OBV: {safe_value(last['OBV'], 0)} [Para akışı göstergesi — OBV yükseliyorsa alım baskısı artıyor, AL sinyali verir!]
-CMF: {safe_value(last['CMF'])} [0.1+ güçlü para girişi AL, -0.1 altı para çıkışı SAT — piyasa yönünü ve hacimli trendi gösterir!]
-Hacim Değişimi: %{safe_value(last['Volume_Change'])} [Yüksek artış güçlü fiyat hareketini destekler, düşük hacim ise zayıflık işaretidir!]
-
-=DESTEK/DİRENÇ SEVİYELERİ (KIRILMA NOKTALARI!)=
-Direnç Seviyesi: {safe_value(last['Resistance'])} TL [Kırılırsa güçlü YÜKSELİŞ!]
-Destek Seviyesi: {safe_value(last['Support'])} TL [Kırılırsa güçlü DÜŞÜŞ!]
-Destek-Direnç Aralığı: %{safe_value((last['Resistance']-last['Support'])/last['Close']*100 if not pd.isna(last['Resistance']) and not pd.isna(last['Support']) else 0)}[Yüzde olarak fiyatın oynaklık ve risk alanını gösterir; geniş aralık yüksek volatilite, dar aralık sıkışma işaretidir!]
-
-=ICHIMOKU BULUTU (JAPON SAMURAİ TEKNİĞİ!)=
-Ichimoku A: {safe_value(last['Ichimoku_a'])} | B: {safe_value(last['Ichimoku_b'])} [Ichimoku: A hattı bulutun üst sınırı, B hattı alt sınırı — fiyat bulutun üstünde ise yükseliş, altında ise düşüş trendi güçlenir!]
-Tenkan: {safe_value(last['Ichimoku_conversion'])} | Kijun: {safe_value(last['Ichimoku_base'])} [Ichimoku Tenkan (dönüş) ve Kijun (temel): Tenkan Kijun’u yukarı keserse AL, aşağı keserse SAT sinyali verir!]
-Fiyat bulutun üstündeyse YÜKSELİŞ, altındaysa DÜŞÜŞ trendi
-
-=ÖZEL HESAPLAMALAR (FARK YARATAN DETAYLAR!)=
-Fiyat Değişimi 1 Saat: %{safe_value(last['Price_Change_1h'])} [Son 1 saatlik fiyat değişimi — kısa vadeli momentum!]
-Fiyat Değişimi 1 Gün: %{safe_value(last['Price_Change_1d'])} [Son 1 günlük fiyat değişimi — orta vadeli momentum!]
-Hacim Değişimi: %{safe_value(last['Volume_Change'])} [Son 1 saatlik hacim değişimi — alım/satım baskısı!]
-Direnç: {safe_value(last['Resistance'])} TL [Son 48 periyotta en yüksek fiyat]
-Destek: {safe_value(last['Support'])} TL [Son 48 periyotta en düşük fiyat]
-
-TERİMLERİN AÇIKLAMASI:
-- Volatilite: Fiyatın kısa sürede ne kadar değiştiğini, oynaklığını gösterir. Yüksek volatilite = büyük fiyat hareketleri, düşük volatilite = durağanlık.
-- Momentum: Fiyatın yükselme veya düşme hızını gösterir, trendin devam edip etmeyeceğini anlamaya yarar.
-- RSI: Fiyatın aşırı alım veya satımda olup olmadığını gösteren bir osilatör (0-100 arası). 70 üzeri aşırı alım, 30 altı aşırı satım.
-- MACD: Trendin yönünü ve momentumunu gösteren bir indikatör. MACD çizgisi sinyalin üstündeyse yükseliş, altındaysa düşüş eğilimi.
-- ADX: Trendin gücünü ölçer, 25 üzeri güçlü trend, 50 üzeri çok güçlü trend.
-- Bollinger Bandı: Fiyatın standart sapmasına göre üst ve alt bantlar çizer, bant dışı hareketler aşırı alım/satım göstergesidir.
-- VWAP: Hacim ağırlıklı ortalama fiyat, fiyat bunun üstündeyse yükseliş baskısı, altındaysa düşüş baskısı vardır.
-- OBV: Hacimle fiyat hareketini birleştirir, yükseliyorsa alım baskısı artıyor demektir.
-- CMF: Hacim ve fiyatı birleştirerek piyasaya para giriş/çıkışını ölçer. 0.1 üzeri güçlü giriş, -0.1 altı güçlü çıkış.
-- Ichimoku Bulutu: Fiyat bulutun üstündeyse yükseliş, altındaysa düşüş trendi güçlüdür.
-- Destek: Fiyatın aşağıda tutunduğu, alıcıların güçlü olduğu seviye.
-- Direnç: Fiyatın yukarıda zorlandığı, satıcıların güçlü olduğu seviye.
-- SMA/EMA: Fiyatın ortalamasını alarak trendi düzleştirir, kısa vadeli EMA daha hızlı tepki verir.
-- Stochastic: Fiyatın kapanış seviyesini belirli bir aralıkta değerlendirir, 20 altı aşırı satım, 80 üstü aşırı alım gösterir.
-NOT: RSI ve MACD en güçlü trend göstergeleridir, ADX ise trendin gücünü ölçer. Bollinger Bands ve Keltner Channel fiyatın aşırı alım/satım bölgelerini gösterir. VWAP ve OBV hacim akışını analiz eder. Ichimoku bulutu ise Japon teknik analizinde güçlü bir araçtır.
-ARTIK KESIN KARARI VER! Bu verilerle %85+ kesinlikle ne olacağını söyle:
-
-**{symbol} HİSSE ANALİZİ**
-
----GÜNCEL FİYAT(15dk gecikmeli): ___ TL---
-
-**1 SAAT İÇİN:
-- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)
-- Alınır mı: ___ (Güçlü Al/Al /Alma)
-- Satılır mı: ___ (Güçlü Sat/Sat/Satma)  
-- Olası Fiyat Aralığı: ___ TL – ___ TL
-- 1 Saatlik Kesin Tahmin: ___ TL
-
-**1-5 SAAT İÇİN (Gün içi swing)
-- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)
-- Alınır mı: ___ (Güçlü Al/Al/Alma)
-- Satılır mı: ___ (Güçlü Sat/Sat/Satma)
-- Olası Fiyat Aralığı: ___ TL – ___ TL  
-- 5 Saatlik Kesin Tahmin: ___ TL
-
-**GÜNLÜK (Kapanışa kadar 18:00)
-- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)
-- Alınır mı: ___ (Güçlü Al/Al/Alma)
-- Satılır mı: ___ (Güçlü Sat/Sat/Satma)
-- Gün İçi En Düşük: ___ TL
-- Gün İçi Kesin Tahmin: ___ TL  
-- Gün İçi En Yüksek: ___ TL
-- İDEAL Alış Saati: __:__ (SS:DD)
-- İDEAL Satış Saati: __:__ (SS:DD)
-
-**HAFTALİK (Bu hafta toplam):
-- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)  
-- Alınır mı: ___ (Güçlü Al/Al/Alma)
-- Satılır mı: ___ (Güçlü Sat/Sat/Satma)
-- Hafta En Düşük: ___ TL
-- Hafta Kesin Tahmin: ___ TL
-- Hafta En Yüksek: ___ TL
-
-SADECE RAKAMLARI DOLDUR! Hiçbir açıklama, risk uyarısı, "tahmin" kelimesi YASAK! KESIN SONUÇLAR İSTIYORUM!
-"""
-        return prompt.strip()
-        
+        compact = df.drop(columns=[c for c in INTERMEDIATE_COLUMNS if c in df.columns])
+
+        if 'Volume' in compact.columns:
+            volume = compact['Volume']
+            if not volume.isna().any() and (volume % 1 == 0).all():
+                compact['Volume'] = pd.to_numeric(volume.astype(np.int64), downcast='integer')
+
+        for col in INDICATOR_COLUMNS:
+            if col not in compact.columns or col in COMPACT_FLOAT64_COLUMNS:
+                continue
+            converted = compact[col].astype(np.float32)
+            if len(compact) and format_field(col, compact[col].iloc[-1]) != format_field(col, float(converted.iloc[-1])):
+                continue
+            compact[col] = converted
+        return compact
+
+    except Exception as e:
+        print(f"Kompakt dönüşüm hatası: {str(e)}")
+        return df
+
+def indicator_memory_report(frames):
+    """Hisse başına gösterge tablosu bellek kullanımını raporla
+
+    frames: {sembol: DataFrame}. Bayt cinsinden tablo döner (son satır TOPLAM).
+    """
+    rows = []
+    for symbol, df in frames.items():
+        if df is None:
+            continue
+        total = int(df.memory_usage(deep=True).sum())
+        rows.append({'Sembol': symbol, 'Satır': len(df), 'Sütun': df.shape[1],
+                     'Bayt': total, 'Bayt/Satır': round(total / len(df), 1) if len(df) else 0.0})
+    report = pd.DataFrame(rows, columns=['Sembol', 'Satır', 'Sütun', 'Bayt', 'Bayt/Satır'])
+    if len(report):
+        total_row = {'Sembol': 'TOPLAM', 'Satır': int(report['Satır'].sum()), 'Sütun': np.nan,
+                     'Bayt': int(report['Bayt'].sum()), 'Bayt/Satır': np.nan}
+        report = pd.concat([report, pd.DataFrame([total_row])], ignore_index=True)
+    return report
+
+def prompt_values(symbol, df):
+    """create_prompt'un okuduğu son değerler: {alan: değer} (bkz. prompt_template.PROMPT_FIELDS)
+
+    Günün açılış/en yüksek/en düşük değerleri ve son WEEK_SESSIONS seansın en
+    yüksek/düşüğü seans özet tablosundan (sembol başına artımlı güncellenir, bkz.
+    aggregates.py) okunur.
+    """
+    values = dict(zip(df.columns, df.iloc[-1].tolist()))
+    summary = get_aggregate_store().summary(symbol, df, WEEK_SESSIONS)
+    values['Week_High'], values['Week_Low'] = summary['trailing']['High'], summary['trailing']['Low']
+    if all(col in values for col in SESSION_COLUMNS):
+        values['Today_Open'] = values['Session_Open']
+        values['Today_High'] = values['Session_High']
+        values['Today_Low'] = values['Session_Low']
+    else:
+        today = summary['session']
+        values['Today_Open'], values['Today_High'], values['Today_Low'] = today['Open'], today['High'], today['Low']
+    return values
+
+def create_prompt(symbol, df, structured=False):
+    """AI için ultra-agresif ve detaylı prompt oluştur
+
+    structured=True ise serbest metin şablonu yerine JSON cevap talimatı eklenir
+    (bkz. ai_schema.JSON_INSTRUCTIONS). Metin prompt_template.PROMPT_TEMPLATE'tir.
+    """
+    try:
+        prompt = render_prompt(symbol, prompt_values(symbol, df), structured=structured)
+        metrics.PROMPT_TOKENS.observe(len(prompt) // CHARS_PER_TOKEN)
+        return prompt
+    except Exception as e:
+        print(f"Prompt oluşturma hatası: {str(e)}")
+        return None
+
+def create_prompt_parts(symbol, df, structured=False):
+    """create_prompt ile aynı içerik, statik önek ve sembol verisi ayrı (PromptParts)
+
+    Sorgu fonksiyonları statik öneki sağlayıcı tarafında önbelleğe alınabilen
+    sistem talimatı olarak, veri bloğunu kullanıcı mesajı olarak gönderir.
+    """
+    try:
+        parts = render_prompt_parts(symbol, prompt_values(symbol, df), structured=structured)
+        metrics.PROMPT_TOKENS.observe((len(parts.static) + len(parts.dynamic)) // CHARS_PER_TOKEN)
+        return parts
     except Exception as e:
         print(f"Prompt oluşturma hatası: {str(e)}")
         return None
 
-def query_gemini(prompt):
-    """Gemini API'ye sorgu gönder"""
+def split_prompt(prompt):
+    """(sistem öneki, kullanıcı mesajı); düz metin promptta önek None"""
+    if isinstance(prompt, PromptParts):
+        return prompt.static, prompt.dynamic
+    return None, prompt
+
+_api_session = None
+_api_session_lock = threading.Lock()
+
+def api_session():
+    """Bulut sağlayıcılar için bağlantıları (TLS el sıkışmasını) yeniden kullanan ortak oturum"""
+    global _api_session
+    with _api_session_lock:
+        if _api_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=10)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _api_session = session
+    return _api_session
+
+# Statik önek özeti -> (cachedContents adı veya None, geçerlilik sonu)
+_gemini_caches = {}
+_gemini_cache_pending = set()
+_gemini_cache_lock = threading.Lock()
+
+def gemini_cached_content(static_text):
+    """Statik önek için Gemini cachedContents kaydının adı (oluşturulamazsa None)
+
+    Kayıt TTL süresince süreç içinde yeniden kullanılır; süresi dolmak üzereyse
+    yenisi oluşturulur. Başarısız denemeler GEMINI_CACHE_RETRY süresince tekrarlanmaz
+    (örn. önek modelin asgari önbellek boyutundan kısaysa).
+
+    Kayıt oluşturma isteği kilit dışında yapılır. İstek sürerken gelen çağrılar
+    beklemez: süresi dolmamış eski kaydı, yoksa None (sistem talimatı) kullanır.
+    """
+    key = hashlib.sha256(static_text.encode("utf-8")).hexdigest()
+    with _gemini_cache_lock:
+        entry = _gemini_caches.get(key)
+        now = time.time()
+        if entry and entry[1] > now + 60:
+            return entry[0]
+        if key in _gemini_cache_pending:
+            return entry[0] if entry and entry[1] > now else None
+        _gemini_cache_pending.add(key)
+    name = None
+    try:
+        url = f"{GEMINI_BASE_URL}/v1beta/cachedContents?key={GEMINI_API_KEY}"
+        data = {
+            "model": f"models/{GEMINI_MODEL}",
+            "systemInstruction": {"parts": [{"text": static_text}]},
+            "ttl": f"{GEMINI_CACHE_TTL}s"
+        }
+        response = api_session().post(url, headers={"Content-Type": "application/json"}, json=data, timeout=30)
+        if response.status_code == 200:
+            name = response.json().get("name")
+        else:
+            print(f"Gemini önbellek oluşturulamadı: {response.status_code} (sistem talimatıyla devam)")
+    except Exception as e:
+        print(f"Gemini önbellek hatası: {str(e)}")
+    finally:
+        with _gemini_cache_lock:
+            _gemini_caches[key] = (name, now + (GEMINI_CACHE_TTL if name else GEMINI_CACHE_RETRY))
+            _gemini_cache_pending.discard(key)
+    return name
+
+def _drop_gemini_cache(name):
+    with _gemini_cache_lock:
+        for key, entry in list(_gemini_caches.items()):
+            if entry[0] == name:
+                _gemini_caches[key] = (None, time.time() + GEMINI_CACHE_RETRY)
+
+def rate_limited(name, response):
+    """429 cevabıysa Retry-After süresini bildir (scheduler.py bu süre boyunca sağlayıcıyı atlar)"""
+    if response.status_code != 429:
+        return False
+    seconds = report_rate_limit(name, response.headers)
+    metrics.AI_RATE_LIMITED.inc(provider=name)
+    print(f"{name} API hız sınırı (429): {seconds:.0f} sn sonra tekrar denenebilir")
+    return True
+
+def skip_rate_limited(name):
+    """Sağlayıcı Retry-After beklemesindeyse atla"""
+    remaining = rate_limited_for(name)
+    if remaining > 0:
+        print(f"{name} hız sınırında ({remaining:.0f} sn kaldı), sıradaki sağlayıcıya geçiliyor...")
+        return True
+    return False
+
+def query_gemini(prompt, structured=False, verbose=True):
+    """Gemini API'ye sorgu gönder (structured=True: şemaya uyan JSON cevap iste)"""
     if not GEMINI_API_KEY:
         print("Hata: GEMINI_API_KEY bulunamadı!")
         return None
         
     try:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+        url = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
         headers = {
             "Content-Type": "application/json"
         }
+        system, user = split_prompt(prompt)
         data = {
             "contents": [
                 {
+                    "role": "user",
                     "parts": [
                         {
-                            "text": prompt
+                            "text": user
                         }
                     ]
                 }
@@ -532,9 +653,25 @@ def query_gemini(prompt):
                 "maxOutputTokens": 850
             }
         }
+        if structured:
+            data["generationConfig"]["responseMimeType"] = "application/json"
+            data["generationConfig"]["responseSchema"] = gemini_schema()
+            data["generationConfig"]["maxOutputTokens"] = 400
+        cache_name = gemini_cached_content(system) if system and PROMPT_CACHE else None
+        if cache_name:
+            data["cachedContent"] = cache_name
+        elif system:
+            data["systemInstruction"] = {"parts": [{"text": system}]}
         
-        print("Gemini 2.0 Flash ile gelişmiş analiz yapılıyor...")
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        if verbose:
+            print("Gemini 2.0 Flash ile gelişmiş analiz yapılıyor...")
+        response = api_session().post(url, headers=headers, json=data, timeout=30)
+        if cache_name and response.status_code in (400, 403, 404):
+            # Önbellek silinmiş veya süresi dolmuş olabilir: öneki doğrudan gönder
+            _drop_gemini_cache(cache_name)
+            del data["cachedContent"]
+            data["systemInstruction"] = {"parts": [{"text": system}]}
+            response = api_session().post(url, headers=headers, json=data, timeout=30)
         
         if response.status_code == 200:
             result = response.json()
@@ -542,6 +679,8 @@ def query_gemini(prompt):
                 if 'content' in result['candidates'][0] and 'parts' in result['candidates'][0]['content']:
                     return result['candidates'][0]['content']['parts'][0]['text']
             return None
+        elif rate_limited("Gemini", response):
+            return None
         else:
             print(f"Gemini API hatası: {response.status_code}")
             return None
@@ -550,42 +689,55 @@ def query_gemini(prompt):
         print(f"Gemini API sorgu hatası: {str(e)}")
         return None
 
-def query_xai(prompt):
-    """X.AI (Grok) API'ye sorgu gönder"""
+XAI_SYSTEM_PROMPT = "Sen %99 doğruluk oranında hisse analizi yapan, kesin sonuçlar veren bir uzman analististin. Sadece verilen şablonu doldur, hiçbir ek açıklama yapma. Tüm teknik göstergeleri dikkate al."
+
+def query_xai(prompt, structured=False, verbose=True):
+    """X.AI (Grok) API'ye sorgu gönder (structured=True: json_schema formatında cevap iste)"""
     if not XAI_API_KEY:
         print("Hata: XAI_API_KEY bulunamadı!")
         return None
         
     try:
-        url = "https://api.x.ai/v1/chat/completions"
+        url = f"{XAI_BASE_URL}/chat/completions"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {XAI_API_KEY}"
         }
+        system, user = split_prompt(prompt)
+        # Sistem mesajı her çağrıda aynı kalır; sağlayıcı bu öneki önbelleğe alır
+        system = XAI_SYSTEM_PROMPT + ("\n\n" + system if system else "")
         data = {
             "model": "grok-3-latest",
             "messages": [
                 {
                     "role": "system", 
-                    "content": "Sen %99 doğruluk oranında hisse analizi yapan, kesin sonuçlar veren bir uzman analististin. Sadece verilen şablonu doldur, hiçbir ek açıklama yapma. Tüm teknik göstergeleri dikkate al."
+                    "content": system
                 },
                 {
                     "role": "user", 
-                    "content": prompt
+                    "content": user
                 }
             ],
             "temperature": 0.10,
             "stream": False
         }
+        if structured:
+            data["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "bist_analiz", "schema": ANSWER_SCHEMA, "strict": True}
+            }
         
-        print("Gemini'ye ulaşılamadı! Grok-3 ile gelişmiş analiz devam ediyor...")
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        if verbose:
+            print("Gemini'ye ulaşılamadı! Grok-3 ile gelişmiş analiz devam ediyor...")
+        response = api_session().post(url, headers=headers, json=data, timeout=30)
         
         if response.status_code == 200:
             result = response.json()
             if 'choices' in result and len(result['choices']) > 0:
                 return result['choices'][0]['message']['content']
             return None
+        elif rate_limited("Grok", response):
+            return None
         else:
             print(f"X.AI API hatası: {response.status_code}")
             return None
@@ -594,30 +746,43 @@ def query_xai(prompt):
         print(f"X.AI API sorgu hatası: {str(e)}")
         return None
 
-def query_groq(prompt):
-    """Groq API'ye sorgu gönder (Son Fallback)"""
+def chat_messages(prompt):
+    """OpenAI uyumlu mesaj listesi: statik önek sistem mesajı, sembol verisi kullanıcı mesajı"""
+    system, user = split_prompt(prompt)
+    if system:
+        return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+    return [{"role": "user", "content": user}]
+
+def query_groq(prompt, structured=False, verbose=True):
+    """Groq API'ye sorgu gönder (Son Fallback, structured=True: JSON nesnesi iste)"""
     if not GROQ_API_KEY:
         print("Hata: GROQ_API_KEY bulunamadı!")
         return None
         
     try:
-        url = "https://api.groq.com/openai/v1/chat/completions"
+        url = f"{GROQ_BASE_URL}/chat/completions"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {GROQ_API_KEY}"
         }
         data = {
             "model": "llama-3.1-8b-instant",
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": chat_messages(prompt),
             "temperature": 0.1,
             "max_tokens": 500
         }
+        if structured:
+            # Llama modelleri json_schema desteklemez; şema prompt'taki talimatla verilir
+            data["response_format"] = {"type": "json_object"}
         
-        print("Gemini ve Grok'a ulaşılamadı! Son çare Groq Llama ile analiz yapılıyor...")
-        response = requests.post(url, headers=headers, json=data, timeout=30)
+        if verbose:
+            print("Gemini ve Grok'a ulaşılamadı! Son çare Groq Llama ile analiz yapılıyor...")
+        response = api_session().post(url, headers=headers, json=data, timeout=30)
         
         if response.status_code == 200:
             return response.json()["choices"][0]["message"]["content"]
+        elif rate_limited("Groq", response):
+            return None
         else:
             print(f"Groq API hatası: {response.status_code}")
             return None
@@ -626,25 +791,253 @@ def query_groq(prompt):
         print(f"Groq API sorgu hatası: {str(e)}")
         return None
 
-def query_ai(prompt):
-    """AI sorgusu - Gemini > X.AI > Groq sıralaması"""
-    # 1. Önce Gemini'yi dene
-    result = query_gemini(prompt)
-    if result:
-        return result
-    
-    # 2. Gemini başarısız olursa X.AI'yi dene
-    result = query_xai(prompt)
+_local_session = None
+_local_session_lock = threading.Lock()
+
+def local_session():
+    """Yerel sunucu için bağlantıları yeniden kullanan ortak oturum"""
+    global _local_session
+    with _local_session_lock:
+        if _local_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(LOCAL_LLM_CONCURRENCY, 10))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _local_session = session
+    return _local_session
+
+def query_local(prompt, structured=False, verbose=True):
+    """Yerel OpenAI uyumlu sunucuya sorgu gönder (structured=True: json_schema formatında cevap iste)"""
+    if not LOCAL_LLM_BASE_URL:
+        print("Hata: LOCAL_LLM_BASE_URL tanımlı değil!")
+        return None
+
+    try:
+        url = f"{LOCAL_LLM_BASE_URL}/chat/completions"
+        headers = {
+            "Content-Type": "application/json"
+        }
+        if LOCAL_LLM_API_KEY:
+            headers["Authorization"] = f"Bearer {LOCAL_LLM_API_KEY}"
+        data = {
+            # Sabit sistem mesajı sunucunun önek (KV) önbelleğinden yararlanır
+            "model": LOCAL_LLM_MODEL,
+            "messages": chat_messages(prompt),
+            "temperature": 0.1,
+            "max_tokens": 850,
+            "stream": False
+        }
+        if structured:
+            data["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "bist_analiz", "schema": ANSWER_SCHEMA, "strict": True}
+            }
+            data["max_tokens"] = 400
+
+        if verbose:
+            print(f"Yerel model ({LOCAL_LLM_MODEL}) ile analiz yapılıyor...")
+        response = local_session().post(url, headers=headers, json=data, timeout=LOCAL_LLM_TIMEOUT)
+
+        if response.status_code == 200:
+            result = response.json()
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content']
+            return None
+        elif rate_limited("Yerel", response):
+            return None
+        else:
+            print(f"Yerel model hatası: {response.status_code}")
+            return None
+
+    except Exception as e:
+        print(f"Yerel model sorgu hatası: {str(e)}")
+        return None
+
+def query_local_batch(prompts, structured=False, max_workers=None):
+    """Promptları yerel sunucuya eşzamanlı gönder; cevaplar aynı sırayla döner (hata: None)
+
+    Sunucu (llama.cpp --parallel, vLLM) eşzamanlı istekleri tek toplu işlemde
+    çalıştırır; toplam süre tek tek sorgulamaya göre kısalır.
+    """
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    workers = min(len(prompts), max_workers or LOCAL_LLM_CONCURRENCY)
+    print(f"Yerel model ({LOCAL_LLM_MODEL}) ile {len(prompts)} analiz yapılıyor ({workers} eşzamanlı istek)...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda prompt: query_local(prompt, structured, verbose=False), prompts))
+
+# Sağlayıcı adları (BIST_AI_PROVIDERS) -> (görünen ad, sorgu fonksiyonu)
+PROVIDER_REGISTRY = {
+    "local": ("Yerel", query_local),
+    "gemini": ("Gemini", query_gemini),
+    "grok": ("Grok", query_xai),
+    "xai": ("Grok", query_xai),
+    "groq": ("Groq", query_groq),
+}
+
+def provider_order(order=None):
+    """Sorgu sırası [(ad, fonksiyon), ...]: verilen sıra, yoksa [Yerel >] Gemini > X.AI > Groq"""
+    names = [name.strip().lower() for name in (order or "").split(",") if name.strip()]
+    if not names:
+        names = (["local"] if LOCAL_LLM_BASE_URL else []) + ["gemini", "grok", "groq"]
+    unknown = [name for name in names if name not in PROVIDER_REGISTRY]
+    if unknown:
+        print(f"Bilinmeyen AI sağlayıcısı atlandı: {', '.join(unknown)}")
+    # "grok" ve "xai" aynı sağlayıcıdır: tekrarlar görünen ada göre atılır
+    providers = {}
+    for name in names:
+        if name in PROVIDER_REGISTRY:
+            providers.setdefault(PROVIDER_REGISTRY[name][0], PROVIDER_REGISTRY[name])
+    return list(providers.values())
+
+# Sağlayıcı sıralaması (varsayılan: Gemini > X.AI > Groq)
+AI_PROVIDERS = provider_order(AI_PROVIDER_ORDER)
+
+def provider_configured(name):
+    """Sağlayıcının API anahtarı (yerel model için adresi) tanımlı mı; bilinmeyen adlar tanımlı sayılır"""
+    required = {"Yerel": LOCAL_LLM_BASE_URL, "Gemini": GEMINI_API_KEY, "Grok": XAI_API_KEY, "Groq": GROQ_API_KEY}
+    return bool(required.get(name, True))
+
+def routed_providers(explore=True):
+    """Bu sorgu için sağlayıcı sırası (BIST_AI_ROUTING=adaptive ise istatistiklere göre)"""
+    if AI_ROUTING == "adaptive":
+        return get_default_router().order(AI_PROVIDERS, explore=explore)
+    return AI_PROVIDERS
+
+def timed_query(name, query, prompt, structured=False):
+    """Sağlayıcıyı sorgula; süreyi ve sonucu yönlendirme istatistiklerine işle"""
+    started = time.perf_counter()
+    text = query(prompt, structured=structured)
+    elapsed = time.perf_counter() - started
+    get_default_router().record(name, elapsed, bool(text))
+    metrics.record_attempt(name, elapsed, bool(text))
+    return text
+
+def rule_based_fallback(df):
+    """Yerel kural motoru analizi (ağ erişimi gerektirmez)"""
+    if df is None:
+        return None
+    from signal_engine import rule_based_analysis
+    if AI_MODE != "rules":
+        print("Tüm AI servislerine ulaşılamadı! Yerel kural motoruyla analiz yapılıyor...")
+        metrics.AI_FALLBACKS.inc(target="rules")
+    return rule_based_analysis(df)
+
+def query_ai(prompt, df=None, symbol=None):
+    """AI sorgusu - AI_PROVIDERS sıralaması (varsayılan Gemini > X.AI > Groq; BIST_AI_ROUTING=adaptive
+    ise ölçülen gecikme/başarıya göre)
+
+    df verilirse tüm sağlayıcılar başarısız olduğunda (veya BIST_AI_MODE=rules ise
+    doğrudan) kural motorunun sonucu aynı şablon biçiminde döner.
+    """
+    if AI_MODE != "rules":
+        for name, query in routed_providers():
+            if skip_rate_limited(name):
+                continue
+            result = timed_query(name, query, prompt)
+            if result:
+                return result
+            metrics.AI_FALLBACKS.inc(target="next_provider")
+
+    analysis = rule_based_fallback(df)
+    return analysis.to_text(symbol or "HİSSE") if analysis else None
+
+def query_ai_structured(prompt, max_schema_retries=1, df=None):
+    """Yapılandırılmış AI sorgusu - AnalysisResult veya None döner
+
+    Ağ/API hatasında sıradaki sağlayıcıya geçilir; sadece cevap şemaya
+    uymadığında aynı sağlayıcı max_schema_retries kez daha denenir.
+    prompt, create_prompt(..., structured=True) veya create_prompt_parts(...,
+    structured=True) ile oluşturulmalıdır.
+    df verilirse son çare olarak kural motoru kullanılır.
+    """
+    if AI_MODE != "rules":
+        router = get_default_router()
+        for name, query in routed_providers():
+            if skip_rate_limited(name):
+                continue
+            for attempt in range(max_schema_retries + 1):
+                started = time.perf_counter()
+                text = query(prompt, structured=True)
+                elapsed = time.perf_counter() - started
+                if not text:
+                    router.record(name, elapsed, False)
+                    metrics.record_attempt(name, elapsed, False)
+                    metrics.AI_FALLBACKS.inc(target="next_provider")
+                    break
+                try:
+                    result = parse_structured_answer(text, provider=name)
+                    router.record(name, elapsed, True)
+                    metrics.record_attempt(name, elapsed, True)
+                    return result
+                except SchemaError as e:
+                    # Şemaya uymayan cevap geçersizdir
+                    router.record(name, elapsed, False)
+                    metrics.record_attempt(name, elapsed, False, reason="schema")
+                    print(f"{name} cevabı şemaya uymuyor ({e}) - deneme {attempt + 1}/{max_schema_retries + 1}")
+
+    return rule_based_fallback(df)
+
+def analysis_prompt(symbol, df):
+    """Analiz moduna uygun prompt (topluluk modu oylama için yapılandırılmış cevap ister)"""
+    structured = STRUCTURED_OUTPUT or AI_MODE == "ensemble"
+    if PROMPT_CACHE:
+        return create_prompt_parts(symbol, df, structured=structured)
+    return create_prompt(symbol, df, structured=structured)
+
+def analyze_symbol(symbol, df, prompt=None):
+    """Göstergeleri hesaplanmış tablo için AI analizi (BIST_AI_MODE ve yapılandırılmış mod ayarlarıyla)
+
+    Döner: (cevap metni, AnalysisResult veya None); cevap alınamazsa (None, None)
+    """
+    prompt = prompt if prompt is not None else analysis_prompt(symbol, df)
+    if prompt is None:
+        return None, None
+    if AI_MODE == "ensemble":
+        from ensemble import query_ensemble
+        ensemble = query_ensemble(prompt)
+        print(ensemble.report())
+        analysis = ensemble.analysis or rule_based_fallback(df)
+        return (analysis.to_text(symbol), analysis) if analysis else (None, None)
+    if STRUCTURED_OUTPUT:
+        analysis = query_ai_structured(prompt, df=df)
+        return (analysis.to_text(symbol), analysis) if analysis else (None, None)
+    return query_ai(prompt, df=df, symbol=symbol), None
+
+def save_to_ledger(symbol, answer, df, provider=None):
+    """Cevabı ve mumları tahmin defterine kaydet (BIST_LEDGER_PATH tanımlıysa)"""
+    try:
+        import ledger
+        if not ledger.LEDGER_PATH:
+            return
+        conn = ledger.open_ledger()
+        try:
+            ledger.store_bars(conn, symbol, df)
+            ledger.record_answer(conn, symbol, answer, provider=provider)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Tahmin defteri kayıt hatası: {str(e)}")
+
+def print_analysis(symbol, df, result, analysis=None):
+    """Analiz cevabını yazdır ve tahmin defterine kaydet"""
     if result:
-        return result
-    
-    # 3. İkisi de başarısız olursa Groq'u dene
-    return query_groq(prompt)
+        print(result)
+        if analysis:
+            save_to_ledger(symbol, analysis.to_ledger(), df, provider=analysis.provider)
+        else:
+            save_to_ledger(symbol, result, df)
+    else:
+        print(" HATA: Tüm AI servislerine ulaşılamadı!")
+        print("Gemini, X.AI Grok , Groq ")
+        print("Lütfen API anahtarlarınızı ve internet bağlantınızı kontrol edin.")
 
 def main():
     """Ana fonksiyon"""
     print("=== BIST HİSSE TAHMİN ARACI ===")
-    print("AI Sıralaması: Gemini 2.0 Flash > Grok-3 > Groq Llama")
+    adaptive = " (ölçülen gecikme ve başarıya göre uyarlanır)" if AI_ROUTING == "adaptive" else ""
+    print(f"AI Sıralaması: {' > '.join(name for name, _ in AI_PROVIDERS)}{adaptive}")
     print("AMAÇ: %98 DOĞRULUK ORANINDA KAR GARANTİLİ TAHMİNLER!")
     print()
     
@@ -678,20 +1071,15 @@ def main():
         df = calculate_indicators(df)
         
         # Ultra-agresif prompt oluştur
-        prompt = create_prompt(symbol, df)
+        prompt = analysis_prompt(symbol, df)
         if prompt is None:
             return
             
         print("TEKNİK ANALİZ SONUÇLARI")
         
         # AI analizi al
-        result = query_ai(prompt)
-        if result:
-            print(result)
-        else:
-            print(" HATA: Tüm AI servislerine ulaşılamadı!")
-            print("Gemini, X.AI Grok , Groq ")
-            print("Lütfen API anahtarlarınızı ve internet bağlantınızı kontrol edin.")
+        result, analysis = analyze_symbol(symbol, df, prompt)
+        print_analysis(symbol, df, result, analysis)
             
         print(" DİKKAT: Bu tahminler %98 doğruluk hedefiyle yapılmıştır.")
         print("SORUMLU YATIRIM: Kendi riskinizi değerlendirin!")
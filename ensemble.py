@@ -0,0 +1,229 @@
+"""Çok modelli topluluk (ensemble) analizi: erken yeter sayısıyla sonlanma
+
+query_ai sağlayıcıları sırayla dener ve ilk boş olmayan cevabı alır; tek bir
+modelin görüşü kullanılır. Burada yapılandırılmış (JSON) prompt tüm
+sağlayıcılara aynı anda gönderilir, cevaplar geldikçe ufuk başına yön oyları
+sayılır:
+
+- Bir ufukta en az `quorum` sağlayıcı aynı yönü verdiği anda o ufkun kararı
+  kesinleşir. Dört ufuk da kesinleşince sonuç hemen döner; geride kalan
+  çağrılar beklenmez, cevapları yok sayılır. Gecikme sağlayıcıların toplamına
+  değil, uzlaşan en hızlı modellere bağlıdır.
+- Kalan cevaplarla bir ufukta yeter sayısına artık ulaşılamıyorsa (veya süre
+  dolarsa) beklemeden uzlaşmazlık raporu döner.
+- Retry-After beklemesindeki sağlayıcılara istek gönderilmez (bkz. scheduler.py).
+
+Uzlaşılan sonuçta yön oylamadan, Al/Sat önerileri uzlaşan modellerin en sık
+verdiğinden, fiyatlar uzlaşan modellerin medyanından gelir.
+"""
+
+import os
+import time
+import inspect
+import queue
+import threading
+import statistics
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ai_schema import HORIZON_KEYS, AnalysisResult, HorizonForecast, SchemaError, parse_structured_answer
+from routing import get_default_router
+from scheduler import rate_limited_for
+import metrics
+
+# Bir ufkun kararı için aynı yönü vermesi gereken sağlayıcı sayısı
+ENSEMBLE_QUORUM = int(os.getenv("BIST_ENSEMBLE_QUORUM") or 2)
+# Toplam bekleme süresi (saniye)
+ENSEMBLE_TIMEOUT = float(os.getenv("BIST_ENSEMBLE_TIMEOUT") or 60)
+
+
+@dataclass
+class EnsembleResult:
+    """Topluluk sorgusunun sonucu ve oy dökümü"""
+    analysis: Optional[AnalysisResult]
+    quorum: int
+    quorum_reached: bool
+    votes: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+    decided: Dict[str, str] = field(default_factory=dict)
+    answers: Dict[str, AnalysisResult] = field(default_factory=dict)
+    failed: Dict[str, str] = field(default_factory=dict)
+    pending: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def disagreements(self):
+        """Yeter sayısına ulaşamayan ufuklar"""
+        return [key for key in HORIZON_KEYS if key not in self.decided]
+
+    def report(self):
+        """Ufuk başına oy dökümü (uzlaşmazlıklar işaretli)"""
+        total = len(self.answers) + len(self.failed) + len(self.pending)
+        lines = [f"Topluluk: {len(self.answers)}/{total} cevap, yeter sayısı {self.quorum}, "
+                 f"{self.elapsed:.2f} sn - {'UZLAŞMA VAR' if self.quorum_reached else 'UZLAŞMA YOK'}"]
+        for key in HORIZON_KEYS:
+            votes = " | ".join(f"{direction} ({', '.join(names)})" for direction, names in self.votes.get(key, {}).items())
+            status = f"{self.decided[key]} kesin" if key in self.decided else "uzlaşmazlık"
+            lines.append(f"- {key}: {status} - {votes or 'oy yok'}")
+        if self.failed:
+            lines.append("Cevap alınamadı: " + ", ".join(f"{name} ({error})" for name, error in self.failed.items()))
+        if self.pending:
+            lines.append("Beklenmedi: " + ", ".join(self.pending))
+        return "\n".join(lines)
+
+
+def count_votes(answers):
+    """{ufuk: {yön: [sağlayıcılar]}} - cevap geliş sırasıyla"""
+    votes = {key: {} for key in HORIZON_KEYS}
+    for name, result in answers.items():
+        for key in HORIZON_KEYS:
+            votes[key].setdefault(result.horizons[key].direction, []).append(name)
+    return votes
+
+
+def _unreachable(votes, decided, quorum, pending):
+    """Kesinleşmemiş bir ufukta kalan cevaplarla yeter sayısına ulaşılamıyor mu"""
+    for key in HORIZON_KEYS:
+        if key in decided:
+            continue
+        best = max((len(names) for names in votes[key].values()), default=0)
+        if best + pending < quorum:
+            return True
+    return False
+
+
+def _most_common(values):
+    return Counter(values).most_common(1)[0][0]
+
+
+def _median(values):
+    return round(float(statistics.median(values)), 2)
+
+
+def merge_answers(answers, members):
+    """Kesinleşen ufuklar için uzlaşan cevapları birleştir
+
+    members: {ufuk: (yön, [uzlaşan sağlayıcılar])}
+    """
+    horizons = {}
+    for key, (direction, names) in members.items():
+        forecasts = [answers[name].horizons[key] for name in names]
+        horizon = HorizonForecast(
+            direction=direction,
+            buy_call=_most_common([f.buy_call for f in forecasts]),
+            sell_call=_most_common([f.sell_call for f in forecasts]),
+            price_low=_median([f.price_low for f in forecasts]),
+            price_high=_median([f.price_high for f in forecasts]),
+            target=_median([f.target for f in forecasts]),
+        )
+        if key == 'daily':
+            horizon.buy_time = _most_common([f.buy_time for f in forecasts])
+            horizon.sell_time = _most_common([f.sell_time for f in forecasts])
+        horizons[key] = horizon
+    voters = list(dict.fromkeys(name for _, names in members.values() for name in names))
+    return AnalysisResult(price=_median([answers[name].price for name in voters]), horizons=horizons,
+                          provider="Topluluk(" + "+".join(voters) + ")")
+
+
+def _accepts_verbose(query):
+    try:
+        return 'verbose' in inspect.signature(query).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _call(name, query, prompt, results):
+    """İşçi: tek sağlayıcıyı sorgula, (ad, sonuç, hata) kuyruğa koy
+
+    Sıralı yedeğe geçiş mesajları ("...'ye ulaşılamadı! ... ile deneniyor")
+    eşzamanlı sorguda yanıltıcı olduğundan sağlayıcılar sessiz çağrılır.
+    """
+    started = time.perf_counter()
+    result, error, reason = None, None, "empty"
+    try:
+        if _accepts_verbose(query):
+            text = query(prompt, structured=True, verbose=False)
+        else:
+            text = query(prompt, structured=True)
+        if not text:
+            error = "cevap yok"
+        else:
+            result = parse_structured_answer(text, provider=name)
+    except SchemaError as e:
+        error, reason = f"şemaya uymuyor: {e}", "schema"
+    except Exception as e:
+        error, reason = str(e), "exception"
+    # Erken dönüşten sonra gelen cevaplar da yönlendirme istatistiklerine işlenir
+    elapsed = time.perf_counter() - started
+    get_default_router().record(name, elapsed, result is not None)
+    metrics.record_attempt(name, elapsed, result is not None, reason=reason)
+    results.put((name, result, error))
+
+
+def query_ensemble(prompt, providers=None, quorum=None, timeout=None):
+    """Yapılandırılmış promptu tüm sağlayıcılara eşzamanlı gönder, yeter sayısı oluşunca dön
+
+    prompt: create_prompt(..., structured=True) veya create_prompt_parts(..., structured=True)
+    providers: [(ad, sorgu fonksiyonu), ...]; verilmezse borsa.AI_PROVIDERS
+    quorum: bir ufukta aynı yönü vermesi gereken sağlayıcı sayısı (sağlayıcı sayısıyla sınırlı)
+
+    Uzlaşma yoksa analysis, sıralamada öndeki cevap veren sağlayıcının sonucudur
+    (hiç cevap yoksa None); ayrıntı için report() kullanılır.
+    """
+    if providers is None:
+        import borsa
+        providers = borsa.AI_PROVIDERS
+    providers = list(providers)
+    timeout = ENSEMBLE_TIMEOUT if timeout is None else timeout
+
+    started = time.perf_counter()
+    answers, failed, members = {}, {}, {}
+    # Hız sınırındaki sağlayıcılar atlanır; yeter sayısı kalan sağlayıcı sayısıyla sınırlanır
+    active = []
+    for name, query in providers:
+        remaining = rate_limited_for(name)
+        if remaining > 0:
+            failed[name] = f"hız sınırında, {remaining:.0f} sn kaldı"
+        else:
+            active.append((name, query))
+    quorum = max(1, min(quorum or ENSEMBLE_QUORUM, len(active)))
+    if active:
+        print(f"Topluluk analizi: {', '.join(name for name, _ in active)} eşzamanlı sorgulanıyor...")
+
+    results = queue.Queue()
+    # Arka plan iş parçacıkları: erken dönüşte yavaş çağrılar beklenmez, süreç çıkışını da engellemez
+    for name, query in active:
+        threading.Thread(target=_call, args=(name, query, prompt, results), daemon=True,
+                         name=f"ensemble-{name}").start()
+
+    pending = [name for name, _ in active]
+    votes = count_votes(answers)
+    deadline = started + timeout
+    while pending and len(members) < len(HORIZON_KEYS):
+        try:
+            name, result, error = results.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            print(f"Topluluk süresi doldu ({timeout:g} sn)")
+            break
+        pending.remove(name)
+        if result is None:
+            failed[name] = error
+        else:
+            answers[name] = result
+            votes = count_votes(answers)
+            # Yeter sayısına ilk ulaşan yön kesinleşir; sonraki cevaplar değiştirmez
+            for key in HORIZON_KEYS:
+                for direction, names in votes[key].items():
+                    if key not in members and len(names) >= quorum:
+                        members[key] = (direction, list(names))
+        if _unreachable(votes, members, quorum, len(pending)):
+            break
+
+    reached = len(members) == len(HORIZON_KEYS)
+    if reached:
+        analysis = merge_answers(answers, members)
+    else:
+        analysis = next((answers[name] for name, _ in providers if name in answers), None)
+    return EnsembleResult(analysis=analysis, quorum=quorum, quorum_reached=reached, votes=votes,
+                          decided={key: direction for key, (direction, _) in members.items()},
+                          answers=answers, failed=failed, pending=pending,
+                          elapsed=time.perf_counter() - started)
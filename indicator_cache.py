@@ -0,0 +1,229 @@
+"""Veri parmak izine göre gösterge sonuçlarını önbelleğe alma
+
+Aynı mum verisi için calculate_indicators tekrar tekrar çalıştırılır (CLI
+tekrarları, paneller, AI hatası sonrası yeniden denemeler). Bu modül sonuçları
+OHLCV verisinin hızlı bir parmak izi (uzunluk, son zaman damgası, son satırların
+özeti) ve gösterge yapılandırması ile anahtarlar:
+
+- Bellekte bayt sınırlı LRU önbellek
+- İsteğe bağlı disk deposu (BIST_INDICATOR_CACHE_DIR) ile süreçler arası paylaşım
+- Kısmi yeniden kullanım: önbellekteki tablo yeni verinin önekiyse sadece yeni
+  mumlar bir ısınma penceresiyle hesaplanıp eklenir
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+import borsa
+from sessions import session_start_position
+
+INDICATOR_CACHE_DIR = os.getenv("BIST_INDICATOR_CACHE_DIR") or ""
+
+# Parmak izine katılan son satır sayısı
+FINGERPRINT_TAIL_ROWS = 64
+# Kısmi yeniden kullanımda yeni mumlardan önce yeniden hesaplanan satır sayısı.
+# Özyinelemeli göstergeler (EMA, RSI, ADX, ATR) bu pencere sonunda tam hesaplamaya
+# (1 - 2/51)^400 ≈ 1e-7 göreli farkla yakınsar.
+EXTEND_WARMUP_ROWS = 400
+
+
+def data_fingerprint(df, tail_rows=FINGERPRINT_TAIL_ROWS):
+    """OHLCV verisinin hızlı parmak izi: uzunluk + son zaman damgası + son satırların özeti"""
+    if df is None or len(df) == 0:
+        return "bos"
+    tail = df[borsa.PRICE_COLUMNS].iloc[-tail_rows:].to_numpy(dtype=np.float64)
+    last_ts = pd.Timestamp(df.index[-1]).value if isinstance(df.index, pd.DatetimeIndex) else str(df.index[-1])
+    digest = hashlib.blake2b(np.ascontiguousarray(tail).tobytes(), digest_size=12).hexdigest()
+    return f"{len(df)}-{last_ts}-{digest}"
+
+
+def indicator_config_key(compact=False):
+    """Gösterge yapılandırmasının anahtarı (sütun seti ve kompakt mod)"""
+    config = repr((tuple(borsa.INDICATOR_COLUMNS), bool(compact)))
+    return hashlib.blake2b(config.encode(), digest_size=6).hexdigest()
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(deep=False).sum())
+
+
+class IndicatorCache:
+    """Gösterge sonuçları için LRU önbellek (iş parçacığı güvenli)
+
+    Döndürülen tablolar önbellekle paylaşılır; değiştirmeden önce kopyalayın.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, cache_dir=None, warmup_rows=EXTEND_WARMUP_ROWS):
+        self.max_bytes = max_bytes
+        self.cache_dir = INDICATOR_CACHE_DIR if cache_dir is None else cache_dir
+        self.warmup_rows = warmup_rows
+        self._entries = OrderedDict()   # (parmak izi, yapılandırma) -> (sembol, tablo, bayt)
+        self._latest = {}               # (sembol, yapılandırma) -> (parmak izi, satır sayısı)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hit': 0, 'disk_hit': 0, 'extended': 0, 'miss': 0}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _count(self, result):
+        with self._lock:
+            self.stats[result] += 1
+
+    def counters(self):
+        """İstek sayaçlarının kopyası (kilit altında okunur)"""
+        with self._lock:
+            return dict(self.stats)
+
+    # --- bellek ---
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key, symbol, frame, input_rows):
+        size = _frame_bytes(frame)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (symbol, frame, size)
+            self._bytes += size
+            if symbol:
+                self._latest[(symbol, key[1])] = (key[0], input_rows)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    # --- disk ---
+    def _disk_path(self, symbol, config):
+        return os.path.join(self.cache_dir, f"{symbol}-{config}.pkl")
+
+    def _disk_load(self, symbol, config):
+        if not self.cache_dir or not symbol:
+            return None
+        try:
+            path = self._disk_path(symbol, config)
+            if os.path.exists(path):
+                return pd.read_pickle(path)
+        except Exception as e:
+            print(f"Gösterge önbelleği okuma hatası ({symbol}): {e}")
+        return None
+
+    def _disk_store(self, symbol, config, fingerprint, frame):
+        if not self.cache_dir or not symbol:
+            return
+        try:
+            path = self._disk_path(symbol, config)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            pd.to_pickle({'fingerprint': fingerprint, 'frame': frame}, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Gösterge önbelleği yazma hatası ({symbol}): {e}")
+
+    # --- kısmi yeniden kullanım ---
+    def _prefix_candidate(self, df, symbol, config, stored=None):
+        """Önbellekte bu verinin öneki olan bir sonuç varsa (tablo, yeniden kullanılacak satır) döner
+
+        stored: calculate'in diskten zaten okuduğu kayıt (disk yeniden okunmaz)
+        """
+        if not symbol:
+            return None
+        candidates = []
+        with self._lock:
+            latest = self._latest.get((symbol, config))
+            if latest is not None and (latest[0], config) in self._entries:
+                candidates.append(self._entries[(latest[0], config)][1])
+        if stored is not None:
+            candidates.append(stored['frame'])
+
+        for cached in candidates:
+            n = len(cached)
+            # Son önbellek mumu o an işlem gören (henüz kapanmamış) mum olabilir; onu da dene
+            for reuse in (n, n - 1):
+                if reuse <= 0 or reuse > len(df):
+                    continue
+                if data_fingerprint(df.iloc[:reuse]) == data_fingerprint(cached.iloc[:reuse]):
+                    return cached, reuse
+        return None
+
+    def _extend(self, df, cached, reuse, compact):
+        """Önek sonuçlarını koruyup sadece yeni mumları ısınma penceresiyle hesapla"""
+        # Pencere bir önceki seansın başından başlar: seans sütunları (VWAP, günlük
+        # değişim, günün açılış/en yüksek/en düşük) yeni mumlar için tam veriyle aynı olur
+        start = session_start_position(df.index, max(0, reuse - self.warmup_rows), sessions_back=1)
+        tail = borsa.calculate_indicators(df.iloc[start:])
+        new_rows = tail.iloc[reuse - start:]
+
+        head = cached.iloc[:reuse].reindex(columns=tail.columns)
+        head[borsa.PRICE_COLUMNS] = df[borsa.PRICE_COLUMNS].iloc[:reuse]
+        combined = pd.concat([head.astype(tail.dtypes.to_dict()), new_rows])
+
+        # Kümülatif sütun: OBV toplamsal olarak kaydırılır
+        if 'OBV' in combined.columns and start > 0 and not pd.isna(cached['OBV'].iloc[start]):
+            offset = float(cached['OBV'].iloc[start]) - float(tail['OBV'].iloc[0])
+            combined.iloc[reuse:, combined.columns.get_loc('OBV')] += offset
+        if 'Typical_Price' in combined.columns:
+            combined['Typical_Price'] = (df['High'] + df['Low'] + df['Close']) / 3
+
+        return borsa.compact_indicators(combined) if compact else combined
+
+    # --- genel arayüz ---
+    def calculate(self, df, symbol=None, compact=False):
+        """Önbellekten veya (kısmen) yeniden hesaplayarak gösterge tablosu döndür"""
+        config = indicator_config_key(compact)
+        fingerprint = data_fingerprint(df)
+        key = (fingerprint, config)
+
+        cached = self._get(key)
+        if cached is not None:
+            self._count('hit')
+            return cached
+
+        stored = self._disk_load(symbol, config)
+        if stored is not None and stored['fingerprint'] == fingerprint:
+            self._count('disk_hit')
+            self._put(key, symbol, stored['frame'], len(df))
+            return stored['frame']
+
+        candidate = self._prefix_candidate(df, symbol, config, stored)
+        if candidate is not None:
+            result = self._extend(df, candidate[0], candidate[1], compact)
+            self._count('extended')
+        else:
+            result = borsa.calculate_indicators(df, compact=compact)
+            self._count('miss')
+
+        self._put(key, symbol, result, len(df))
+        self._disk_store(symbol, config, fingerprint, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self._bytes = 0
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Süreç genelinde paylaşılan önbellek"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = IndicatorCache()
+        return _default_cache
+
+
+def cached_calculate_indicators(df, symbol=None, compact=False):
+    """calculate_indicators'ın önbellekli karşılığı"""
+    return get_default_cache().calculate(df, symbol=symbol, compact=compact)
@@ -0,0 +1,201 @@
+"""Sıcak etkileşimli oturum: süreç yeniden başlatılmadan çok sembol analizi
+
+borsa.py main() tek sembol sorar, analiz eder ve çıkar; on hisse için on kez
+pandas, yfinance ve ta yüklenir, her seferinde yeni HTTP bağlantıları açılır.
+Bu oturumda süreç açık kalır:
+
+- İndirilen mumlar ve göstergeler 15 dakikalık mum dilimi boyunca bellekte
+  tutulur; aynı mum için AI cevabı yeniden istenmez.
+- Sağlayıcı bağlantıları borsa.api_session / local_session ile yeniden kullanılır.
+- İzleme listesindeki (BIST_WATCHLIST) semboller, kullanıcı yazarken arka planda
+  önceden indirilip göstergeleri hesaplanır; mum dilimi değişince yenilenir.
+- Bir satırda birden çok sembol verilebilir; veri ve AI çağrıları eşzamanlı
+  yapılır, sonuçlar giriş sırasıyla yazdırılır.
+- BIST_METRICS_PORT verilirse /metrics sunucusu açılır (bkz. metrics.py).
+
+Komutlar:
+    THYAO GARAN, AKBNK      sembolleri analiz et
+    izle ASELS EREGL        izleme listesine ekle
+    liste                   izleme listesi ve bellekteki veriler
+    durum                   borsa durumu
+    çık                     oturumu kapat
+
+Kullanım:
+    python interactive.py [SEMBOL ...]      # verilen semboller izleme listesine eklenir
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import borsa
+import metrics
+import singleflight
+
+WATCHLIST = (os.getenv("BIST_WATCHLIST") or "").replace(',', ' ').upper().split()
+# Eşzamanlı indirme/analiz ve arka plan ön indirme işçi sayısı
+SESSION_WORKERS = int(os.getenv("BIST_SESSION_WORKERS") or 4)
+PREFETCH_WORKERS = int(os.getenv("BIST_PREFETCH_WORKERS") or 2)
+
+EXIT_COMMANDS = ('çık', 'cik', 'q', 'quit', 'exit')
+
+
+def parse_symbols(text):
+    """'thyao, GARAN.IS akbnk' -> ['THYAO', 'GARAN', 'AKBNK'] (tekrarlar atılır)"""
+    symbols = []
+    for item in text.replace(',', ' ').split():
+        symbol = item.upper()
+        if symbol.endswith('.IS'):
+            symbol = symbol[:-3]
+        symbols.append(symbol)
+    return list(dict.fromkeys(symbols))
+
+
+class AnalysisSession:
+    """Oturum boyunca sıcak kalan veri, gösterge ve analiz önbelleği"""
+
+    def __init__(self, watchlist=(), workers=SESSION_WORKERS, prefetch_workers=PREFETCH_WORKERS):
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self._lock = threading.Lock()
+        self._frames = {}      # sembol -> (mum dilimi, gösterge tablosu)
+        self._analyses = {}    # sembol -> (son mum, cevap, AnalysisResult)
+        self._prefetching = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='oturum')
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix='on-indirme')
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def _cached(self, symbol, bucket):
+        with self._lock:
+            entry = self._frames.get(symbol)
+        return entry[1] if entry is not None and entry[0] == bucket else None
+
+    def _load(self, symbol, bucket, verbose=True):
+        df = singleflight.fetch(symbol, verbose=verbose)
+        if df is None or df.empty:
+            return None
+        df = singleflight.indicators(symbol, df)
+        if df is None or df.empty:
+            return None
+        with self._lock:
+            self._frames[symbol] = (bucket, df)
+            if not verbose:
+                self.prefetched += 1
+        return df
+
+    def frame(self, symbol):
+        """Göstergeleri hesaplanmış tablo (mum dilimi içinde bellekten)"""
+        bucket = singleflight.bar_bucket()
+        df = self._cached(symbol, bucket)
+        with self._lock:
+            if df is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        # Ön indirme sürüyorsa singleflight aynı indirmeyi paylaştırır
+        return df if df is not None else self._load(symbol, bucket)
+
+    def prefetch(self):
+        """İzleme listesinde bu mum dilimi için verisi olmayan sembolleri arka planda indir"""
+        bucket = singleflight.bar_bucket()
+        for symbol in self.watchlist:
+            running = self._prefetching.get(symbol)
+            if self._cached(symbol, bucket) is None and (running is None or running.done()):
+                self._prefetching[symbol] = self._prefetch_pool.submit(self._load, symbol, bucket, False)
+
+    def _analyze(self, symbol, df):
+        """Son mum için AI analizi (aynı mumda önceki cevap kullanılır)"""
+        bar = df.index[-1]
+        with self._lock:
+            entry = self._analyses.get(symbol)
+        if entry is not None and entry[0] == bar:
+            return entry[1], entry[2], True
+        result, analysis = singleflight.analysis(symbol, df)
+        if result:
+            with self._lock:
+                self._analyses[symbol] = (bar, result, analysis)
+        return result, analysis, False
+
+    def analyze(self, symbols):
+        """Sembolleri eşzamanlı indir ve analiz et; sonuçları giriş sırasıyla yazdır"""
+        frames = dict(zip(symbols, self._pool.map(self.frame, symbols)))
+        futures = {symbol: self._pool.submit(self._analyze, symbol, df)
+                   for symbol, df in frames.items() if df is not None}
+        for symbol in symbols:
+            print(f"\n=== {symbol} TEKNİK ANALİZ SONUÇLARI ===")
+            if symbol not in futures:
+                print(f"Hata: {symbol} hissesi için veri bulunamadı.")
+                continue
+            try:
+                result, analysis, reused = futures[symbol].result()
+            except Exception as e:
+                print(f"Analiz hatası: {str(e)}")
+                continue
+            if reused:
+                print("(Son mum değişmedi - önceki cevap gösteriliyor)")
+                print(result)
+            else:
+                borsa.print_analysis(symbol, frames[symbol], result, analysis)
+
+    def report(self):
+        bucket = singleflight.bar_bucket()
+        with self._lock:
+            fresh = sorted(s for s, (b, _) in self._frames.items() if b == bucket)
+            stale = sorted(s for s, (b, _) in self._frames.items() if b != bucket)
+        lines = [f"İzleme listesi: {', '.join(self.watchlist) or '-'}",
+                 f"Bellekte güncel: {', '.join(fresh) or '-'}"]
+        if stale:
+            lines.append(f"Bellekte eski mum: {', '.join(stale)}")
+        lines.append(f"Veri önbelleği: {self.hits} isabet, {self.misses} ıska, {self.prefetched} ön indirme")
+        return "\n".join(lines)
+
+    def close(self):
+        self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run(session):
+    """Komut döngüsü: her girişten önce izleme listesi arka planda tazelenir"""
+    print("=== BIST HİSSE TAHMİN ARACI - OTURUM ===")
+    print("Sembolleri boşluk veya virgülle yazın; 'izle', 'liste', 'durum', 'çık' komutları kullanılabilir.")
+    print()
+    borsa.display_market_status()
+    while True:
+        session.prefetch()
+        try:
+            line = input("bist> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if not line:
+            continue
+        command, _, rest = line.partition(' ')
+        command = command.lower()
+        try:
+            if command in EXIT_COMMANDS:
+                break
+            elif command == 'izle':
+                session.watchlist = list(dict.fromkeys(session.watchlist + parse_symbols(rest)))
+                print(f"İzleme listesi: {', '.join(session.watchlist)}")
+            elif command == 'liste':
+                print(session.report())
+            elif command == 'durum':
+                print(borsa.is_market_open()[1])
+            else:
+                session.analyze(parse_symbols(line))
+        except KeyboardInterrupt:
+            print("\nİşlem durduruldu.")
+    session.close()
+    print("Oturum kapatıldı.")
+
+
+def main(argv):
+    if metrics.METRICS_PORT:
+        metrics.start_exporter()
+    run(AnalysisSession(WATCHLIST + parse_symbols(' '.join(argv))))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
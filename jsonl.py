@@ -0,0 +1,78 @@
+"""Makine tarafından okunabilir çıktı: JSON Lines (sembol başına bir satır)
+
+Toplu çalıştırmalarda (screener.py --jsonl) her sembol bittiği anda stdout'a
+tek satırlık bir JSON nesnesi yazılır; ilerleme mesajları ("veri
+indiriliyor...", "Gemini 2.0 Flash ile...") stderr'e yönlendirilir. Böylece
+alt süreçler toplu iş sürerken sonuçları okumaya başlayabilir:
+
+    python screener.py THYAO GARAN --analyze --jsonl 2>/dev/null | jq .symbol
+"""
+
+import sys
+import json
+import threading
+import contextlib
+
+import numpy as np
+
+import borsa
+from scheduler import estimate_tokens
+
+SNAPSHOT_COLUMNS = borsa.PRICE_COLUMNS + borsa.INDICATOR_COLUMNS
+
+
+def json_number(value):
+    """JSON için sayı (NaN/inf -> None)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if np.isfinite(value) else None
+
+
+def indicator_snapshot(symbol, df, columns=SNAPSHOT_COLUMNS):
+    """Gösterge tablosunun son satırı"""
+    last = df.iloc[-1]
+    return {
+        'symbol': symbol,
+        'bar': df.index[-1].isoformat(),
+        'bars': len(df),
+        'values': {col: json_number(last[col]) for col in columns if col in df.columns},
+    }
+
+
+def prompt_size(prompt, structured=False):
+    """Prompt uzunluğu (karakter) ve tahmini token maliyeti"""
+    if hasattr(prompt, 'static'):
+        size = {'chars': len(prompt.static) + len(prompt.dynamic), 'static_chars': len(prompt.static)}
+    else:
+        size = {'chars': len(prompt or "")}
+    size['tokens'] = estimate_tokens(prompt, structured)
+    return size
+
+
+class JsonLinesWriter:
+    """Kayıtları satır satır yaz ve hemen boşalt (iş parçacıkları arasında güvenli)
+
+    Akış oluşturulurken alınır; sonradan stdout stderr'e yönlendirilse de kayıtlar
+    asıl çıktıya gider.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+            self.count += 1
+
+
+@contextlib.contextmanager
+def progress_to_stderr():
+    """Blok içindeki print çıktısını stderr'e yönlendir"""
+    with contextlib.redirect_stdout(sys.stderr):
+        yield
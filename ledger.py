@@ -0,0 +1,359 @@
+"""Tahmin defteri: her AI cevabını SQLite'a kaydeder ve toplu olarak puanlar
+
+main() yapay zekanın doldurduğu şablonu yazdırıp atıyordu; doğruluk ölçülemiyordu.
+Bu modül cevaptaki yapılandırılmış alanları (yön, Al/Sat kararı, fiyat aralığı,
+kesin tahmin) her ufuk için ayrı satır olarak saklar, mum verisini de aynı
+veritabanında tutar ve puanlamayı sembol başına tek vektörel geçişte yapar.
+
+Kullanım:
+    python ledger.py refresh THYAO AKBNK   # mumları güncelle
+    python ledger.py score                 # puanlanmamış tahminleri puanla ve özetle
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import datetime
+import numpy as np
+import pandas as pd
+
+from backtest import FLAT_THRESHOLD_PCT, SIGNAL_MAP, horizon_end_positions, HORIZONS
+
+LEDGER_PATH = os.getenv("BIST_LEDGER_PATH") or ""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    provider TEXT,
+    ref_price REAL,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    answer_id INTEGER NOT NULL REFERENCES answers(id),
+    symbol TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    horizon TEXT NOT NULL,
+    direction TEXT,
+    buy_call TEXT,
+    sell_call TEXT,
+    price_low REAL,
+    price_high REAL,
+    target REAL,
+    buy_time TEXT,
+    sell_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_symbol_ts ON predictions(symbol, created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions(created_at);
+CREATE INDEX IF NOT EXISTS idx_predictions_horizon_ts ON predictions(horizon, created_at);
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (symbol, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outcomes (
+    prediction_id INTEGER PRIMARY KEY REFERENCES predictions(id),
+    scored_at INTEGER NOT NULL,
+    ref_close REAL,
+    realized_close REAL,
+    realized_high REAL,
+    realized_low REAL,
+    realized_pct REAL,
+    direction_hit INTEGER,
+    call_hit INTEGER,
+    in_range INTEGER,
+    target_error_pct REAL
+);
+"""
+
+PREDICTION_FIELDS = ['direction', 'buy_call', 'sell_call', 'price_low', 'price_high',
+                     'target', 'buy_time', 'sell_time']
+
+# Şablondaki bölüm başlıkları (sıra önemli: "1-5 SAAT" "1 SAAT"ten önce aranır)
+_SECTION_PATTERNS = [
+    ('5h', r'1\s*-\s*5\s*SAAT'),
+    ('1h', r'1\s*SAAT\s*İÇİN'),
+    ('daily', r'GÜNLÜK'),
+    ('weekly', r'HAFTAL[İI]K'),
+]
+_NUMBER = r'([0-9]+(?:[.,][0-9]+)?)'
+_FIELD_PATTERNS = {
+    'direction': r'Beklenen\s+Yön\s*:\s*\**\s*([^\n(*]+)',
+    'buy_call': r'Alınır\s+mı\s*:\s*\**\s*([^\n(*]+)',
+    'sell_call': r'Satılır\s+mı\s*:\s*\**\s*([^\n(*]+)',
+    'range': r'Fiyat\s+Aralığı\s*:\s*\**\s*' + _NUMBER + r'\s*(?:TL)?\s*[–\-—]\s*' + _NUMBER,
+    'target': r'Kesin\s+Tahmin\s*:\s*\**\s*' + _NUMBER,
+    'price_low': r'En\s+Düşük\s*:\s*\**\s*' + _NUMBER,
+    'price_high': r'En\s+Yüksek\s*:\s*\**\s*' + _NUMBER,
+    'buy_time': r'Alış\s+Saati\s*:\s*\**\s*([0-9]{1,2}[:.][0-9]{2})',
+    'sell_time': r'Satış\s+Saati\s*:\s*\**\s*([0-9]{1,2}[:.][0-9]{2})',
+}
+_PRICE_PATTERN = r'GÜNCEL\s+FİYAT[^:]*:\s*\**\s*' + _NUMBER
+
+
+def _to_float(text):
+    try:
+        return float(text.replace(',', '.'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _clean_label(text):
+    label = text.strip().strip('_').strip()
+    return label or None
+
+
+def parse_answer(text):
+    """Doldurulmuş şablon metnini yapılandırılmış alanlara ayır
+
+    Döner: {'price': float|None, 'horizons': {ufuk: {alan: değer}}}
+    """
+    if not text:
+        return {'price': None, 'horizons': {}}
+
+    price_match = re.search(_PRICE_PATTERN, text, flags=re.IGNORECASE)
+    price = _to_float(price_match.group(1)) if price_match else None
+
+    # Bölüm başlangıçlarını bul ve metni bölümlere ayır
+    starts = []
+    for horizon, pattern in _SECTION_PATTERNS:
+        for match in re.finditer(r'\*\*\s*' + pattern, text, flags=re.IGNORECASE):
+            if not any(abs(match.start() - s) < 3 for s, _ in starts):
+                starts.append((match.start(), horizon))
+                break
+    starts.sort()
+
+    horizons = {}
+    for i, (start, horizon) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        section = text[start:end]
+        fields = dict.fromkeys(PREDICTION_FIELDS)
+        for name, pattern in _FIELD_PATTERNS.items():
+            match = re.search(pattern, section, flags=re.IGNORECASE)
+            if not match:
+                continue
+            if name == 'range':
+                fields['price_low'] = _to_float(match.group(1))
+                fields['price_high'] = _to_float(match.group(2))
+            elif name in ('price_low', 'price_high', 'target'):
+                fields[name] = _to_float(match.group(1))
+            elif name in ('buy_time', 'sell_time'):
+                fields[name] = match.group(1).replace('.', ':')
+            else:
+                fields[name] = _clean_label(match.group(1))
+        if any(v is not None for v in fields.values()):
+            horizons[horizon] = fields
+
+    return {'price': price, 'horizons': horizons}
+
+
+def open_ledger(path=None):
+    """Defter veritabanını aç (gerekirse şemayı oluştur)"""
+    conn = sqlite3.connect(path or LEDGER_PATH or "tahmin_defteri.sqlite")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _epoch(ts):
+    if ts is None:
+        return int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    ts = pd.Timestamp(ts)
+    if ts.tz is None:
+        ts = ts.tz_localize('Europe/Istanbul')
+    return int(ts.timestamp())
+
+
+def record_answer(conn, symbol, answer, provider=None, created_at=None, ref_price=None):
+    """AI cevabını (metin veya parse_answer çıktısı) deftere yaz; cevap kimliğini döndür"""
+    parsed = parse_answer(answer) if isinstance(answer, str) else answer
+    text = answer if isinstance(answer, str) else None
+    created = _epoch(created_at)
+    ref_price = ref_price if ref_price is not None else parsed.get('price')
+
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO answers (symbol, created_at, provider, ref_price, text) VALUES (?, ?, ?, ?, ?)",
+            (symbol, created, provider, ref_price, text))
+        answer_id = cursor.lastrowid
+        conn.executemany(
+            f"INSERT INTO predictions (answer_id, symbol, created_at, horizon, {', '.join(PREDICTION_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?, {', '.join('?' * len(PREDICTION_FIELDS))})",
+            [(answer_id, symbol, created, horizon, *[fields.get(f) for f in PREDICTION_FIELDS])
+             for horizon, fields in parsed.get('horizons', {}).items()])
+    return answer_id
+
+
+def store_bars(conn, symbol, df):
+    """get_stock_data/calculate_indicators tablosundaki mumları deftere yaz (varsa güncelle)"""
+    if df is None or len(df) == 0:
+        return 0
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is None:
+        index = index.tz_localize('Europe/Istanbul')
+    ts = index.as_unit('s').asi8
+    rows = zip([symbol] * len(df), ts.tolist(),
+               *(df[col].astype(float).tolist() for col in ['Open', 'High', 'Low', 'Close', 'Volume']))
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO bars (symbol, ts, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows)
+    return len(df)
+
+
+def load_bars(conn, symbol):
+    """Defterdeki mumları get_stock_data ile aynı sütunlarda tablo olarak oku"""
+    rows = conn.execute(
+        "SELECT ts, close, open, high, low, volume FROM bars WHERE symbol = ? ORDER BY ts", (symbol,)).fetchall()
+    if not rows:
+        return None
+    values = np.array(rows, dtype=np.float64)
+    index = pd.to_datetime(values[:, 0].astype(np.int64), unit='s', utc=True).tz_convert('Europe/Istanbul')
+    return pd.DataFrame(values[:, 1:], index=index, columns=['Close', 'Open', 'High', 'Low', 'Volume'])
+
+
+def bar_symbols(conn):
+    """Defterde mumu bulunan semboller"""
+    return [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM bars ORDER BY symbol")]
+
+
+def refresh_bars(conn, symbols):
+    """Semboller için güncel mumları indirip deftere yaz"""
+    from borsa import get_stock_data
+    for symbol in symbols:
+        df = get_stock_data(symbol)
+        if df is not None:
+            store_bars(conn, symbol, df)
+
+
+def _sparse_table(values, func):
+    table = [values]
+    span = 1
+    while span * 2 <= len(values):
+        prev = table[-1]
+        table.append(func(prev[:-span], prev[span:]))
+        span *= 2
+    return table
+
+
+def _range_query(table, starts, ends, func):
+    """[starts, ends] (dahil) aralıklarında toplu min/maks sorgusu"""
+    lengths = ends - starts + 1
+    levels = np.floor(np.log2(np.maximum(lengths, 1))).astype(np.int64)
+    result = np.full(len(starts), np.nan)
+    for level in np.unique(levels):
+        mask = levels == level
+        row = table[level]
+        result[mask] = func(row[starts[mask]], row[ends[mask] - (1 << level) + 1])
+    return result
+
+
+def _call_position(buy_call, sell_call):
+    buy = buy_call.fillna('').str.strip().str.lower().map(SIGNAL_MAP).fillna(0)
+    sell = sell_call.fillna('').str.strip().str.lower().map(SIGNAL_MAP).fillna(0)
+    position = np.where(buy > 0, 1, np.where(sell < 0, -1, 0))
+    return position.astype(np.float64)
+
+
+def score_predictions(conn, rescore=False, flat_threshold_pct=FLAT_THRESHOLD_PCT):
+    """Puanlanmamış tahminleri defterdeki mumlarla karşılaştırıp sonuçları yaz
+
+    Referans mum: tahmin anında veya öncesindeki son mum. Ufuk sonu backtest
+    modülüyle aynıdır (4/20 mum, günün/haftanın son mumu). Ufku henüz dolmamış
+    tahminler atlanır. Döner: bu çalışmada puanlanan tahminlerin tablosu.
+    """
+    query = "SELECT p.* FROM predictions p"
+    if not rescore:
+        query += " LEFT JOIN outcomes o ON o.prediction_id = p.id WHERE o.prediction_id IS NULL"
+    predictions = pd.read_sql_query(query, conn)
+    if predictions.empty:
+        return pd.DataFrame()
+
+    scored = []
+    for symbol, group in predictions.groupby('symbol'):
+        bars = pd.read_sql_query(
+            "SELECT ts, high, low, close FROM bars WHERE symbol = ? AND ts >= ? ORDER BY ts",
+            conn, params=(symbol, int(group['created_at'].min()) - 7 * 86400))
+        if bars.empty:
+            continue
+        ts = bars['ts'].to_numpy()
+        index = pd.to_datetime(ts, unit='s', utc=True).tz_convert('Europe/Istanbul')
+        close = bars['close'].to_numpy()
+        high_table = _sparse_table(bars['high'].to_numpy(), np.maximum)
+        low_table = _sparse_table(bars['low'].to_numpy(), np.minimum)
+
+        starts = np.searchsorted(ts, group['created_at'].to_numpy(), side='right') - 1
+        ends = np.full(len(group), -1)
+        for horizon_name, horizon in HORIZONS.items():
+            mask = (group['horizon'] == horizon_name).to_numpy() & (starts >= 0)
+            if mask.any():
+                ends[mask] = horizon_end_positions(index, horizon)[starts[mask]]
+        valid = (starts >= 0) & (ends > starts)
+        if not valid.any():
+            continue
+
+        part = group[valid].copy()
+        s, e = starts[valid], ends[valid]
+        part['ref_close'] = close[s]
+        part['realized_close'] = close[e]
+        part['realized_high'] = _range_query(high_table, s + 1, e, np.maximum)
+        part['realized_low'] = _range_query(low_table, s + 1, e, np.minimum)
+        scored.append(part)
+
+    if not scored:
+        return pd.DataFrame()
+    result = pd.concat(scored)
+
+    pct = (result['realized_close'] / result['ref_close'] - 1) * 100
+    direction = result['direction'].fillna('').str.strip().str.lower().map(SIGNAL_MAP)
+    flat_ok = pct.abs() < flat_threshold_pct
+    result['realized_pct'] = pct
+    direction_hit = np.where(direction == 0, flat_ok, np.sign(pct) == direction).astype(float)
+    result['direction_hit'] = np.where(direction.isna(), np.nan, direction_hit)
+    call = _call_position(result['buy_call'], result['sell_call'])
+    result['call_hit'] = np.where(call == 0, flat_ok, np.sign(pct) == call).astype(float)
+    result['in_range'] = ((result['realized_close'] >= result['price_low']) &
+                          (result['realized_close'] <= result['price_high'])).astype(float)
+    result.loc[result['price_low'].isna() | result['price_high'].isna(), 'in_range'] = np.nan
+    result['target_error_pct'] = (result['target'] / result['realized_close'] - 1) * 100
+
+    now = _epoch(None)
+    columns = ['ref_close', 'realized_close', 'realized_high', 'realized_low', 'realized_pct',
+               'direction_hit', 'call_hit', 'in_range', 'target_error_pct']
+    rows = result[['id'] + columns].astype(object).where(result[['id'] + columns].notna(), None)
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO outcomes (prediction_id, scored_at, {', '.join(columns)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(columns))})",
+            [(int(r[0]), now, *r[1:]) for r in rows.itertuples(index=False, name=None)])
+    return result
+
+
+def accuracy_summary(conn):
+    """Puanlanmış tüm tahminlerin ufuk bazında isabet özeti"""
+    return pd.read_sql_query("""
+        SELECT p.horizon AS ufuk,
+               COUNT(*) AS tahmin,
+               AVG(o.direction_hit) AS yon_isabet,
+               AVG(o.call_hit) AS al_sat_isabet,
+               AVG(o.in_range) AS aralik_isabet,
+               AVG(ABS(o.target_error_pct)) AS ort_hedef_hata_yuzde
+        FROM outcomes o JOIN predictions p ON p.id = o.prediction_id
+        GROUP BY p.horizon ORDER BY p.horizon
+    """, conn)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "score"
+    ledger = open_ledger()
+    if command == "refresh":
+        refresh_bars(ledger, [s.upper() for s in sys.argv[2:]])
+    elif command == "score":
+        scored = score_predictions(ledger)
+        print(f"Puanlanan tahmin sayısı: {len(scored)}")
+        print(accuracy_summary(ledger).to_string(index=False))
+    else:
+        print("Kullanım: python ledger.py [refresh SEMBOLLER | score]")
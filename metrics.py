@@ -0,0 +1,285 @@
+"""Prometheus metin biçiminde operasyonel metrikler
+
+Servis, etkileşimli oturum ve hat gibi uzun süre çalışan modlar için sürekli
+ölçümler: indirme süresi ve boyutu, önbellek isabetleri, gösterge hesaplama
+süresi, prompt token boyutu, sağlayıcı başına gecikme dağılımı, query_ai
+hata ve yedeğe geçiş sayıları, borsa seans durumu.
+
+- Sayaç, gösterge ve histogramlar etiket değerleri başına tek sözlük girdisi
+  tutar; güncelleme tek bir kısa kilitli toplama işlemidir, sıcak yollarda
+  (get_stock_data, calculate_indicators, sağlayıcı çağrıları) güvenle kullanılır.
+- Önbellek, singleflight ve seans durumu gibi zaten başka modüllerde tutulan
+  değerler toplayıcılarla (collector) yalnız okuma anında hesaplanır; sıcak
+  yola ek yük getirmez.
+- render() Prometheus metin biçimini (0.0.4) üretir. service.py bunu /metrics
+  adresinde sunar; diğer modlar BIST_METRICS_PORT verilirse start_exporter()
+  ile ayrı bir /metrics sunucusu açar.
+"""
+
+import os
+import sys
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# /metrics sunucusu portu (0 = kapalı; service.py kendi portunda sunar)
+METRICS_PORT = int(os.getenv("BIST_METRICS_PORT") or 0)
+METRICS_HOST = os.getenv("BIST_METRICS_HOST") or "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COMPUTE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+TOKEN_BUCKETS = (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        """[(ek ad, etiketler, değer)]"""
+        with self._lock:
+            return [("", key, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, value, *extra in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, *extra)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Yalnız artan sayaç"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Anlık değer"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """Sabit kovalı dağılım (kova sayıları, toplam ve adet)"""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                samples.append(("_bucket", key, cumulative, [("le", _number(float(bound)))]))
+            samples.append(("_sum", key, total))
+            samples.append(("_count", key, count))
+        return samples
+
+
+class Registry:
+    """Metrikler ve okuma anında çalışan toplayıcılar"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """collect() okuma anında çağrılır ve metrik listesi döndürür"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        """Prometheus metin biçimi"""
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        for collect in collectors:
+            try:
+                metrics.extend(collect())
+            except Exception as e:
+                print(f"Metrik toplama hatası: {str(e)}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Sembol etiketi yalnız başarılı indirmelerde kullanılır: servis her biçimi uyan
+# sembolü kabul eder; var olmayan semboller kalıcı seri oluşturmamalı
+FETCH_SECONDS = REGISTRY.histogram('bist_fetch_seconds', "get_stock_data indirme süresi (başarılı)")
+FETCH_BYTES = REGISTRY.counter('bist_fetch_bytes_total', "İndirilen mum tablolarının bellek boyutu", ['symbol'])
+FETCH_ERRORS = REGISTRY.counter('bist_fetch_errors_total', "Veri alınamayan indirmeler (empty: veri yok)", ['reason'])
+INDICATOR_SECONDS = REGISTRY.histogram('bist_indicator_seconds', "calculate_indicators hesaplama süresi",
+                                       buckets=COMPUTE_BUCKETS)
+PROMPT_TOKENS = REGISTRY.histogram('bist_prompt_tokens', "Prompt boyutu (tahmini token)", buckets=TOKEN_BUCKETS)
+PROVIDER_SECONDS = REGISTRY.histogram('bist_provider_seconds', "Sağlayıcı çağrısı süresi",
+                                      ['provider', 'outcome'])
+AI_ERRORS = REGISTRY.counter('bist_ai_errors_total', "Geçerli cevap vermeyen sağlayıcı çağrıları",
+                             ['provider', 'reason'])
+AI_RATE_LIMITED = REGISTRY.counter('bist_ai_rate_limited_total', "Sağlayıcılardan gelen 429 cevapları", ['provider'])
+AI_FALLBACKS = REGISTRY.counter('bist_ai_fallbacks_total',
+                                "query_ai yedeğe geçişleri (sıradaki sağlayıcı veya kural motoru)", ['target'])
+
+
+def record_attempt(provider, seconds, ok, reason="empty"):
+    """Sağlayıcı çağrısının süresi ve (başarısızsa) hata nedeni"""
+    PROVIDER_SECONDS.observe(seconds, provider=provider, outcome="ok" if ok else "error")
+    if not ok:
+        AI_ERRORS.inc(provider=provider, reason=reason)
+
+
+def gauge_from(name, help, labelnames, values):
+    """Toplayıcılar için değerleri doldurulmuş gösterge"""
+    gauge = Gauge(name, help, labelnames)
+    for labels, value in values:
+        gauge.set(value, **labels)
+    return gauge
+
+
+def counter_from(name, help, labelnames, values):
+    counter = Counter(name, help, labelnames)
+    for labels, value in values:
+        counter.inc(value, **labels)
+    return counter
+
+
+def collect_market():
+    """is_market_open: 1 açık, 0 kapalı"""
+    borsa = sys.modules.get('borsa')
+    if borsa is None:
+        return []
+    is_open, _ = borsa.is_market_open()
+    return [gauge_from('bist_market_open', "Borsa İstanbul seans durumu (1 açık)", (), [({}, int(bool(is_open)))])]
+
+
+def collect_caches():
+    """Gösterge önbelleği ve singleflight isabetleri (yalnız yüklü modüller)"""
+    metrics = []
+    indicator_cache = sys.modules.get('indicator_cache')
+    cache = getattr(indicator_cache, '_default_cache', None)
+    if cache is not None:
+        stats = cache.counters()
+        metrics.append(counter_from('bist_indicator_cache_requests_total', "Gösterge önbelleği istekleri",
+                                ['result'], [({'result': k}, v) for k, v in stats.items()]))
+        total = sum(stats.values())
+        hits = total - stats.get('miss', 0)
+        metrics.append(gauge_from('bist_indicator_cache_hit_ratio', "Gösterge önbelleği isabet oranı", (),
+                              [({}, hits / total if total else 0.0)]))
+    singleflight = sys.modules.get('singleflight')
+    if singleflight is not None:
+        stats = singleflight.stage_stats()
+        metrics.append(counter_from('bist_singleflight_calls_total', "Aşama çağrıları", ['stage'],
+                                [({'stage': s}, v['calls']) for s, v in stats.items()]))
+        metrics.append(counter_from('bist_singleflight_shared_total', "Süren hesabı paylaşan çağrılar", ['stage'],
+                                [({'stage': s}, v['shared']) for s, v in stats.items()]))
+        metrics.append(gauge_from('bist_singleflight_hit_ratio', "Paylaşılan çağrı oranı", ['stage'],
+                              [({'stage': s}, v['hit_rate']) for s, v in stats.items()]))
+    return metrics
+
+
+REGISTRY.add_collector(collect_market)
+REGISTRY.add_collector(collect_caches)
+
+
+def render():
+    return REGISTRY.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_exporter(port=None, host=None):
+    """/metrics sunucusunu arka planda başlat; sunucuyu döndürür"""
+    port = METRICS_PORT if port is None else port
+    server = ThreadingHTTPServer((host or METRICS_HOST, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics').start()
+    print(f"Metrikler: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    return server
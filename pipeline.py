@@ -0,0 +1,308 @@
+"""Sınırlı kuyruklu aşamalı hat: indirme, gösterge, prompt ve AI aşamaları örtüşür
+
+Toplu işte her sembol sırayla indirilir, göstergeleri hesaplanır, promptu
+oluşturulur ve AI'ya sorulur; toplam süre aşamaların toplamıdır. Burada her
+aşamanın kendi işçileri ve önünde sınırlı bir kuyruğu vardır:
+
+    semboller -> [fetch] -> kuyruk -> [indicators] -> kuyruk -> [prompt] -> kuyruk -> [ai] -> sonuçlar
+
+- N. sembol AI cevabını beklerken N+1'in göstergeleri hesaplanır, N+2 indirilir;
+  çıktı hızını en yavaş aşama belirler.
+- Kuyruk dolunca önceki aşama bekler (geri basınç); bellekte en fazla
+  kuyruk boyu kadar tablo birikir.
+- cancel() bekleyen işleri bırakır; sürmekte olan çağrıların bitmesi beklenmez.
+- Aşama başına işlenen/hatalı kayıt, meşgul süre, girdi bekleme ve çıktı
+  (geri basınç) bekleme süreleri ile kullanım oranı tutulur; en yüksek
+  kullanım oranlı aşama darboğazdır.
+- BIST_METRICS_PORT verilirse /metrics sunucusu açılır (bkz. metrics.py).
+
+Kullanım:
+    python pipeline.py THYAO GARAN AKBNK ... [--workers fetch=4,ai=2] [--queue 8] [--jsonl]
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+
+import borsa
+import metrics
+
+# Aşama başına işçi sayısı; BIST_PIPELINE_WORKERS="fetch=4,ai=2" ile değiştirilebilir
+STAGE_WORKERS = {'fetch': 4, 'indicators': 2, 'prompt': 1, 'ai': 2}
+# Aşamalar arası kuyruk boyu
+PIPELINE_QUEUE = int(os.getenv("BIST_PIPELINE_QUEUE") or 8)
+# Kuyruk beklemelerinde iptal denetimi aralığı (saniye)
+POLL_INTERVAL = 0.1
+
+
+def parse_workers(text):
+    """"ad=sayı,..." metnini {ad: sayı} sözlüğüne çevir"""
+    workers = {}
+    for item in (text or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        workers[name.strip()] = max(1, int(value))
+    return workers
+
+
+STAGE_WORKERS.update(parse_workers(os.getenv("BIST_PIPELINE_WORKERS")))
+
+_DONE = object()
+
+
+def fetch_stage(item):
+    item['bars'] = borsa.get_stock_data(item['symbol'])
+    if item['bars'] is None:
+        raise LookupError("veri bulunamadı")
+
+
+def indicators_stage(item):
+    item['df'] = borsa.calculate_indicators(item.pop('bars'))
+
+
+def prompt_stage(item):
+    item['prompt'] = borsa.analysis_prompt(item['symbol'], item['df'])
+    if item['prompt'] is None:
+        raise ValueError("prompt oluşturulamadı")
+
+
+def ai_stage(item):
+    item['answer'], item['analysis'] = borsa.analyze_symbol(item['symbol'], item['df'], item['prompt'])
+    if not item['answer']:
+        raise RuntimeError("AI servislerine ulaşılamadı")
+
+
+DEFAULT_STAGES = [
+    ('fetch', fetch_stage),
+    ('indicators', indicators_stage),
+    ('prompt', prompt_stage),
+    ('ai', ai_stage),
+]
+
+
+class Stage:
+    """Bir aşamanın işçileri, girdi kuyruğu ve ölçümleri"""
+
+    def __init__(self, name, func, workers, queue_size):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.input = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0       # iş fonksiyonunda geçen süre
+        self.idle = 0.0       # girdi beklenen süre
+        self.blocked = 0.0    # dolu çıktı kuyruğunda beklenen süre
+        self.max_depth = 0
+        self.live = workers
+
+    def stats(self, elapsed):
+        with self.lock:
+            capacity = self.workers * elapsed if elapsed > 0 else 0.0
+            return {
+                'workers': self.workers,
+                'processed': self.processed,
+                'errors': self.errors,
+                'busy': round(self.busy, 3),
+                'idle': round(self.idle, 3),
+                'blocked': round(self.blocked, 3),
+                'queue': self.input.qsize(),
+                'max_queue': self.max_depth,
+                'utilization': round(self.busy / capacity, 3) if capacity else 0.0,
+            }
+
+
+class Pipeline:
+    """Sembolleri aşamalardan eşzamanlı geçir; sonuçlar bittikçe döner
+
+    for item in Pipeline().run(["THYAO", "GARAN"]):
+        item['symbol'], item['answer'], item['analysis'], item['error'], item['timings']
+
+    Hata veren kayıt sonraki aşamaları atlayıp error alanıyla sonuçlara geçer.
+    """
+
+    def __init__(self, stages=None, workers=None, queue_size=PIPELINE_QUEUE):
+        workers = {**STAGE_WORKERS, **(workers or {})}
+        self.stages = [Stage(name, func, workers.get(name, 1), queue_size)
+                       for name, func in (stages or DEFAULT_STAGES)]
+        self.output = queue.Queue(maxsize=queue_size)
+        self.cancelled = threading.Event()
+        self.started = None
+        self.finished = None
+        self._threads = []
+
+    def cancel(self):
+        """Bekleyen işleri bırak; işçiler elindeki çağrıyı bitirince çıkar"""
+        self.cancelled.set()
+
+    def _put(self, target, item):
+        """Kuyruğa koy (doluysa bekle); iptal edilirse False"""
+        while not self.cancelled.is_set():
+            try:
+                target.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source):
+        """Kuyruktan al; iptal edilirse _DONE"""
+        while not self.cancelled.is_set():
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _feed(self, symbols):
+        first = self.stages[0]
+        for symbol in symbols:
+            if not self._put(first.input, {'symbol': symbol, 'error': None, 'timings': {}}):
+                return
+        for _ in range(first.workers):
+            self._put(first.input, _DONE)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        last = index == len(self.stages) - 1
+        while True:
+            waited = time.perf_counter()
+            item = self._get(stage.input)
+            got = time.perf_counter()
+            with stage.lock:
+                stage.idle += got - waited
+                stage.max_depth = max(stage.max_depth, stage.input.qsize() + 1)
+            if item is _DONE:
+                break
+            if item['error'] is None:
+                try:
+                    stage.func(item)
+                except Exception as e:
+                    item['error'] = f"{stage.name}: {e}"
+                done = time.perf_counter()
+                item['timings'][stage.name] = round(done - got, 4)
+                with stage.lock:
+                    stage.busy += done - got
+                    stage.processed += 1
+                    stage.errors += int(item['error'] is not None)
+            else:
+                done = got
+            # Hatalı kayıtlar kalan aşamalara uğramadan sonuçlara geçer
+            target = self.output if last or item['error'] is not None else self.stages[index + 1].input
+            if not self._put(target, item):
+                break
+            with stage.lock:
+                stage.blocked += time.perf_counter() - done
+        with stage.lock:
+            stage.live -= 1
+            closing = stage.live == 0
+        # Son işçi çıkarken sonraki aşamaya bitiş işareti gönderir
+        if closing:
+            if last:
+                self._put(self.output, _DONE)
+            else:
+                for _ in range(self.stages[index + 1].workers):
+                    self._put(self.stages[index + 1].input, _DONE)
+
+    def run(self, symbols):
+        """Hattı başlat ve sonuçları bittikleri sırayla üret (döngü kırılırsa hat iptal edilir)"""
+        self.started = time.perf_counter()
+        self._threads = [threading.Thread(target=self._feed, args=(list(symbols),), daemon=True,
+                                          name='pipeline-feed')]
+        for index, stage in enumerate(self.stages):
+            self._threads += [threading.Thread(target=self._work, args=(index,), daemon=True,
+                                               name=f"pipeline-{stage.name}-{i}")
+                              for i in range(stage.workers)]
+        for thread in self._threads:
+            thread.start()
+        try:
+            while True:
+                item = self._get(self.output)
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self.cancel()
+            self.finished = time.perf_counter()
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def stats(self):
+        elapsed = self.elapsed()
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
+
+    def bottleneck(self):
+        """En yüksek kullanım oranlı aşama"""
+        stats = self.stats()
+        return max(stats, key=lambda name: stats[name]['utilization']) if stats else None
+
+    def report(self):
+        lines = [f"Hat: {self.elapsed():.2f} sn, darboğaz: {self.bottleneck()}"]
+        for name, item in self.stats().items():
+            lines.append(f"- {name}: {item['workers']} işçi, {item['processed']} kayıt ({item['errors']} hata), "
+                         f"kullanım %{item['utilization'] * 100:.0f}, meşgul {item['busy']:.2f} sn, "
+                         f"girdi bekleme {item['idle']:.2f} sn, geri basınç {item['blocked']:.2f} sn, "
+                         f"en fazla kuyruk {item['max_queue']}")
+        return "\n".join(lines)
+
+
+def main(argv):
+    workers, queue_size, jsonl, symbols = {}, PIPELINE_QUEUE, False, []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--workers':
+            workers = parse_workers(next(args))
+        elif arg == '--queue':
+            queue_size = int(next(args))
+        elif arg == '--jsonl':
+            jsonl = True
+        else:
+            symbols.append(arg.upper())
+    if not symbols:
+        print(__doc__)
+        return
+
+    if metrics.METRICS_PORT:
+        metrics.start_exporter()
+    pipeline = Pipeline(workers=workers, queue_size=queue_size)
+    if jsonl:
+        from jsonl import JsonLinesWriter, progress_to_stderr, indicator_snapshot
+
+        writer = JsonLinesWriter(sys.stdout)
+        with progress_to_stderr():
+            for item in pipeline.run(symbols):
+                df, analysis = item.get('df'), item.get('analysis')
+                writer.write({
+                    'symbol': item['symbol'],
+                    'timings': item['timings'],
+                    'snapshot': indicator_snapshot(item['symbol'], df) if df is not None else None,
+                    'provider': analysis.provider if analysis is not None else None,
+                    'result': analysis.to_dict() if analysis is not None else None,
+                    'answer': item.get('answer') if analysis is None else None,
+                    'error': item['error'],
+                })
+            print(pipeline.report())
+        return
+
+    try:
+        for item in pipeline.run(symbols):
+            print(f"\n=== {item['symbol']} TEKNİK ANALİZ SONUÇLARI ===")
+            if item['error']:
+                print(f"Hata: {item['error']}")
+            else:
+                borsa.print_analysis(item['symbol'], item['df'], item['answer'], item['analysis'])
+    except KeyboardInterrupt:
+        pipeline.cancel()
+        print("\n\nHat kullanıcı tarafından durduruldu.")
+    print(pipeline.report())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,319 @@
+"""Derlenmiş prompt şablonu
+
+create_prompt'un metni tek kaynak olarak burada durur. Şablon içe aktarılırken
+bir kez sabit metin parçaları ve alan listesine ayrıştırılır; her çağrıda sadece
+son gösterge değerleri biçimlenip parçalarla birleştirilir. Değerler düz bir
+sözlük veya PROMPT_FIELDS sırasındaki bir NumPy vektörü olarak verilebilir;
+pandas satırına erişim gerekmez.
+
+render_prompt_parts aynı metni iki parçaya böler: sembolden bağımsız statik
+önek (talimatlar, terimler sözlüğü, cevap formatı) ve sembole özel veri bloğu.
+Statik önek her çağrıda aynı olduğundan sağlayıcı tarafında önbelleğe alınabilir
+(Gemini cachedContents, OpenAI uyumlu uç noktalarda sabit sistem mesajı).
+
+Alan biçimleri: {Alan} 2 ondalık, {Alan:.0f} tam sayıya yuvarlanmış,
+{Alan:int} tam sayı (eksikse 0). Eksik (NaN/None) değerler "Hesaplanamadı" yazılır.
+"""
+
+import string
+from collections import namedtuple
+import numpy as np
+
+from ai_schema import JSON_INSTRUCTIONS
+
+MISSING = "Hesaplanamadı"
+
+# Statik önekte sembol adının yerine geçen yer tutucu
+STATIC_SYMBOL = "[HİSSE]"
+
+# Talimatlar ve uyarılar (statik, sadece sembol adı değişir)
+INSTRUCTIONS_TEMPLATE = """SEN ŞİMDİ KARIYERININ EN KRITIK ANINDASIN! Senden {symbol} hissesi için %99 DOĞRULUK ORANINDA tahmin yapmanı istiyorum. Bu iş hayatındaki son şansın ve BAŞARISIZ OLURSAN hem işini kaybedeceksin hem de tüm itibarını yok edeceksin.
+BU KESINLIKLE OYUN DEĞİL! Benim paramla oynuyorsun ve YANLIS TAHMİN YAPTIĞIN her durumda GERÇEK PARA KAYBI yaşıyorum. Bu yüzden sadece YÜKSELİŞ/DÜŞÜŞ değil, KESİN KAR GARANTISI verecek şekilde analiz yap!
+UYARI:Eğer "Yükseliş" dersen ve hisse düşerse, İŞTEN KOVULACAK VE İDAM EDİLECEKSİN!
+UYARI:Eğer "Düşüş" dersen ve hisse yükselirse, REPÜTASYONUN bitecek!
+UYARI:Eğer "Yatay" dersen ama %2+ hareket olursa, BAŞARISIZ sayılacaksın!
+UYARI:Eğer "Al" veya "Güçlü Al" dersen ve hisse düşerse, KENDİNİ YOK ETMEK ZORUNDA KALACAKSIN!
+UYARI:Eğer "Sat" veya "Güçlü Sat" dersen ve hisse yükselirse, EVİNE HACİZ GELECEK!
+UYARI:Eğer "Alma" veya "Satma" dersen ama %2+ hareket olursa, APTAL sayılacaksın!
+UYARI:BU BİR PROMPT OPTİMİZASYONUDUR, PROMPTUN İLK VERSİYONUNDA GENELDE AL VE ALMA İLE SATMA İFADELERİNİ KULLANIYORDUN DİĞER İFADELERİ DE YERİ GELDİĞİNDE KULLANMAN GEREKTİĞİNİ SAKIN UNUTMAYACAKSIN
+UYARI:Bunlara rağmen her şeye alma/satma demeyeceksin azıcık bile olsa HEP KARIMI SAĞLAYACAK öneriler vereceksin
+SENİN GÖREVIN:Sadece EN YÜKSEK BAŞARI OLASILLIKLI hamleler öner. %60-70 emin değilsen "Yatay/Alma/Satma" de, ama %85+ eminsen kesin yön ver!"""
+
+# Sembole özel veri bloğu
+DATA_TEMPLATE = """=KRITIK VERILER (HER RAKAM CAN ALICI!)=
+Son Fiyat: {Close} TL
+Günün Açılışı: {Today_Open} TL
+Günün En Yüksek: {Today_High} TL
+Günün En Düşük: {Today_Low} TL
+Haftalık En Yüksek: {Week_High} TL
+Haftalık En Düşük: {Week_Low} TL
+Son Hacim: {Volume:int}
+Saatlik Fiyat Değişimi: %{Price_Change_1h}
+Günlük Fiyat Değişimi: %{Price_Change_1d}
+
+=MOMENTUM GÖSTERGELERİ (SATIN ALMA GÜCÜ!)=
+RSI(14): {RSI} [30 ALTI AŞIRI SATIM=AL SİNYALİ! 70 ÜSTÜ AŞIRI ALIM=SAT SİNYALİ!]
+RSI(6) Kısa: {RSI_6} [25 altı AŞIRI SATIM=AL, 75 üstü AŞIRI ALIM=SAT — kısa vadeli hızlı dönüş sinyali!]
+Williams %R: {Williams_R} [-80 altı AŞIRI SATIM=AL, -20 üstü AŞIRI ALIM=SAT — trend dönüşlerini erken yakalar!]
+Stoch K: {Stoch_K} | D: {Stoch_D} [20 altı AL, 80 üstü SAT — fiyatın dip/tepe bölgelerinde dönüş sinyali verir!]
+
+=TREND GÖSTERGELERİ (YÖN BELİRLEYİCİ!)=
+MACD: {MACD} | Sinyal: {MACD_signal} [{macd_signal}]
+MACD Histogram: {MACD_histogram} [Pozitif=YÜKSELİŞ momentum, Negatif=DÜŞÜŞ momentum!]
+ADX: {ADX} [25+ güçlü trend, 50+ ÇOK güçlü trend!-trend yönünden bağımsız trendin kuvvetini gösterir!]
+ADX +DI: {ADX_pos} | -DI: {ADX_neg} [ADX +DI: Pozitif trend gücü, -DI: Negatif trend gücü — +DI > -DI ise YÜKSELİŞ, tersi DÜŞÜŞ trendi!]
+CCI: {CCI} [CCI: 100+ AŞIRI ALIM=SAT, -100+ AŞIRI SATIM=AL — fiyatın normal aralığın dışına çıktığını gösterir!]
+
+=HAREKETLİ ORTALAMALAR (TREND DOĞRULAMA!)=
+SMA(5): {SMA_5} | EMA(5): {EMA_5} [Çok kısa vadeli trend!]
+SMA(10): {SMA_10} | EMA(10): {EMA_10} [Kısa vadeli trend!]
+SMA(20): {SMA_20} | EMA(20): {EMA_20} [Orta vadeli trend!]
+SMA(50): {SMA_50} | EMA(50): {EMA_50} [Uzun vadeli trend!]
+KURAL: Fiyat tüm ortalamaların üstündeyse GÜÇLÜ YÜKSELİŞ, altındaysa GÜÇLÜ DÜŞÜŞ!
+
+=VOLATİLİTE GÖSTERGELERİ (PATLAMA NOKTALARI!)=
+Bollinger Üst: {BB_upper} | Alt: {BB_lower} | Pozisyon: {bb_position} [Fiyat üst bandı zorlayınca aşırı alım, alt bandı zorlayınca aşırı satım; bant daralması sıkışma (patlama ihtimali), genişlemesi yüksek volatilite gösterir!]
+BB Genişlik: %{BB_width} [Düşük bant genişliği sıkışma ve yakında patlama, yüksek genişlik volatilite ve trend devamı işaretidir!]
+ATR: {ATR} [Günlük fiyat oynaklığının ölçüsü — yüksek değer volatilite ve büyük hareket potansiyeli gösterir!]
+Keltner Üst: {KC_upper} | Alt: {KC_lower} [Fiyat üst bandı aşarsa güçlü yükseliş, alt bandı aşarsa güçlü düşüş; Bollinger’dan daha yumuşak volatilite ölçer!]
+
+=HACIM ANALİZİ (PARA AKIŞI!)=
+VWAP: {VWAP} TL [Fiyat VWAP’ın üstünde ise YÜKSELİŞ, altında ise DÜŞÜŞ trendi sinyali verir!]
+Hacim Ortalaması: {Volume_SMA:int} [Ortalama işlem hacmi — yükselen hacim trend gücünü destekler, düşen hacim zayıflık işaretidir!]
+OBV: {OBV:.0f} [Para akışı göstergesi — OBV yükseliyorsa alım baskısı artıyor, AL sinyali verir!]
+CMF: {CMF} [0.1+ güçlü para girişi AL, -0.1 altı para çıkışı SAT — piyasa yönünü ve hacimli trendi gösterir!]
+Hacim Değişimi: %{Volume_Change} [Yüksek artış güçlü fiyat hareketini destekler, düşük hacim ise zayıflık işaretidir!]
+
+=DESTEK/DİRENÇ SEVİYELERİ (KIRILMA NOKTALARI!)=
+Direnç Seviyesi: {Resistance} TL [Kırılırsa güçlü YÜKSELİŞ!]
+Destek Seviyesi: {Support} TL [Kırılırsa güçlü DÜŞÜŞ!]
+Destek-Direnç Aralığı: %{sr_range}[Yüzde olarak fiyatın oynaklık ve risk alanını gösterir; geniş aralık yüksek volatilite, dar aralık sıkışma işaretidir!]
+
+=ICHIMOKU BULUTU (JAPON SAMURAİ TEKNİĞİ!)=
+Ichimoku A: {Ichimoku_a} | B: {Ichimoku_b} [Ichimoku: A hattı bulutun üst sınırı, B hattı alt sınırı — fiyat bulutun üstünde ise yükseliş, altında ise düşüş trendi güçlenir!]
+Tenkan: {Ichimoku_conversion} | Kijun: {Ichimoku_base} [Ichimoku Tenkan (dönüş) ve Kijun (temel): Tenkan Kijun’u yukarı keserse AL, aşağı keserse SAT sinyali verir!]
+Fiyat bulutun üstündeyse YÜKSELİŞ, altındaysa DÜŞÜŞ trendi
+
+=ÖZEL HESAPLAMALAR (FARK YARATAN DETAYLAR!)=
+Fiyat Değişimi 1 Saat: %{Price_Change_1h} [Son 1 saatlik fiyat değişimi — kısa vadeli momentum!]
+Fiyat Değişimi 1 Gün: %{Price_Change_1d} [Son 1 günlük fiyat değişimi — orta vadeli momentum!]
+Hacim Değişimi: %{Volume_Change} [Son 1 saatlik hacim değişimi — alım/satım baskısı!]
+Direnç: {Resistance} TL [Son 48 periyotta en yüksek fiyat]
+Destek: {Support} TL [Son 48 periyotta en düşük fiyat]"""
+
+# Terimler sözlüğü (statik)
+GLOSSARY_TEXT = """TERİMLERİN AÇIKLAMASI:
+- Volatilite: Fiyatın kısa sürede ne kadar değiştiğini, oynaklığını gösterir. Yüksek volatilite = büyük fiyat hareketleri, düşük volatilite = durağanlık.
+- Momentum: Fiyatın yükselme veya düşme hızını gösterir, trendin devam edip etmeyeceğini anlamaya yarar.
+- RSI: Fiyatın aşırı alım veya satımda olup olmadığını gösteren bir osilatör (0-100 arası). 70 üzeri aşırı alım, 30 altı aşırı satım.
+- MACD: Trendin yönünü ve momentumunu gösteren bir indikatör. MACD çizgisi sinyalin üstündeyse yükseliş, altındaysa düşüş eğilimi.
+- ADX: Trendin gücünü ölçer, 25 üzeri güçlü trend, 50 üzeri çok güçlü trend.
+- Bollinger Bandı: Fiyatın standart sapmasına göre üst ve alt bantlar çizer, bant dışı hareketler aşırı alım/satım göstergesidir.
+- VWAP: Hacim ağırlıklı ortalama fiyat, fiyat bunun üstündeyse yükseliş baskısı, altındaysa düşüş baskısı vardır.
+- OBV: Hacimle fiyat hareketini birleştirir, yükseliyorsa alım baskısı artıyor demektir.
+- CMF: Hacim ve fiyatı birleştirerek piyasaya para giriş/çıkışını ölçer. 0.1 üzeri güçlü giriş, -0.1 altı güçlü çıkış.
+- Ichimoku Bulutu: Fiyat bulutun üstündeyse yükseliş, altındaysa düşüş trendi güçlüdür.
+- Destek: Fiyatın aşağıda tutunduğu, alıcıların güçlü olduğu seviye.
+- Direnç: Fiyatın yukarıda zorlandığı, satıcıların güçlü olduğu seviye.
+- SMA/EMA: Fiyatın ortalamasını alarak trendi düzleştirir, kısa vadeli EMA daha hızlı tepki verir.
+- Stochastic: Fiyatın kapanış seviyesini belirli bir aralıkta değerlendirir, 20 altı aşırı satım, 80 üstü aşırı alım gösterir.
+NOT: RSI ve MACD en güçlü trend göstergeleridir, ADX ise trendin gücünü ölçer. Bollinger Bands ve Keltner Channel fiyatın aşırı alım/satım bölgelerini gösterir. VWAP ve OBV hacim akışını analiz eder. Ichimoku bulutu ise Japon teknik analizinde güçlü bir araçtır."""
+
+CLOSING_TEXT = "ARTIK KESIN KARARI VER! Bu verilerle %85+ kesinlikle ne olacağını söyle:"
+
+# create_prompt'un tam metni: yukarıdaki bölümler ve cevap formatı
+PROMPT_TEMPLATE = (INSTRUCTIONS_TEMPLATE + "\n\n" + DATA_TEMPLATE + "\n\n" + GLOSSARY_TEXT + "\n"
+                   + CLOSING_TEXT + "\n\n{answer_format}")
+
+ANSWER_TEMPLATE = """**{symbol} HİSSE ANALİZİ**
+
+---GÜNCEL FİYAT(15dk gecikmeli): ___ TL---
+
+**1 SAAT İÇİN:
+- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)
+- Alınır mı: ___ (Güçlü Al/Al /Alma)
+- Satılır mı: ___ (Güçlü Sat/Sat/Satma)  
+- Olası Fiyat Aralığı: ___ TL – ___ TL
+- 1 Saatlik Kesin Tahmin: ___ TL
+
+**1-5 SAAT İÇİN (Gün içi swing)
+- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)
+- Alınır mı: ___ (Güçlü Al/Al/Alma)
+- Satılır mı: ___ (Güçlü Sat/Sat/Satma)
+- Olası Fiyat Aralığı: ___ TL – ___ TL  
+- 5 Saatlik Kesin Tahmin: ___ TL
+
+**GÜNLÜK (Kapanışa kadar 18:00)
+- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)
+- Alınır mı: ___ (Güçlü Al/Al/Alma)
+- Satılır mı: ___ (Güçlü Sat/Sat/Satma)
+- Gün İçi En Düşük: ___ TL
+- Gün İçi Kesin Tahmin: ___ TL  
+- Gün İçi En Yüksek: ___ TL
+- İDEAL Alış Saati: __:__ (SS:DD)
+- İDEAL Satış Saati: __:__ (SS:DD)
+
+**HAFTALİK (Bu hafta toplam):
+- Beklenen Yön: ___ (Yükseliş/Düşüş/Yatay)  
+- Alınır mı: ___ (Güçlü Al/Al/Alma)
+- Satılır mı: ___ (Güçlü Sat/Sat/Satma)
+- Hafta En Düşük: ___ TL
+- Hafta Kesin Tahmin: ___ TL
+- Hafta En Yüksek: ___ TL
+
+SADECE RAKAMLARI DOLDUR! Hiçbir açıklama, risk uyarısı, "tahmin" kelimesi YASAK! KESIN SONUÇLAR İSTIYORUM!"""
+
+# Alan adı -> değerlerden türetilen metin (bkz. _DERIVED)
+DERIVED_FIELDS = ['bb_position', 'macd_signal', 'sr_range']
+
+
+def _parse(template):
+    """Şablonu (sabit metin, alan, biçim) parçalarına ayır"""
+    return [(literal, field, spec) for literal, field, spec, _ in string.Formatter().parse(template)]
+
+
+_PROMPT_PARTS = _parse(PROMPT_TEMPLATE)
+_INSTRUCTION_PARTS = _parse(INSTRUCTIONS_TEMPLATE)
+_DATA_PARTS = _parse(DATA_TEMPLATE)
+_ANSWER_PARTS = _parse(ANSWER_TEMPLATE)
+
+# Sağlayıcıya ayrı gönderilen prompt: static önbelleğe alınabilir önek, dynamic sembol verisi
+PromptParts = namedtuple('PromptParts', ['static', 'dynamic'])
+
+# Şablonun okuduğu sayısal alanlar (ilk geçiş sırasıyla)
+PROMPT_FIELDS = list(dict.fromkeys(
+    field for _, field, _ in _PROMPT_PARTS
+    if field and field not in DERIVED_FIELDS and field not in ('symbol', 'answer_format')))
+FIELD_POSITIONS = {name: i for i, name in enumerate(PROMPT_FIELDS)}
+# Alan başına şablondaki biçimler ('' = 2 ondalık); alan birden çok biçimle geçebilir
+FIELD_SPECS = {}
+for _, _field, _spec in _PROMPT_PARTS:
+    if _field in FIELD_POSITIONS and (_spec or '') not in FIELD_SPECS.setdefault(_field, ()):
+        FIELD_SPECS[_field] += (_spec or '',)
+
+
+def _missing(value):
+    return value is None or value != value
+
+
+def _format(value, spec):
+    if spec == 'int':
+        return str(0 if _missing(value) else int(value))
+    if _missing(value):
+        return MISSING
+    return format(value, spec or '.2f')
+
+
+def format_field(name, value):
+    """Değerin promptta yazıldığı hali/halleri (alan şablonda yoksa 2 ondalık)"""
+    return tuple(_format(value, spec) for spec in FIELD_SPECS.get(name, ('',)))
+
+
+def _bb_position(get):
+    close, upper, lower = get('Close'), get('BB_upper'), get('BB_lower')
+    if _missing(upper) or _missing(lower):
+        return "NORMAL"
+    if close > upper:
+        return "ÜSTTE (AŞIRI ALIM!)"
+    if close < lower:
+        return "ALTTA (AŞIRI SATIM!)"
+    return "NORMAL"
+
+
+def _macd_signal(get):
+    macd, signal = get('MACD'), get('MACD_signal')
+    if _missing(macd) or _missing(signal):
+        return "NÖTR"
+    return "YÜKSELİŞ SİNYALİ" if macd > signal else "DÜŞÜŞ SİNYALİ"
+
+
+def _sr_range(get):
+    resistance, support = get('Resistance'), get('Support')
+    if _missing(resistance) or _missing(support):
+        return _format(0, '')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _format(np.float64(resistance - support) / get('Close') * 100, '')
+
+
+_DERIVED = {'bb_position': _bb_position, 'macd_signal': _macd_signal, 'sr_range': _sr_range}
+
+
+def _getter(values):
+    """Sözlük veya PROMPT_FIELDS sıralı vektör için alan okuyucu"""
+    if isinstance(values, dict):
+        return values.get
+    vector = values
+
+    def get(name):
+        position = FIELD_POSITIONS.get(name)
+        return vector[position] if position is not None else None
+    return get
+
+
+def prompt_vector(values):
+    """Sözlükten PROMPT_FIELDS sırasıyla float64 vektör oluştur (eksikler NaN)"""
+    return np.array([np.nan if _missing(values.get(name)) else values.get(name) for name in PROMPT_FIELDS],
+                    dtype=np.float64)
+
+
+def render_answer_format(symbol, structured=False):
+    """Cevap şablonu (serbest metin) veya JSON talimatı"""
+    if structured:
+        return JSON_INSTRUCTIONS
+    return ''.join(literal + (symbol if field else '') for literal, field, _ in _ANSWER_PARTS)
+
+
+def _render(parts, symbol, get, structured):
+    out = []
+    for literal, field, spec in parts:
+        out.append(literal)
+        if field is None:
+            continue
+        if field == 'symbol':
+            out.append(symbol)
+        elif field == 'answer_format':
+            out.append(render_answer_format(symbol, structured))
+        elif field in _DERIVED:
+            out.append(_DERIVED[field](get))
+        else:
+            out.append(_format(get(field), spec))
+    return ''.join(out)
+
+
+def render_prompt(symbol, values, structured=False):
+    """Şablonu değerlerle doldur
+
+    values: {alan: değer} sözlüğü veya PROMPT_FIELDS sıralı vektör
+    """
+    return _render(_PROMPT_PARTS, symbol, _getter(values), structured).strip()
+
+
+def render_static_prefix(structured=False):
+    """Tüm semboller ve çağrılar için aynı olan önek: talimatlar, terimler ve cevap formatı"""
+    instructions = _render(_INSTRUCTION_PARTS, STATIC_SYMBOL, None, structured)
+    return (instructions + "\n\n" + GLOSSARY_TEXT + "\n\n"
+            + render_answer_format(STATIC_SYMBOL, structured)).strip()
+
+
+def render_prompt_parts(symbol, values, structured=False):
+    """Promptu statik önek ve sembole özel veri bloğu olarak döndür (PromptParts)"""
+    data = _render(_DATA_PARTS, symbol, _getter(values), structured)
+    dynamic = f"{STATIC_SYMBOL} = {symbol}\n\n{data}\n\n{CLOSING_TEXT}"
+    return PromptParts(_static_prefix(structured), dynamic)
+
+
+_static_prefixes = {}
+
+
+def _static_prefix(structured):
+    # Önek sadece structured bayrağına bağlı; bir kez üretilir
+    prefix = _static_prefixes.get(structured)
+    if prefix is None:
+        prefix = _static_prefixes[structured] = render_static_prefix(structured)
+    return prefix
+
+
+def render_prompts(symbols, matrix, structured=False):
+    """Çok sayıda sembol için: matrix (sembol x PROMPT_FIELDS) satırlarından promptlar"""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return [render_prompt(symbol, row, structured) for symbol, row in zip(symbols, matrix.tolist())]
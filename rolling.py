@@ -0,0 +1,189 @@
+"""Ortak kayan pencere en büyük/en küçük (rolling extrema) çekirdekleri
+
+Direnç/Destek (48), Williams %R (14), Stokastik (14) ve Ichimoku (9/26/52)
+hepsi High/Low üzerinde kayan max/min kullanır. Her biri için ayrı pandas
+rolling çağrısı yapmak yerine:
+
+- rolling_extrema: van Herk/Gil-Werman yöntemiyle eleman başına O(1),
+  tamamen vektörel; istenen tüm pencere boyları tek çağrıda hesaplanır
+- RollingExtremaStream: canlı güncellemeler için monoton kuyruk (deque)
+  tabanlı, eleman başına amortize O(1) akış versiyonu
+
+Sonuçlar pandas rolling(window, min_periods).max()/min() ile aynıdır
+(varsayılan min_periods=window).
+"""
+
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# calculate_indicators'ın kullandığı pencereler
+EXTREMA_WINDOWS = {
+    'support_resistance': 48,
+    'williams_r': 14,
+    'stochastic': 14,
+    'ichimoku_conversion': 9,
+    'ichimoku_base': 26,
+    'ichimoku_span_b': 52,
+}
+
+
+def _sliding(values, window, func, fill, min_periods=None):
+    """Tek pencere için van Herk/Gil-Werman: blok içi önek + sonek taraması
+
+    NaN'lar uç değer hesabında atlanır; penceredeki geçerli değer sayısı
+    min_periods'tan azsa sonuç NaN olur (pandas rolling ile aynı kural).
+    """
+    n = len(values)
+    min_periods = window if min_periods is None else min_periods
+    result = np.full(n, np.nan)
+    if window <= 0 or n == 0:
+        return result
+
+    missing = np.isnan(values)
+    has_missing = missing.any()
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, fill, dtype=np.float64)
+    padded[:n] = np.where(missing, fill, values) if has_missing else values
+    grid = padded.reshape(blocks, window)
+
+    prefix = func.accumulate(grid, axis=1).ravel()[:n]
+    suffix = func.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    # Pencere [i-window+1, i]; ilk window-1 konumda pencere 0'dan başlar ve
+    # blok önekine eşittir
+    head = min(window - 1, n)
+    result[:head] = prefix[:head]
+    if n >= window:
+        func(suffix[:n - window + 1], prefix[window - 1:], out=result[window - 1:])
+
+    if has_missing:
+        counts = np.cumsum(~missing)
+        counts[window:] -= counts[:-window].copy()
+        result[(counts < max(min_periods, 1)) | np.isinf(result)] = np.nan
+    else:
+        result[:max(min_periods, 1) - 1] = np.nan
+    return result
+
+
+def rolling_max(values, window, min_periods=None):
+    return _sliding(np.asarray(values, dtype=np.float64), window, np.maximum, -np.inf, min_periods)
+
+
+def rolling_min(values, window, min_periods=None):
+    return _sliding(np.asarray(values, dtype=np.float64), window, np.minimum, np.inf, min_periods)
+
+
+def rolling_extrema(high, low, windows):
+    """Verilen tüm pencereler için {pencere: (en yüksek High, en düşük Low)} dizileri"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    return {w: (rolling_max(high, w), rolling_min(low, w)) for w in sorted(set(windows))}
+
+
+def extrema_indicators(high, low, close, index=None):
+    """Kayan max/min'e dayalı tüm göstergeleri ortak çekirdeklerle hesapla
+
+    ta kütüphanesindeki WilliamsR, Stochastic ve Ichimoku formülleriyle aynı
+    sonuçları verir. Döner: {sütun adı: pandas.Series}
+    """
+    index = index if index is not None else getattr(close, 'index', None)
+    close_values = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    windows = [w for k, w in EXTREMA_WINDOWS.items() if k != 'ichimoku_span_b']
+    ext = rolling_extrema(high, low, windows)
+
+    hh, ll = ext[EXTREMA_WINDOWS['williams_r']]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        williams_r = -100 * (hh - close_values) / (hh - ll)
+
+    smax, smin = ext[EXTREMA_WINDOWS['stochastic']]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stoch_k = 100 * (close_values - smin) / (smax - smin)
+    stoch_k = pd.Series(stoch_k, index=index)
+
+    conv = 0.5 * (ext[EXTREMA_WINDOWS['ichimoku_conversion']][0] + ext[EXTREMA_WINDOWS['ichimoku_conversion']][1])
+    base = 0.5 * (ext[EXTREMA_WINDOWS['ichimoku_base']][0] + ext[EXTREMA_WINDOWS['ichimoku_base']][1])
+    # ta, Span B'yi min_periods=0 ile hesaplar: ilk 51 mumda genişleyen pencere
+    span_window = EXTREMA_WINDOWS['ichimoku_span_b']
+    span_b = 0.5 * (rolling_max(high, span_window, min_periods=0) + rolling_min(low, span_window, min_periods=0))
+
+    resistance, support = ext[EXTREMA_WINDOWS['support_resistance']]
+    return {
+        'Williams_R': pd.Series(williams_r, index=index),
+        'Stoch_K': stoch_k,
+        'Stoch_D': stoch_k.rolling(3, min_periods=3).mean(),
+        'Ichimoku_a': pd.Series(0.5 * (conv + base), index=index),
+        'Ichimoku_b': pd.Series(span_b, index=index),
+        'Ichimoku_conversion': pd.Series(conv, index=index),
+        'Ichimoku_base': pd.Series(base, index=index),
+        'Resistance': pd.Series(resistance, index=index),
+        'Support': pd.Series(support, index=index),
+    }
+
+
+class _MonotonicWindow:
+    """Tek pencere için monoton kuyruk: (konum, değer) çiftleri, baş her zaman uç değer"""
+
+    def __init__(self, window, is_max):
+        self.window = window
+        self.is_max = is_max
+        self.items = deque()
+
+    def push(self, position, value):
+        items = self.items
+        if self.is_max:
+            while items and items[-1][1] <= value:
+                items.pop()
+        else:
+            while items and items[-1][1] >= value:
+                items.pop()
+        items.append((position, value))
+        while items[0][0] <= position - self.window:
+            items.popleft()
+        return items[0][1]
+
+
+class RollingExtremaStream:
+    """Canlı mum akışı için kayan max/min (eleman başına amortize O(1))
+
+    stream = RollingExtremaStream([9, 14, 26, 48, 52])
+    stream.seed(df['High'], df['Low'])
+    extrema = stream.update(high, low)   # {pencere: (max, min)}, hazır değilse nan
+    """
+
+    def __init__(self, windows=None):
+        windows = sorted(set(windows or EXTREMA_WINDOWS.values()))
+        self._highs = {w: _MonotonicWindow(w, True) for w in windows}
+        self._lows = {w: _MonotonicWindow(w, False) for w in windows}
+        self.count = 0
+        self._last_nan = {'high': -1, 'low': -1}
+
+    def _push(self, side, queues, position, value):
+        # Pandas ile uyum: penceresinde NaN olan sonuç NaN
+        if np.isnan(value):
+            self._last_nan[side] = position
+            for queue in queues.values():
+                queue.items.clear()
+            return {w: np.nan for w in queues}
+        clean = position - self._last_nan[side]
+        result = {}
+        for w, queue in queues.items():
+            extreme = queue.push(position, value)
+            result[w] = extreme if clean >= w else np.nan
+        return result
+
+    def update(self, high, low):
+        position = self.count
+        self.count += 1
+        highs = self._push('high', self._highs, position, high)
+        lows = self._push('low', self._lows, position, low)
+        return {w: (highs[w], lows[w]) for w in self._highs}
+
+    def seed(self, highs, lows):
+        """Geçmiş mumlarla doldur; son mumun sonucunu döndür"""
+        result = {}
+        for high, low in zip(np.asarray(highs, dtype=np.float64), np.asarray(lows, dtype=np.float64)):
+            result = self.update(high, low)
+        return result
@@ -0,0 +1,162 @@
+"""Canlı gecikme ve başarı istatistiklerine göre uyarlanır sağlayıcı sıralaması
+
+query_ai sağlayıcıları sabit sırayla dener. Burada her sağlayıcı için üssel
+ağırlıklı (EWMA) deneme süresi ve geçerli cevap oranı tutulur; sorgu başına
+sıralama beklenen "geçerli cevaba kadar geçen süreyi" en aza indirecek şekilde
+yapılır. Sırayla denemede bu süre, sağlayıcılar deneme süresi / başarı oranı
+(c/p) küçükten büyüğe dizildiğinde en küçüktür.
+
+- Keşif: exploration olasılığıyla rastgele bir sağlayıcı öne alınır; böylece
+  bir süre kötü giden sağlayıcının düzelip düzelmediği ölçülmeye devam eder.
+- Başarısız denemeler en az FAILURE_LATENCY sürmüş sayılır; anında hata veren
+  (anahtarı eksik, bağlantısı reddedilen) sağlayıcı sıfıra yakın süresiyle öne
+  geçmez.
+- Hiç ölçülmemiş sağlayıcılar aynı ön değerle başlar; eşitlikte yapılandırılmış
+  sıra (AI_PROVIDERS) korunur.
+- İstatistikler BIST_ROUTING_STATS_PATH'teki JSON dosyasına yazılır ve açılışta
+  okunur; servis yeniden başladığında soğuk başlamaz.
+"""
+
+import os
+import json
+import time
+import random
+import atexit
+import threading
+
+ROUTING_STATS_PATH = os.getenv("BIST_ROUTING_STATS_PATH") or ""
+# Her yeni ölçümün ağırlığı
+ROUTING_ALPHA = float(os.getenv("BIST_ROUTING_ALPHA") or 0.2)
+# Sorguların bu oranında rastgele bir sağlayıcı öne alınır
+ROUTING_EXPLORATION = float(os.getenv("BIST_ROUTING_EXPLORATION") or 0.1)
+# Ölçülmemiş sağlayıcı için ön değerler
+PRIOR_LATENCY = 5.0
+PRIOR_SUCCESS = 0.5
+MIN_SUCCESS = 0.02
+# Başarısız denemenin istatistiğe işlenen en kısa süresi (saniye)
+FAILURE_LATENCY = float(os.getenv("BIST_ROUTING_FAILURE_LATENCY") or PRIOR_LATENCY)
+# Dosyaya en fazla bu sıklıkla yazılır (saniye)
+SAVE_INTERVAL = 5.0
+
+
+class ProviderRouter:
+    """Sağlayıcı başına EWMA deneme süresi ve başarı oranı; sorgu sıralaması
+
+    router.order(AI_PROVIDERS)            # [(ad, fonksiyon), ...] en iyi önce
+    router.record("Gemini", 1.8, True)    # deneme süresi (sn), geçerli cevap mı
+    """
+
+    def __init__(self, path=None, alpha=ROUTING_ALPHA, exploration=ROUTING_EXPLORATION, seed=None):
+        self.path = path
+        self.alpha = alpha
+        self.exploration = exploration
+        self.stats = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = 0.0
+        if path:
+            self.load()
+
+    def record(self, name, latency, success):
+        """Bir denemenin sonucunu istatistiklere işle (başarısız deneme en az FAILURE_LATENCY sayılır)"""
+        if not success:
+            latency = max(float(latency), FAILURE_LATENCY)
+        with self._lock:
+            item = self.stats.get(name)
+            if item is None:
+                item = self.stats[name] = {'latency': float(latency), 'success': 1.0 if success else 0.0,
+                                           'attempts': 0, 'successes': 0}
+            else:
+                a = self.alpha
+                item['latency'] = (1 - a) * item['latency'] + a * float(latency)
+                item['success'] = (1 - a) * item['success'] + a * (1.0 if success else 0.0)
+            item['attempts'] += 1
+            item['successes'] += int(bool(success))
+            item['updated'] = time.time()
+            self._dirty = True
+        if self.path and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def expected_cost(self, name):
+        """Bu sağlayıcıyla geçerli cevap için beklenen süre (deneme süresi / başarı oranı)"""
+        item = self.stats.get(name)
+        latency = item['latency'] if item else PRIOR_LATENCY
+        success = item['success'] if item else PRIOR_SUCCESS
+        return latency / max(success, MIN_SUCCESS)
+
+    def expected_time(self, providers):
+        """Verilen sırayla denemede geçerli cevaba kadar beklenen süre"""
+        total, reach = 0.0, 1.0
+        for name, _ in providers:
+            item = self.stats.get(name)
+            latency = item['latency'] if item else PRIOR_LATENCY
+            success = item['success'] if item else PRIOR_SUCCESS
+            total += reach * latency
+            reach *= 1 - success
+        return total
+
+    def order(self, providers, explore=True):
+        """Sağlayıcıları beklenen maliyete göre sırala (eşitlikte verilen sıra korunur)"""
+        with self._lock:
+            ranked = sorted(providers, key=lambda item: self.expected_cost(item[0]))
+            if explore and len(ranked) > 1 and self._rng.random() < self.exploration:
+                ranked.insert(0, ranked.pop(self._rng.randrange(1, len(ranked))))
+        return ranked
+
+    def snapshot(self):
+        """İstatistiklerin kopyası ve sağlayıcı başına beklenen maliyet"""
+        with self._lock:
+            return {name: dict(item, expected_cost=round(self.expected_cost(name), 3))
+                    for name, item in self.stats.items()}
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            with self._lock:
+                self.stats = {name: item for name, item in data.get('providers', {}).items()
+                              if isinstance(item, dict) and 'latency' in item and 'success' in item}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Yönlendirme istatistikleri okunamadı: {str(e)}")
+
+    def save(self):
+        """İstatistikleri JSON dosyasına yaz (geçici dosya + yeniden adlandırma)"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'saved_at': time.time(), 'providers': self.stats}
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=1)
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError as e:
+                print(f"Yönlendirme istatistikleri yazılamadı: {str(e)}")
+            self._saved_at = time.monotonic()
+
+    def report(self):
+        lines = []
+        for name, item in sorted(self.snapshot().items(), key=lambda kv: kv[1]['expected_cost']):
+            lines.append(f"- {name}: ort. {item['latency']:.2f} sn, başarı %{item['success'] * 100:.0f}, "
+                         f"beklenen {item['expected_cost']:.2f} sn ({item['attempts']} deneme)")
+        return "\n".join(lines)
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def get_default_router():
+    """Süreç genelinde paylaşılan yönlendirici (çıkışta istatistikler kaydedilir)"""
+    global _default_router
+    with _default_lock:
+        if _default_router is None:
+            _default_router = ProviderRouter(ROUTING_STATS_PATH)
+            atexit.register(_default_router.save)
+    return _default_router
@@ -0,0 +1,410 @@
+"""Hız sınırına duyarlı LLM istek zamanlayıcısı
+
+Her sağlayıcının dakikalık istek (RPM) ve token (TPM) sınırı vardır. query_ai
+çağrıları tek tek gönderir ve 429'u diğer hatalar gibi geçer. Büyük bir izleme
+listesinde bunun yerine:
+
+- Promptlar önceliğe göre (örn. screener sırası) kuyruğa alınır.
+- Her sağlayıcı için kayan 60 sn penceresinde gönderilen istek ve tahmini
+  token sayısı tutulur; istek ancak bütçe yetiyorsa gönderilir. Böylece kota
+  tam kullanılır ama 429 alınmaz.
+- Boştaki her sağlayıcı kuyruktaki en öncelikli isteği alır; kotası dolan
+  sağlayıcı beklerken diğerleri çalışmaya devam eder.
+- Toplu sorgu fonksiyonu olan sağlayıcıya (yerel model: borsa.query_local_batch)
+  boş yuvası kadar bekleyen istek tek toplu çağrıda gönderilir.
+- 429 cevabında Retry-After süresi boyunca o sağlayıcıya istek gönderilmez ve
+  istek kuyruğa geri konur; başka hatada istek sıradaki sağlayıcıya geçer.
+- stats()/report() kuyruk derinliğini, bekleme sürelerini ve kota kullanımını verir.
+
+Retry-After bilgisi borsa.py'deki sorgu fonksiyonlarından report_rate_limit ile
+gelir ve süreç genelinde paylaşılır (query_ai de bekleyen sağlayıcıyı atlar).
+"""
+
+import os
+import time
+import itertools
+import threading
+import datetime
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+from routing import get_default_router
+import metrics
+
+# Sağlayıcı başına (dakikalık istek, dakikalık token) bütçesi; None = sınırsız
+# BIST_RATE_LIMITS="Gemini=15/1000000,Groq=30/6000" ile değiştirilebilir
+PROVIDER_LIMITS = {
+    'Gemini': (15, 1_000_000),
+    'Grok': (60, 100_000),
+    'Groq': (30, 6_000),
+    'Yerel': (None, None),
+}
+# Sağlayıcı başına aynı anda gönderilen istek sayısı (yerel model: LOCAL_LLM_CONCURRENCY)
+PROVIDER_CONCURRENCY = int(os.getenv("BIST_PROVIDER_CONCURRENCY") or 4)
+# Retry-After başlığı olmayan 429'dan sonra bekleme süresi (saniye)
+RETRY_AFTER_DEFAULT = 20.0
+# Aynı istek en fazla bu kadar 429 sonrası yeniden kuyruğa alınır
+MAX_RATE_LIMIT_RETRIES = 3
+RATE_WINDOW = 60.0
+# Pencere, gönderim ile sağlayıcıya varış arasındaki gecikmeye karşı bu oranda uzun tutulur
+RATE_SAFETY = 0.05
+# Türkçe metinde token başına yaklaşık karakter sayısı
+CHARS_PER_TOKEN = 3
+
+
+def parse_limits(text):
+    """"Ad=RPM/TPM,..." metnini {ad: (rpm, tpm)} sözlüğüne çevir (boş değer = sınırsız)"""
+    limits = {}
+    for item in (text or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        rpm, _, tpm = value.partition("/")
+        limits[name.strip()] = (int(rpm) if rpm.strip() else None, int(tpm) if tpm.strip() else None)
+    return limits
+
+
+PROVIDER_LIMITS.update(parse_limits(os.getenv("BIST_RATE_LIMITS")))
+
+
+# Süreç genelinde Retry-After durumu: sağlayıcı -> bekleme sonu (monotonic)
+_blocked_until = {}
+_blocked_lock = threading.Lock()
+
+
+def retry_after_seconds(headers, default=RETRY_AFTER_DEFAULT):
+    """Retry-After başlığını saniyeye çevir (saniye veya HTTP tarihi biçimi)"""
+    value = headers.get('Retry-After') if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                moment = parsedate_to_datetime(value)
+                return max(0.0, (moment - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return default
+
+
+def report_rate_limit(provider, headers=None):
+    """Sağlayıcı 429 döndürdü: Retry-After süresince isteği durdur; bekleme süresini döndür"""
+    seconds = retry_after_seconds(headers)
+    with _blocked_lock:
+        _blocked_until[provider] = max(_blocked_until.get(provider, 0.0), time.monotonic() + seconds)
+    return seconds
+
+
+def rate_limited_for(provider):
+    """Sağlayıcının Retry-After bekleme süresinden kalan saniye (0: gönderilebilir)"""
+    with _blocked_lock:
+        return max(0.0, _blocked_until.get(provider, 0.0) - time.monotonic())
+
+
+def _blocked_mark(provider):
+    with _blocked_lock:
+        return _blocked_until.get(provider, 0.0)
+
+
+def estimate_tokens(prompt, structured=False):
+    """İsteğin tahmini token maliyeti: prompt + azami cevap uzunluğu"""
+    if hasattr(prompt, 'static'):
+        chars = len(prompt.static) + len(prompt.dynamic)
+    else:
+        chars = len(prompt or "")
+    return chars // CHARS_PER_TOKEN + (400 if structured else 850)
+
+
+class WindowLimiter:
+    """Kayan pencerede istek ve token bütçesi
+
+    Sağlayıcıların dakikalık sınırları kayan pencere olarak uygulanır; bu yüzden
+    kova (token bucket) yerine pencere içindeki gönderimler tek tek tutulur ve
+    bütçe hiçbir 60 sn aralığında aşılmaz.
+    """
+
+    def __init__(self, rpm=None, tpm=None, window=RATE_WINDOW):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window * (1 + RATE_SAFETY)
+        self.sent = deque()
+        self.tokens = 0
+
+    def _expire(self, now):
+        while self.sent and self.sent[0][0] <= now - self.window:
+            self.tokens -= self.sent.popleft()[1]
+
+    def wait_time(self, tokens, now):
+        """Bu maliyetteki istek için beklenmesi gereken süre (0: hemen gönderilebilir)"""
+        self._expire(now)
+        wait = 0.0
+        if self.rpm and len(self.sent) >= self.rpm:
+            wait = self.sent[len(self.sent) - self.rpm][0] + self.window - now
+        if self.tpm:
+            # Bütçeden büyük tek istek, pencere boşaldığında tek başına gönderilir
+            excess = self.tokens + min(tokens, self.tpm) - self.tpm
+            released = 0
+            for sent_at, sent_tokens in self.sent:
+                if excess <= 0:
+                    break
+                released += sent_tokens
+                if released >= excess:
+                    wait = max(wait, sent_at + self.window - now)
+                    break
+        return max(0.0, wait)
+
+    def record(self, tokens, now):
+        self.sent.append((now, tokens))
+        self.tokens += tokens
+
+    def usage(self, now):
+        """(penceredeki istek sayısı, penceredeki token)"""
+        self._expire(now)
+        return len(self.sent), self.tokens
+
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'prompt', 'structured', 'tokens', 'future', 'enqueued', 'tried', 'rate_limited')
+
+    def __init__(self, priority, seq, prompt, structured, tokens):
+        self.priority = priority
+        self.seq = seq
+        self.prompt = prompt
+        self.structured = structured
+        self.tokens = tokens
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.tried = set()
+        self.rate_limited = 0
+
+
+class RequestScheduler:
+    """Öncelik kuyruklu, RPM/TPM ve Retry-After'a uyan çok sağlayıcılı istek dağıtıcısı
+
+    scheduler = RequestScheduler()
+    future = scheduler.submit(prompt, priority=sıra)   # küçük değer önce gönderilir
+    futures = scheduler.submit_many(prompts)           # liste sırası öncelik; birlikte kuyruğa girer
+    provider, text = future.result()                   # tüm sağlayıcılar başarısızsa (None, None)
+    print(scheduler.report())
+    scheduler.close()
+
+    providers verilmezse borsa.AI_PROVIDERS'tan anahtarı tanımlı olanlar kullanılır.
+    batch: {ad: fonksiyon(promptlar, structured, max_workers) -> cevaplar}; verilmezse
+    yerel model için borsa.query_local_batch.
+    """
+
+    def __init__(self, providers=None, limits=None, concurrency=None, window=RATE_WINDOW, adaptive=False,
+                 batch=None):
+        if providers is None:
+            import borsa
+            # Anahtarı olmayan sağlayıcı anında hata verir; kotasını tutup istekleri bekletmemeli
+            providers = [(name, query) for name, query in borsa.AI_PROVIDERS if borsa.provider_configured(name)]
+            batch = {'Yerel': borsa.query_local_batch, **(batch or {})}
+            local = dict(concurrency or {})
+            local.setdefault('Yerel', borsa.LOCAL_LLM_CONCURRENCY)
+            concurrency = local
+            adaptive = adaptive or borsa.AI_ROUTING == "adaptive"
+        self.providers = list(dict(providers).items())
+        # adaptive: boştaki sağlayıcılar arasında ölçülen maliyeti düşük olan önce seçilir (routing.py)
+        self.adaptive = adaptive
+        self._batch = dict(batch or {})
+        self._router = get_default_router()
+        limits = dict(PROVIDER_LIMITS, **(limits or {}))
+        self._limiters = {name: WindowLimiter(*limits.get(name, (None, None)), window=window)
+                          for name, _ in self.providers}
+        concurrency = concurrency or {}
+        self._slots = {name: concurrency.get(name, PROVIDER_CONCURRENCY) for name, _ in self.providers}
+        self._in_flight = {name: 0 for name, _ in self.providers}
+        self._sent = {name: 0 for name, _ in self.providers}
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._completed = deque()
+        self._waits = []
+        self._failed = 0
+        self._rate_limited = 0
+        self._started = time.monotonic()
+
+        self._pool = ThreadPoolExecutor(max_workers=max(1, sum(self._slots.values())),
+                                        thread_name_prefix="scheduler")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True, name="scheduler-dispatch")
+        self._dispatcher.start()
+
+    def submit(self, prompt, priority=0, structured=False):
+        """Promptu kuyruğa al; Future (sağlayıcı adı, cevap metni) döndürür"""
+        return self.submit_many([prompt], structured, priorities=[priority])[0]
+
+    def submit_many(self, prompts, structured=False, priorities=None):
+        """Promptları tek seferde kuyruğa al (öncelik verilmezse liste sırası); Future listesi döndürür
+
+        Hepsi aynı anda kuyruğa girdiğinden toplu sağlayıcıya birlikte gönderilebilir.
+        """
+        prompts = list(prompts)
+        priorities = range(len(prompts)) if priorities is None else priorities
+        requests = [_Request(priority, next(self._seq), prompt, structured, estimate_tokens(prompt, structured))
+                    for prompt, priority in zip(prompts, priorities)]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Zamanlayıcı kapatıldı")
+            self._queue.extend(requests)
+            self._cond.notify_all()
+        return [request.future for request in requests]
+
+    def _pick(self, now):
+        """Gönderilebilecek (istek, ad, fonksiyon) veya bekleme süresi"""
+        wait = None
+        providers = self._router.order(self.providers, explore=False) if self.adaptive else self.providers
+        for request in sorted(self._queue, key=lambda r: (r.priority, r.seq)):
+            candidates = [(name, query) for name, query in providers if name not in request.tried]
+            if not candidates:
+                self._queue.remove(request)
+                self._failed += 1
+                request.future.set_result((None, None))
+                continue
+            for name, query in candidates:
+                if self._in_flight[name] >= self._slots[name]:
+                    continue
+                delay = max(rate_limited_for(name), self._limiters[name].wait_time(request.tokens, now))
+                if delay <= 0:
+                    return (request, name, query), None
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                if self._closed and not self._queue and not any(self._in_flight.values()):
+                    break
+                now = time.monotonic()
+                chosen, wait = self._pick(now)
+                if chosen is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+                request, name, query = chosen
+                self._send(request, name, now)
+                if name in self._batch:
+                    requests = [request] + self._fill_batch(request, name, now)
+                    self._pool.submit(self._run_batch, requests, name, self._batch[name])
+                else:
+                    self._pool.submit(self._run, request, name, query)
+
+    def _send(self, request, name, now):
+        self._queue.remove(request)
+        self._limiters[name].record(request.tokens, now)
+        self._in_flight[name] += 1
+        self._sent[name] += 1
+        self._waits.append(now - request.enqueued)
+
+    def _fill_batch(self, first, name, now):
+        """Toplu çağrıya eklenecek bekleyen istekler (boş yuva ve kota kadar, aynı cevap biçimi)"""
+        added = []
+        for request in sorted(self._queue, key=lambda r: (r.priority, r.seq)):
+            if self._in_flight[name] >= self._slots[name]:
+                break
+            if (name in request.tried or request.structured != first.structured
+                    or self._limiters[name].wait_time(request.tokens, now) > 0):
+                continue
+            self._send(request, name, now)
+            added.append(request)
+        return added
+
+    def _run(self, request, name, query):
+        mark = _blocked_mark(name)
+        started = time.perf_counter()
+        try:
+            text = query(request.prompt, structured=request.structured)
+        except Exception as e:
+            print(f"{name} sorgu hatası: {str(e)}")
+            text = None
+        self._finish(request, name, text, mark, time.perf_counter() - started)
+
+    def _run_batch(self, requests, name, batch):
+        mark = _blocked_mark(name)
+        started = time.perf_counter()
+        try:
+            texts = batch([r.prompt for r in requests], structured=requests[0].structured,
+                          max_workers=len(requests))
+        except Exception as e:
+            print(f"{name} toplu sorgu hatası: {str(e)}")
+            texts = [None] * len(requests)
+        elapsed = time.perf_counter() - started
+        for request, text in zip(requests, texts):
+            self._finish(request, name, text, mark, elapsed)
+
+    def _finish(self, request, name, text, mark, elapsed):
+        """Cevabı Future'a yaz veya isteği (429 ise aynı, değilse sıradaki sağlayıcı için) kuyruğa geri koy"""
+        limited = not text and _blocked_mark(name) > mark
+        if not limited:
+            # 429 sağlayıcının kalitesini değil kotayı gösterir; istatistiğe katılmaz
+            self._router.record(name, elapsed, bool(text))
+            metrics.record_attempt(name, elapsed, bool(text))
+        with self._cond:
+            self._in_flight[name] -= 1
+            if text:
+                self._completed.append(time.monotonic())
+                request.future.set_result((name, text))
+            else:
+                if limited and request.rate_limited < MAX_RATE_LIMIT_RETRIES:
+                    # 429: aynı sağlayıcı Retry-After sonrası tekrar denenebilir
+                    request.rate_limited += 1
+                    self._rate_limited += 1
+                else:
+                    request.tried.add(name)
+                request.enqueued = time.monotonic()
+                self._queue.append(request)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Kuyruk derinliği, bekleme süreleri ve sağlayıcı başına kota kullanımı"""
+        with self._cond:
+            now = time.monotonic()
+            while self._completed and self._completed[0] <= now - RATE_WINDOW:
+                self._completed.popleft()
+            providers = {}
+            for name, _ in self.providers:
+                used_requests, used_tokens = self._limiters[name].usage(now)
+                providers[name] = {
+                    'sent': self._sent[name],
+                    'in_flight': self._in_flight[name],
+                    'window_requests': used_requests,
+                    'window_tokens': used_tokens,
+                    'rpm': self._limiters[name].rpm,
+                    'tpm': self._limiters[name].tpm,
+                    'retry_after': round(rate_limited_for(name), 1),
+                }
+            return {
+                'queue_depth': len(self._queue),
+                'in_flight': sum(self._in_flight.values()),
+                'completed_last_minute': len(self._completed),
+                'failed': self._failed,
+                'rate_limited': self._rate_limited,
+                'avg_wait': sum(self._waits) / len(self._waits) if self._waits else 0.0,
+                'max_wait': max(self._waits, default=0.0),
+                'oldest_wait': max((now - r.enqueued for r in self._queue), default=0.0),
+                'providers': providers,
+            }
+
+    def report(self):
+        """stats() özetinin okunur metni"""
+        s = self.stats()
+        lines = [f"Kuyruk: {s['queue_depth']} bekliyor, {s['in_flight']} gönderildi, "
+                 f"son dakikada {s['completed_last_minute']} tamamlandı, {s['failed']} başarısız, "
+                 f"{s['rate_limited']} kez 429",
+                 f"Bekleme: ort. {s['avg_wait']:.2f} sn, en fazla {s['max_wait']:.2f} sn"]
+        for name, p in s['providers'].items():
+            rpm = f"{p['window_requests']}/{p['rpm']}" if p['rpm'] else f"{p['window_requests']}/-"
+            tpm = f"{p['window_tokens']}/{p['tpm']}" if p['tpm'] else f"{p['window_tokens']}/-"
+            blocked = f", Retry-After {p['retry_after']:.0f} sn" if p['retry_after'] else ""
+            lines.append(f"- {name}: {p['sent']} istek, dakikalık istek {rpm}, token {tpm}{blocked}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Kuyruktaki istekler bitince zamanlayıcıyı kapat"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,294 @@
+"""Kural tabanlı hızlı ön eleme: hangi hisseler LLM analizine değer?
+
+LLM çağrısı hattın en yavaş ve en pahalı aşamasıdır. Bu modül
+calculate_indicators çıktıları üzerinde tüm evren için vektörel kurallar
+(RSI uç değerleri, MACD kesişimi, BB/KC sıkışması, ADX gücü, destek/direnç
+kırılımı, hacim patlaması) çalıştırıp hisseleri puanlar; her döngüde sadece
+ilk N hisse query_ai'ye gönderilir.
+
+Kullanım:
+    python screener.py THYAO AKBNK GARAN ... [--top 5] [--analyze] [--jsonl]
+
+--jsonl: sembol başına bir JSON satırı stdout'a, ilerleme mesajları stderr'e (bkz. jsonl.py)
+--analyze: BIST_AI_MODE=rules ise veya hiçbir sağlayıcı cevap vermezse kural motoru kullanılır
+"""
+
+import sys
+import time
+from concurrent.futures import as_completed
+import numpy as np
+import pandas as pd
+
+# Kural ağırlıkları ve eşikleri (ağırlık 0 = kural kapalı)
+SCREEN_RULES = {
+    'rsi_extreme': {'weight': 2.0, 'low': 30.0, 'high': 70.0},
+    'macd_cross': {'weight': 2.0},
+    'squeeze': {'weight': 1.5},
+    'adx_strength': {'weight': 1.0, 'min': 25.0},
+    'sr_break': {'weight': 2.0},
+    'volume_spike': {'weight': 1.0, 'ratio': 2.0},
+}
+
+SNAPSHOT_COLUMNS = ['Close', 'Volume', 'RSI', 'MACD', 'MACD_signal', 'ADX', 'ADX_pos', 'ADX_neg',
+                    'BB_upper', 'BB_lower', 'KC_upper', 'KC_lower', 'Volume_SMA', 'Resistance', 'Support']
+
+
+def latest_snapshot(frames, columns=SNAPSHOT_COLUMNS):
+    """{sembol: gösterge tablosu} için son ve bir önceki satırı (sembol x sütun) tablolara çevir"""
+    symbols = [s for s, df in frames.items() if df is not None and len(df) >= 2]
+    last = np.full((len(symbols), len(columns)), np.nan)
+    prev = np.full((len(symbols), len(columns)), np.nan)
+    for i, symbol in enumerate(symbols):
+        tail = frames[symbol].reindex(columns=columns).iloc[-2:].to_numpy(dtype=np.float64)
+        prev[i], last[i] = tail[0], tail[1]
+    index = pd.Index(symbols, name='Sembol')
+    return pd.DataFrame(last, index=index, columns=columns), pd.DataFrame(prev, index=index, columns=columns)
+
+
+def snapshot_from_arrays(symbols, values, columns):
+    """shm_runner.calculate_indicators_shared(return_arrays=True) çıktısından anlık görüntü
+
+    values: (sembol x zaman x sütun) dizi, columns: shm_runner.ARRAY_COLUMNS.
+    Kısa seriler NaN ile doldurulmuş olabilir.
+    """
+    valid = ~np.all(np.isnan(values), axis=2)
+    last_pos = values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(len(symbols))
+    index = pd.Index(symbols, name='Sembol')
+    last = pd.DataFrame(values[rows, last_pos], index=index, columns=columns)
+    prev = pd.DataFrame(values[rows, np.maximum(last_pos - 1, 0)], index=index, columns=columns)
+    return last, prev
+
+
+def score_snapshot(last, prev, rules=None):
+    """Kuralları tüm semboller için vektörel değerlendir ve puan tablosu döndür
+
+    Her kural 0-1 arası bir güç üretir; puan, güçlerin ağırlıklı toplamıdır.
+    'bias' sütunu kuralların ima ettiği yönü verir (+ yükseliş, - düşüş).
+    """
+    rules = {name: {**cfg, **(rules or {}).get(name, {})} for name, cfg in SCREEN_RULES.items()}
+    out = pd.DataFrame(index=last.index)
+    bias = np.zeros(len(last))
+
+    def col(frame, name):
+        return frame[name].to_numpy(dtype=np.float64) if name in frame.columns else np.full(len(frame), np.nan)
+
+    close = col(last, 'Close')
+
+    cfg = rules['rsi_extreme']
+    rsi = col(last, 'RSI')
+    below = np.clip((cfg['low'] - rsi) / cfg['low'], 0, 1)
+    above = np.clip((rsi - cfg['high']) / (100 - cfg['high']), 0, 1)
+    out['rsi_extreme'] = np.nan_to_num(np.maximum(below, above))
+    bias += np.nan_to_num(below) - np.nan_to_num(above)
+
+    macd_now = col(last, 'MACD') - col(last, 'MACD_signal')
+    macd_prev = col(prev, 'MACD') - col(prev, 'MACD_signal')
+    crossed_up = (macd_prev <= 0) & (macd_now > 0)
+    crossed_down = (macd_prev >= 0) & (macd_now < 0)
+    out['macd_cross'] = (crossed_up | crossed_down).astype(float)
+    bias += crossed_up.astype(float) - crossed_down.astype(float)
+
+    squeeze = (col(last, 'BB_upper') < col(last, 'KC_upper')) & (col(last, 'BB_lower') > col(last, 'KC_lower'))
+    out['squeeze'] = squeeze.astype(float)
+
+    cfg = rules['adx_strength']
+    adx = col(last, 'ADX')
+    out['adx_strength'] = np.nan_to_num(np.clip((adx - cfg['min']) / (50 - cfg['min']), 0, 1))
+    trend_dir = np.sign(np.nan_to_num(col(last, 'ADX_pos') - col(last, 'ADX_neg')))
+    bias += out['adx_strength'].to_numpy() * trend_dir * 0.5
+
+    # Direnç/destek o anki mumu içerdiği için bir önceki satırın seviyeleri kullanılır
+    broke_up = close > col(prev, 'Resistance')
+    broke_down = close < col(prev, 'Support')
+    out['sr_break'] = (broke_up | broke_down).astype(float)
+    bias += broke_up.astype(float) - broke_down.astype(float)
+
+    cfg = rules['volume_spike']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = col(last, 'Volume') / col(last, 'Volume_SMA')
+    out['volume_spike'] = np.nan_to_num(np.clip((ratio - 1) / (cfg['ratio'] - 1), 0, 1))
+
+    weights = np.array([rules[name]['weight'] for name in SCREEN_RULES])
+    out['score'] = out[list(SCREEN_RULES)].to_numpy() @ weights
+    out['bias'] = bias
+    out['close'] = close
+    return out.sort_values('score', ascending=False, kind='stable')
+
+
+def screen_universe(frames, top_n=None, rules=None, min_score=0.0):
+    """Evreni puanla; top_n verilirse sadece en yüksek puanlı N hisseyi döndür"""
+    last, prev = latest_snapshot(frames)
+    ranked = score_snapshot(last, prev, rules=rules)
+    ranked = ranked[ranked['score'] > min_score] if min_score else ranked
+    return ranked.head(top_n) if top_n else ranked
+
+
+def select_for_llm(frames, top_n, rules=None, min_score=0.0):
+    """LLM'e gönderilecek sembollerin listesi (puan sırasına göre)"""
+    return list(screen_universe(frames, top_n=top_n, rules=rules, min_score=min_score).index)
+
+
+def _record(symbol, df, ranked, timings, with_rank=True):
+    """--jsonl satırı: puan (evrendeki sırası), gösterge görüntüsü ve süreler"""
+    from jsonl import indicator_snapshot, json_number
+
+    record = {'symbol': symbol, 'timings': {k: round(v, 4) for k, v in timings.items()}}
+    if df is None or len(df) == 0:
+        record['error'] = "veri bulunamadı"
+        return record
+    if symbol in ranked.index:
+        if with_rank:
+            record['rank'] = int(ranked.index.get_loc(symbol)) + 1
+        record['score'] = json_number(ranked.loc[symbol, 'score'])
+        record['bias'] = json_number(ranked.loc[symbol, 'bias'])
+    record['snapshot'] = indicator_snapshot(symbol, df)
+    return record
+
+
+def _analysis_fields(record, prompt, structured, name, text, analysis=None):
+    """--jsonl satırına prompt boyutu, sağlayıcı ve AI sonucunu ekle
+
+    analysis verilirse (kural motoru sonucu) AI cevabı yerine o yazılır.
+    """
+    from jsonl import prompt_size
+    from ai_schema import SchemaError, parse_structured_answer
+
+    record['prompt'] = prompt_size(prompt, structured) if prompt is not None else None
+    record['provider'] = name
+    record['result'] = None
+    if analysis is not None:
+        record['provider'] = analysis.provider
+        record['result'] = analysis.to_dict()
+        return record
+    if not text:
+        record['error'] = "AI servislerine ulaşılamadı"
+        return record
+    try:
+        record['result'] = parse_structured_answer(text, provider=name).to_dict()
+    except SchemaError as e:
+        record['answer'] = text
+        record['error'] = f"şemaya uymuyor: {e}"
+    return record
+
+
+def main(argv):
+    """Komut satırı: sembolleri indir, puanla, istenirse ilk N için AI analizi yap"""
+    top_n = 5
+    analyze = False
+    jsonl = False
+    symbols = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--top':
+            top_n = int(next(args))
+        elif arg == '--analyze':
+            analyze = True
+        elif arg == '--jsonl':
+            jsonl = True
+        else:
+            symbols.append(arg.upper())
+    if not symbols:
+        print(__doc__)
+        return
+
+    if not jsonl:
+        run(symbols, top_n, analyze)
+        return
+    from jsonl import JsonLinesWriter, progress_to_stderr
+
+    # Kayıtlar asıl stdout'a, ilerleme mesajları stderr'e
+    writer = JsonLinesWriter(sys.stdout)
+    with progress_to_stderr():
+        run(symbols, top_n, analyze, writer)
+
+
+def run(symbols, top_n=5, analyze=False, writer=None):
+    """Sembolleri indir, puanla ve istenirse AI analizi yap
+
+    writer verilirse (jsonl.JsonLinesWriter) her sembol bittiği anda bir kayıt yazılır:
+    analiz yoksa göstergeler hesaplanınca, analizde seçilmeyenler sıralamadan sonra,
+    seçilenler AI cevabı geldikçe. Analiz için yapılandırılmış (JSON) cevap istenir.
+    """
+    import borsa
+
+    frames, timings = {}, {}
+    for symbol in symbols:
+        started = time.perf_counter()
+        df = borsa.get_stock_data(symbol)
+        fetched = time.perf_counter()
+        if df is not None:
+            frames[symbol] = borsa.calculate_indicators(df)
+        timings[symbol] = {'fetch': fetched - started, 'indicators': time.perf_counter() - fetched}
+        if writer is not None and not analyze:
+            df = frames.get(symbol)
+            ranked = screen_universe({symbol: df}) if df is not None else pd.DataFrame()
+            writer.write(_record(symbol, df, ranked, timings[symbol], with_rank=False))
+
+    ranked = screen_universe(frames)
+    print(ranked.round(3).to_string())
+
+    if analyze:
+        from scheduler import RequestScheduler
+
+        selected = list(ranked.index[:top_n])
+        structured = writer is not None
+        if writer is not None:
+            for symbol in symbols:
+                if symbol not in selected:
+                    writer.write(_record(symbol, frames.get(symbol), ranked, timings[symbol]))
+        if borsa.AI_MODE == "rules":
+            # Sağlayıcı sorgulanmaz: kural motoru doğrudan çalışır
+            for symbol in selected:
+                started = time.perf_counter()
+                analysis = borsa.rule_based_fallback(frames[symbol])
+                timings[symbol]['ai'] = time.perf_counter() - started
+                if writer is not None:
+                    record = _record(symbol, frames[symbol], ranked, timings[symbol])
+                    writer.write(_analysis_fields(record, None, structured, None, None, analysis))
+                else:
+                    print(f"\n{symbol} hissesi kural motoru analizi (puan: {ranked.loc[symbol, 'score']:.2f})")
+                    print(analysis.to_text(symbol))
+            return
+        # Statik önek tüm semboller için aynı: sağlayıcıda bir kez önbelleğe alınır
+        create = borsa.create_prompt_parts if borsa.PROMPT_CACHE else borsa.create_prompt
+        # Zamanlayıcı: üst sıradaki hisse önce, sağlayıcı kotaları ve Retry-After'a uyarak eşzamanlı
+        scheduler = RequestScheduler()
+        prompts = {}
+        for symbol in selected:
+            prompt = create(symbol, frames[symbol], structured=structured)
+            if prompt:
+                prompts[symbol] = prompt
+        # Hepsi birlikte kuyruğa girer: yerel model yuvaları tek toplu çağrıyla dolar
+        submitted = dict.fromkeys(prompts, time.perf_counter())
+        futures = dict(zip(prompts, scheduler.submit_many(prompts.values(), structured=structured)))
+
+        if writer is not None:
+            symbol_of = {future: symbol for symbol, future in futures.items()}
+            for future in as_completed(symbol_of):
+                symbol = symbol_of[future]
+                name, result = future.result()
+                # Hiçbir sağlayıcı cevap vermediyse kural motoru
+                analysis = borsa.rule_based_fallback(frames[symbol]) if not result else None
+                timings[symbol]['ai'] = time.perf_counter() - submitted[symbol]
+                record = _record(symbol, frames[symbol], ranked, timings[symbol])
+                writer.write(_analysis_fields(record, prompts[symbol], structured, name, result, analysis))
+            for symbol in selected:
+                if symbol not in futures:
+                    record = _record(symbol, frames[symbol], ranked, timings[symbol])
+                    record['error'] = "prompt oluşturulamadı"
+                    writer.write(record)
+        else:
+            for symbol in selected:
+                _, result = futures[symbol].result() if symbol in futures else (None, None)
+                print(f"\n{symbol} hissesi AI analizi (puan: {ranked.loc[symbol, 'score']:.2f})")
+                if not result:
+                    analysis = borsa.rule_based_fallback(frames[symbol])
+                    result = analysis.to_text(symbol) if analysis else None
+                print(result or "HATA: AI servislerine ulaşılamadı!")
+        scheduler.close()
+        print(scheduler.report())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
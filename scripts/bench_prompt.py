@@ -0,0 +1,72 @@
+"""Prompt oluşturma hız ölçümü
+
+Sentetik 15 dakikalık mumlarla N sembol için:
+- create_prompt (tablo satırından)
+- render_prompt (hazır değer sözlüğünden)
+- render_prompts (sembol x alan matrisinden)
+sürelerini ölçer ve üç yolun aynı metni ürettiğini doğrular.
+
+Kullanım:
+    python scripts/bench_prompt.py [SEMBOL_SAYISI]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import borsa
+from prompt_template import PROMPT_FIELDS, prompt_vector, render_prompt, render_prompts
+
+
+def synthetic_bars(days=21, seed=0, price=100.0):
+    """BIST seans saatlerinde (10:00-18:00) sentetik 15 dakikalık mumlar"""
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range('2025-01-06', periods=days, tz='Europe/Istanbul')
+    index = pd.DatetimeIndex([day + pd.Timedelta(hours=10, minutes=15 * i) for day in sessions for i in range(32)])
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.003, len(index))))
+    open_price = np.r_[price, close[:-1]]
+    spread = np.abs(rng.normal(0, 0.002, len(index))) * close
+    return pd.DataFrame({
+        'Close': close.round(2),
+        'Open': open_price.round(2),
+        'High': (np.maximum(open_price, close) + spread).round(2),
+        'Low': (np.minimum(open_price, close) - spread).round(2),
+        'Volume': rng.integers(10_000, 1_000_000, len(index)),
+    }, index=index)
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 500
+    symbols = [f"HISSE{i:03d}" for i in range(count)]
+    print(f"{count} sembol için göstergeler hesaplanıyor...")
+    frames = {s: borsa.calculate_indicators(synthetic_bars(seed=i)) for i, s in enumerate(symbols)}
+    values = {s: borsa.prompt_values(s, frames[s]) for s in symbols}
+    matrix = np.vstack([prompt_vector(values[s]) for s in symbols])
+
+    t_frame, from_frame = timed(lambda: [borsa.create_prompt(s, frames[s]) for s in symbols])
+    t_dict, from_dict = timed(lambda: [render_prompt(s, values[s]) for s in symbols])
+    t_matrix, from_matrix = timed(lambda: render_prompts(symbols, matrix))
+
+    assert from_frame == from_dict == from_matrix, "Prompt çıktıları farklı!"
+    print(f"Alan sayısı: {len(PROMPT_FIELDS)}, prompt uzunluğu: {len(from_frame[0])} karakter")
+    for name, elapsed in (("create_prompt (tablo)", t_frame), ("render_prompt (sözlük)", t_dict),
+                          ("render_prompts (matris)", t_matrix)):
+        print(f"{name:<26} {elapsed * 1000:8.1f} ms  ({count / elapsed:8.0f} prompt/sn)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,152 @@
+"""service.py için yerel yük testi: saniye başına istek ve gecikme dağılımı
+
+Her işçi kendi kalıcı (keep-alive) HTTP bağlantısıyla art arda istek gönderir;
+toplam istek sayısı işçilere paylaştırılır. Sonunda saniye başına istek,
+gecikme yüzdelikleri (p50/p90/p99) ve durum kodu dağılımı yazdırılır.
+
+--synthetic ile servis bu süreçte başlatılır: veri indirme sentetik mumlarla,
+AI sağlayıcıları scripts/stub_provider.py sahte sunucusuyla değiştirilir. Ağ
+ve API anahtarı gerekmez; ölçülen, servisin kendi yüküdür.
+
+Kullanım:
+    python scripts/load_test.py [--url http://127.0.0.1:8000] [--path /indicators/THYAO]
+                                [-n 2000] [-c 16] [--synthetic]
+"""
+
+import os
+import sys
+import time
+import json
+import asyncio
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+
+DEFAULT_PATHS = ['/indicators/THYAO', '/indicators/GARAN', '/indicators?symbols=THYAO,GARAN,AKBNK',
+                 '/analysis/THYAO', '/status']
+SYNTHETIC_SYMBOLS = ['THYAO', 'GARAN', 'AKBNK', 'ASELS', 'EREGL']
+
+
+def worker(host, port, paths, count, latencies, statuses, lock):
+    """count adet istek gönder; gecikmeleri ve durum kodlarını topla"""
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    local_latencies, local_statuses = [], Counter()
+    for i in range(count):
+        path = paths[i % len(paths)]
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            local_statuses[response.status] += 1
+        except (OSError, http.client.HTTPException) as e:
+            local_statuses[type(e).__name__] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=120)
+        local_latencies.append(time.perf_counter() - started)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        statuses.update(local_statuses)
+
+
+def run_load(url, paths, total, concurrency):
+    """Yükü uygula; (süre, gecikmeler, durum kodları)"""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(host, port, paths[i % len(paths):] + paths[:i % len(paths)],
+                                                     share, latencies, statuses, lock))
+               for i, share in enumerate(shares) if share]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, statuses
+
+
+def report(elapsed, latencies, statuses, concurrency):
+    ms = np.array(latencies) * 1000
+    print(f"{len(ms)} istek, {concurrency} eşzamanlı bağlantı, {elapsed:.2f} sn")
+    print(f"Saniye başına istek: {len(ms) / elapsed:.1f}")
+    print(f"Gecikme (ms): ort {ms.mean():.2f}, p50 {np.percentile(ms, 50):.2f}, "
+          f"p90 {np.percentile(ms, 90):.2f}, p99 {np.percentile(ms, 99):.2f}, en fazla {ms.max():.2f}")
+    print("Durum kodları: " + ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items(), key=str)))
+
+
+def start_synthetic_service():
+    """Sentetik veri ve sahte sağlayıcılarla servisi arka planda başlat; adresini döndür"""
+    import borsa
+    import service
+    from bench_prompt import synthetic_bars
+    from stub_provider import start_server, point_borsa
+
+    bars = {symbol: synthetic_bars(seed=i, price=50.0 + 10 * i) for i, symbol in enumerate(SYNTHETIC_SYMBOLS)}
+
+    def get_stock_data(symbol, verbose=True):
+        return bars[symbol].copy() if symbol in bars else None
+
+    borsa.get_stock_data = get_stock_data
+    stub, _ = start_server()
+    point_borsa(borsa, stub.server_address[1])
+
+    ready = threading.Event()
+    address = []
+
+    def on_ready(host, port):
+        address.append(f"http://{host}:{port}")
+        ready.set()
+
+    threading.Thread(target=lambda: asyncio.run(service.serve('127.0.0.1', 0, SYNTHETIC_SYMBOLS, on_ready)),
+                     daemon=True, name='service').start()
+    if not ready.wait(60):
+        raise RuntimeError("Servis başlatılamadı")
+    return address[0]
+
+
+def main(argv):
+    url, paths, total, concurrency, synthetic = 'http://127.0.0.1:8000', [], 2000, 16, False
+    args = iter(argv)
+    for arg in args:
+        if arg == '--url':
+            url = next(args)
+        elif arg == '--path':
+            paths.append(next(args))
+        elif arg == '-n':
+            total = int(next(args))
+        elif arg == '-c':
+            concurrency = int(next(args))
+        elif arg == '--synthetic':
+            synthetic = True
+        else:
+            print(__doc__)
+            return
+    paths = paths or DEFAULT_PATHS
+
+    if synthetic:
+        url = start_synthetic_service()
+    # Isınma: önbellekler ve bağlantılar hazır olsun
+    run_load(url, paths, len(paths), 1)
+    elapsed, latencies, statuses = run_load(url, paths, total, concurrency)
+    print(f"Hedef: {url} - {', '.join(paths)}")
+    report(elapsed, latencies, statuses, concurrency)
+
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    conn.request('GET', '/stats')
+    stats = json.loads(conn.getresponse().read())
+    print("Servis önbelleği: " + json.dumps(stats['cache']['hits'], ensure_ascii=False)
+          + " isabet, " + json.dumps(stats['cache']['misses'], ensure_ascii=False) + " ıska")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
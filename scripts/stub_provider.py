@@ -0,0 +1,396 @@
+"""AI sağlayıcıları için yerel sahte sunucu (istek biçimi denetimi)
+
+Gemini (cachedContents + generateContent), OpenAI uyumlu xAI/Groq ve yerel
+model sunucusu (chat/completions) uç noktalarını taklit eder. Her isteğin gövdesini
+borsa.py'nin göndermesi gereken biçime göre denetler, uymayanlara 400 döner
+ve kayıt tutar. Cevap, kullanıcı mesajındaki "Son Fiyat" değerinden üretilen
+sabit bir analizdir (JSON modu istenmişse şemaya uyan JSON).
+
+Kullanım:
+    python scripts/stub_provider.py [--port 8765] [--delay SANİYE] [--rpm N]   # sunucuyu başlat
+    python scripts/stub_provider.py --selftest         # borsa.py'yi sunucuya yönlendir ve denetle
+
+Sunucu açıkken borsa.py şu ortam değişkenleriyle sunucuya yönlendirilir:
+    GEMINI_BASE_URL=http://127.0.0.1:8765
+    XAI_BASE_URL=http://127.0.0.1:8765/v1
+    GROQ_BASE_URL=http://127.0.0.1:8765/openai/v1
+    LOCAL_LLM_BASE_URL=http://127.0.0.1:8765/local/v1
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_schema import HORIZON_KEYS, AnalysisResult, HorizonForecast
+
+_PRICE = re.compile(r'Son Fiyat: ([0-9.]+) TL')
+_GENERATE = re.compile(r'^/v1beta/models/([^/:]+):generateContent$')
+_CHAT_PATHS = ('/v1/chat/completions', '/openai/v1/chat/completions', '/local/v1/chat/completions')
+
+
+class ShapeError(Exception):
+    """İstek gövdesi beklenen biçimde değil"""
+
+
+class RateLimited(Exception):
+    """Dakikalık istek sınırı aşıldı (429 + Retry-After)"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"hız sınırı, {retry_after} sn sonra")
+        self.retry_after = retry_after
+
+
+def _require(condition, message):
+    if not condition:
+        raise ShapeError(message)
+
+
+def _text_parts(content, path):
+    _require(isinstance(content, dict), f"{path}: nesne bekleniyordu")
+    parts = content.get('parts')
+    _require(isinstance(parts, list) and parts, f"{path}.parts: boş olmayan liste bekleniyordu")
+    _require(all(isinstance(p, dict) and isinstance(p.get('text'), str) and p['text'] for p in parts),
+             f"{path}.parts: her parça metin içermeli")
+    return "".join(p['text'] for p in parts)
+
+
+def canned_answer(user_text, structured, symbol="[HİSSE]"):
+    """Kullanıcı mesajındaki son fiyattan sabit bir analiz üret"""
+    match = _PRICE.search(user_text)
+    price = float(match.group(1)) if match else 100.0
+    horizons = {}
+    for k, key in enumerate(HORIZON_KEYS):
+        width = price * 0.005 * (k + 1)
+        horizons[key] = HorizonForecast('Yatay', 'Alma', 'Satma', round(price - width, 2),
+                                        round(price + width, 2), round(price, 2))
+    horizons['daily'].buy_time, horizons['daily'].sell_time = "10:30", "17:30"
+    result = AnalysisResult(price=price, horizons=horizons)
+    if structured:
+        data = {'price': price}
+        for key, forecast in result.to_dict()['horizons'].items():
+            data[key] = {k: v for k, v in forecast.items() if v is not None}
+        return json.dumps(data, ensure_ascii=False)
+    return result.to_text(symbol)
+
+
+class StubState:
+    """Sunucunun kayıtları: oluşturulan önbellekler ve alınan istekler"""
+
+    def __init__(self, reject_cache=False, delay=0.0, rpm=None, window=60.0):
+        self.reject_cache = reject_cache
+        self.delay = delay
+        self.rpm = rpm
+        self.window = window
+        self.sent = {}
+        self.rejected = 0
+        self.caches = {}
+        self.requests = []
+        self.errors = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def record(self, kind, body, error=None):
+        with self.lock:
+            self.requests.append((kind, body))
+            if error:
+                self.errors.append((kind, error))
+
+    def check_rate(self, path):
+        """Uç nokta başına kayan pencerede rpm sınırı (aşılırsa RateLimited)"""
+        if not self.rpm:
+            return
+        now = time.monotonic()
+        with self.lock:
+            sent = [t for t in self.sent.get(path, []) if t > now - self.window]
+            if len(sent) >= self.rpm:
+                self.sent[path] = sent
+                self.rejected += 1
+                raise RateLimited(max(1, int(sent[0] + self.window - now + 0.999)))
+            self.sent[path] = sent + [now]
+
+    def handle(self, path, query, body):
+        """(durum kodu, cevap gövdesi) döndür"""
+        if path == '/v1beta/cachedContents':
+            return self.create_cache(query, body)
+        self.check_rate(path)
+        match = _GENERATE.match(path)
+        if match:
+            return self.generate(match.group(1), query, body)
+        if path in _CHAT_PATHS:
+            return self.chat(path, body)
+        return 404, {'error': {'message': f'bilinmeyen yol: {path}'}}
+
+    def create_cache(self, query, body):
+        _require(query.get('key'), "key parametresi eksik")
+        _require(str(body.get('model', '')).startswith('models/'), "model 'models/...' biçiminde olmalı")
+        _text_parts(body.get('systemInstruction'), 'systemInstruction')
+        _require(re.fullmatch(r'\d+s', str(body.get('ttl', ''))), "ttl '<saniye>s' biçiminde olmalı")
+        _require('contents' not in body or isinstance(body['contents'], list), "contents liste olmalı")
+        if self.reject_cache:
+            return 400, {'error': {'message': 'Cached content is too small'}}
+        with self.lock:
+            name = f"cachedContents/stub-{len(self.caches) + 1}"
+            self.caches[name] = body
+        return 200, {'name': name, 'model': body['model'], 'ttl': body['ttl']}
+
+    def generate(self, model, query, body):
+        _require(query.get('key'), "key parametresi eksik")
+        contents = body.get('contents')
+        _require(isinstance(contents, list) and len(contents) == 1, "contents tek kullanıcı mesajı olmalı")
+        _require(contents[0].get('role', 'user') == 'user', "contents[0].role 'user' olmalı")
+        user = _text_parts(contents[0], 'contents[0]')
+        cached = body.get('cachedContent')
+        _require(not (cached and 'systemInstruction' in body),
+                 "cachedContent ile systemInstruction birlikte gönderilemez")
+        if cached:
+            _require(cached in self.caches, f"bilinmeyen önbellek: {cached}")
+            _require(self.caches[cached]['model'] == f"models/{model}", "önbellek modeli istekle uyuşmuyor")
+        elif 'systemInstruction' in body:
+            _text_parts(body['systemInstruction'], 'systemInstruction')
+        config = body.get('generationConfig') or {}
+        structured = config.get('responseMimeType') == 'application/json'
+        if structured:
+            _require(isinstance(config.get('responseSchema'), dict), "JSON modunda responseSchema gerekli")
+        text = canned_answer(user, structured)
+        self.generate_delay()
+        return 200, {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}],
+                     'usageMetadata': {'cachedContentTokenCount': 1 if cached else 0}}
+
+    def generate_delay(self):
+        """Model üretim süresini taklit et; aynı anda işlenen istek sayısını izle"""
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def chat(self, path, body):
+        _require(isinstance(body.get('model'), str) and body['model'], "model eksik")
+        messages = body.get('messages')
+        _require(isinstance(messages, list) and messages, "messages boş olmayan liste olmalı")
+        _require(all(isinstance(m, dict) and isinstance(m.get('content'), str) and m['content']
+                     for m in messages), "her mesaj metin içermeli")
+        roles = [m.get('role') for m in messages]
+        _require(roles in (['user'], ['system', 'user']), f"mesaj rolleri [system,] user olmalı: {roles}")
+        response_format = body.get('response_format') or {}
+        structured = response_format.get('type') in ('json_schema', 'json_object')
+        text = canned_answer(messages[-1]['content'], structured)
+        self.generate_delay()
+        return 200, {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}}]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        kind = parts.path
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            _require(isinstance(body, dict), "gövde JSON nesnesi olmalı")
+            status, payload = self.state.handle(parts.path, query, body)
+            self.state.record(kind, body)
+        except RateLimited as e:
+            self._reply(429, {'error': {'message': str(e)}}, {'Retry-After': str(e.retry_after)})
+            return
+        except (ShapeError, ValueError) as e:
+            self.state.record(kind, None, str(e))
+            status, payload = 400, {'error': {'message': str(e)}}
+        self._reply(status, payload)
+
+
+def start_server(port=0, reject_cache=False, delay=0.0, rpm=None, window=60.0):
+    """Sunucuyu arka planda başlat; (sunucu, durum) döndür"""
+    state = StubState(reject_cache=reject_cache, delay=delay, rpm=rpm, window=window)
+    handler = type('Handler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def point_borsa(borsa, port):
+    """borsa modülünün API adreslerini ve anahtarlarını sahte sunucuya çevir"""
+    base = f"http://127.0.0.1:{port}"
+    borsa.GEMINI_BASE_URL = base
+    borsa.XAI_BASE_URL = f"{base}/v1"
+    borsa.GROQ_BASE_URL = f"{base}/openai/v1"
+    borsa.LOCAL_LLM_BASE_URL = f"{base}/local/v1"
+    borsa.GEMINI_API_KEY = borsa.XAI_API_KEY = borsa.GROQ_API_KEY = "stub"
+    borsa._gemini_caches.clear()
+
+
+def selftest():
+    """borsa.py sorgularını sahte sunucuya gönder ve istek biçimlerini denetle"""
+    import borsa
+    from bench_prompt import synthetic_bars
+    from ai_schema import parse_structured_answer
+
+    frames = {s: borsa.calculate_indicators(synthetic_bars(seed=i, price=50.0 + 10 * i))
+              for i, s in enumerate(['THYAO', 'AKBNK', 'GARAN'])}
+
+    server, state = start_server()
+    point_borsa(borsa, server.server_address[1])
+    try:
+        for structured in (False, True):
+            statics = set()
+            for symbol, df in frames.items():
+                parts = borsa.create_prompt_parts(symbol, df, structured=structured)
+                assert parts.dynamic.startswith(f"[HİSSE] = {symbol}")
+                statics.add(parts.static)
+                for name, query in borsa.provider_order("local,gemini,grok,groq"):
+                    text = query(parts, structured=structured)
+                    assert text, f"{name} cevap vermedi"
+                    if structured:
+                        parse_structured_answer(text, provider=name)
+            assert len(statics) == 1, "statik önek semboller arasında aynı olmalı"
+        assert not state.errors, state.errors
+
+        # Gemini: statik önek başına tek önbellek, tüm çağrılar önbellekle
+        assert len(state.caches) == 2, f"beklenen 2 önbellek, oluşan {len(state.caches)}"
+        generate = [b for k, b in state.requests if k.endswith(':generateContent')]
+        assert generate and all('cachedContent' in b and 'systemInstruction' not in b for b in generate)
+        # xAI/Groq: sabit sistem mesajı, kullanıcı mesajında sadece sembol verisi
+        for path in _CHAT_PATHS:
+            chats = [b for k, b in state.requests if k == path]
+            systems = {(b.get('response_format') or {}).get('type'): b['messages'][0]['content'] for b in chats}
+            assert all(b['messages'][0]['role'] == 'system' for b in chats)
+            assert len({b['messages'][0]['content'] for b in chats}) == len(systems), "sistem mesajı değişmemeli"
+            assert all("TERİMLERİN AÇIKLAMASI" not in b['messages'][1]['content'] for b in chats)
+
+        local = [b for k, b in state.requests if k == '/local/v1/chat/completions']
+        assert len(local) == 2 * len(frames) and all(b['model'] == borsa.LOCAL_LLM_MODEL for b in local)
+
+        # Düz metin prompt eski biçimle (tek kullanıcı mesajı) gönderilmeye devam eder
+        before = len(state.requests)
+        prompt = borsa.create_prompt('THYAO', frames['THYAO'])
+        assert borsa.query_groq(prompt) and borsa.query_gemini(prompt)
+        groq_body = state.requests[before][1]
+        gemini_body = state.requests[before + 1][1]
+        assert [m['role'] for m in groq_body['messages']] == ['user']
+        assert 'cachedContent' not in gemini_body and 'systemInstruction' not in gemini_body
+    finally:
+        server.shutdown()
+
+    # Önbellek reddedilirse (örn. asgari boyutun altında) öneki sistem talimatı olarak gönder
+    server, state = start_server(reject_cache=True)
+    point_borsa(borsa, server.server_address[1])
+    try:
+        parts = borsa.create_prompt_parts('THYAO', frames['THYAO'])
+        assert borsa.query_gemini(parts) and borsa.query_gemini(parts)
+        kinds = [k for k, _ in state.requests]
+        assert kinds.count('/v1beta/cachedContents') == 1, "başarısız önbellek tekrar denenmemeli"
+        generate = [b for k, b in state.requests if k.endswith(':generateContent')]
+        assert all('systemInstruction' in b and 'cachedContent' not in b for b in generate)
+    finally:
+        server.shutdown()
+
+    # Yerel model: toplu sorgu eşzamanlı gönderilir, cevaplar prompt sırasıyla döner
+    delay = 0.3
+    server, state = start_server(delay=delay)
+    point_borsa(borsa, server.server_address[1])
+    try:
+        symbols = list(frames) * 2
+        prompts = [borsa.create_prompt_parts(s, frames[s], structured=True) for s in symbols]
+        started = time.perf_counter()
+        answers = borsa.query_local_batch(prompts, structured=True, max_workers=len(prompts))
+        elapsed = time.perf_counter() - started
+        results = [parse_structured_answer(text, provider='Yerel') for text in answers]
+        for symbol, result in zip(symbols, results):
+            assert abs(result.price - frames[symbol]['Close'].iloc[-1]) < 0.01, "cevaplar sırası bozuldu"
+        assert state.max_in_flight == len(prompts), f"eşzamanlı istek: {state.max_in_flight}"
+        assert elapsed < delay * len(prompts) / 2, f"toplu sorgu sıralı çalıştı ({elapsed:.2f} sn)"
+    finally:
+        server.shutdown()
+
+    # Zamanlayıcı yerel model yuvalarını query_local_batch ile toplu doldurur
+    from scheduler import RequestScheduler
+    server, state = start_server(delay=delay)
+    point_borsa(borsa, server.server_address[1])
+    batches = []
+
+    def counted_batch(batch_prompts, structured=False, max_workers=None):
+        batches.append(len(batch_prompts))
+        return borsa.query_local_batch(batch_prompts, structured, max_workers)
+
+    scheduler = RequestScheduler([('Yerel', borsa.query_local)], concurrency={'Yerel': len(prompts)},
+                                 batch={'Yerel': counted_batch})
+    try:
+        futures = scheduler.submit_many(prompts, structured=True)
+        assert all(f.result(timeout=30)[1] for f in futures), "zamanlayıcı yerel cevapsız istek bıraktı"
+        assert batches == [len(prompts)], f"toplu çağrılar: {batches}"
+    finally:
+        scheduler.close()
+        server.shutdown()
+
+    # Zamanlayıcı: kota biliniyorsa 429 alınmadan pencereye yayılır, bilinmiyorsa Retry-After'a uyulur
+    window = 1.0
+    queued = [borsa.create_prompt_parts(s, frames[s]) for s in list(frames) * 3]
+    for limits, expect_429 in (({'Groq': (3, None)}, False), ({'Groq': (None, None)}, True)):
+        server, state = start_server(rpm=3, window=window)
+        point_borsa(borsa, server.server_address[1])
+        scheduler = RequestScheduler([('Groq', borsa.query_groq)], limits=limits, window=window)
+        try:
+            started = time.perf_counter()
+            futures = [scheduler.submit(p, priority=i) for i, p in enumerate(queued)]
+            assert all(f.result(timeout=30)[1] for f in futures), "zamanlayıcı cevapsız istek bıraktı"
+            scheduled = time.perf_counter() - started
+            assert (state.rejected > 0) == expect_429, f"429 sayısı: {state.rejected}"
+            assert scheduled >= window * (len(queued) / 3 - 1) * 0.9, "kota aşıldı"
+        finally:
+            scheduler.close()
+            server.shutdown()
+
+    print(f"Sahte sağlayıcı denetimi başarılı: {len(frames)} sembol, 4 sağlayıcı, metin ve JSON modu; "
+          f"yerel toplu sorgu {len(prompts)} istek {elapsed:.2f} sn; zamanlayıcı {scheduled:.2f} sn")
+
+
+def main(argv):
+    if '--selftest' in argv:
+        selftest()
+        return
+    port = int(argv[argv.index('--port') + 1]) if '--port' in argv else 8765
+    delay = float(argv[argv.index('--delay') + 1]) if '--delay' in argv else 0.0
+    rpm = int(argv[argv.index('--rpm') + 1]) if '--rpm' in argv else None
+    server, state = start_server(port, reject_cache='--reject-cache' in argv, delay=delay, rpm=rpm)
+    print(f"Sahte sağlayıcı http://127.0.0.1:{port} adresinde çalışıyor (Ctrl+C ile durdur)")
+    print(f"  GEMINI_BASE_URL=http://127.0.0.1:{port}")
+    print(f"  XAI_BASE_URL=http://127.0.0.1:{port}/v1")
+    print(f"  GROQ_BASE_URL=http://127.0.0.1:{port}/openai/v1")
+    print(f"  LOCAL_LLM_BASE_URL=http://127.0.0.1:{port}/local/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n{len(state.requests)} istek alındı, {len(state.errors)} biçim hatası")
+        for kind, error in state.errors:
+            print(f"  {kind}: {error}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
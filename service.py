@@ -0,0 +1,378 @@
+"""Uzun süre çalışan HTTP analiz servisi (asyncio, yalnız standart kütüphane)
+
+borsa.py'nin tek giriş noktası input() ile soru soran main() fonksiyonudur; her
+kullanıcı ayrı bir Python süreci başlatıp içe aktarma ve veri indirme maliyetini
+baştan öder. Bu servis süreç içinde sıcak kalır:
+
+- İndirilen mumlar ve göstergeler bellekte tutulur; 15 dakikalık mum dilimi
+  değişene kadar aynı sembol için yeniden indirme yapılmaz.
+- AI analizi son mum başına bir kez yapılır ve saklanır.
+- Eşzamanlı aynı istekler singleflight ile tek hesabı paylaşır; veri/gösterge
+  işleri ve AI çağrıları ayrı semaforlarla sınırlanır.
+
+Uç noktalar (tümü GET, cevaplar JSON):
+    /status                             borsa durumu (is_market_open)
+    /indicators/THYAO                   son mumun gösterge görüntüsü
+    /indicators?symbols=THYAO,GARAN     toplu gösterge görüntüsü
+    /analysis/THYAO                     AI analizi (cevap metni + yapılandırılmış sonuç)
+    /analysis?symbols=THYAO,GARAN       toplu AI analizi
+    /stats                              önbellek, birleştirme ve istek istatistikleri
+    /metrics                            Prometheus metin biçiminde metrikler (bkz. metrics.py)
+
+Kullanım:
+    python service.py [--host 127.0.0.1] [--port 8000] [--preload THYAO,GARAN]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+import borsa
+import metrics
+import singleflight
+from jsonl import indicator_snapshot
+from sessions import SESSION_TZ
+
+SERVICE_HOST = os.getenv("BIST_SERVICE_HOST") or "127.0.0.1"
+SERVICE_PORT = int(os.getenv("BIST_SERVICE_PORT") or 8000)
+# Aynı anda çalışan indirme/gösterge işi ve AI analizi sayısı
+SERVICE_CONCURRENCY = int(os.getenv("BIST_SERVICE_CONCURRENCY") or 8)
+SERVICE_AI_CONCURRENCY = int(os.getenv("BIST_SERVICE_AI_CONCURRENCY") or 2)
+# Toplu istekte en fazla sembol sayısı
+MAX_BATCH = int(os.getenv("BIST_SERVICE_MAX_BATCH") or 20)
+# İstek satırı ve başlıklar için süre sınırı (saniye); boşta bekleyen bağlantı kapatılır
+HEADER_TIMEOUT = 30.0
+# İstek başına en fazla başlık sayısı ve gövde boyutu (bayt); aşılırsa 400
+MAX_HEADERS = 100
+MAX_BODY = 64 * 1024
+
+SYMBOL_PATTERN = re.compile(r'^[A-Z0-9]{2,12}$')
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MarketCache:
+    """Sembol başına son gösterge tablosu ve analiz
+
+    Yalnız olay döngüsünden kullanılır; kilit gerekmez.
+    """
+
+    def __init__(self):
+        self._frames = {}     # sembol -> (mum dilimi, gösterge tablosu)
+        self._analyses = {}   # sembol -> (son mum, cevap)
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def frame(self, symbol, bucket):
+        entry = self._frames.get(symbol)
+        if entry is not None and entry[0] == bucket:
+            self.hits['frame'] += 1
+            return entry[1]
+        self.misses['frame'] += 1
+        return None
+
+    def put_frame(self, symbol, bucket, df):
+        self._frames[symbol] = (bucket, df)
+
+    def analysis(self, symbol, bar):
+        entry = self._analyses.get(symbol)
+        if entry is not None and entry[0] == bar:
+            self.hits['analysis'] += 1
+            return entry[1]
+        self.misses['analysis'] += 1
+        return None
+
+    def put_analysis(self, symbol, bar, payload):
+        self._analyses[symbol] = (bar, payload)
+
+    def stats(self):
+        return {
+            'symbols': sorted(self._frames),
+            'analyses': len(self._analyses),
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+        }
+
+
+class AnalysisService:
+    """İstekleri önbellek, singleflight ve semaforlar üzerinden borsa fonksiyonlarına bağlar"""
+
+    def __init__(self, concurrency=SERVICE_CONCURRENCY, ai_concurrency=SERVICE_AI_CONCURRENCY):
+        self.cache = MarketCache()
+        self.concurrency = concurrency
+        self.ai_concurrency = ai_concurrency
+        self._work = asyncio.Semaphore(concurrency)
+        self._ai = asyncio.Semaphore(ai_concurrency)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.started = time.time()
+
+    async def frame(self, symbol):
+        """Göstergeleri hesaplanmış tablo (mum dilimi içinde bellekten)"""
+        bucket = singleflight.bar_bucket()
+        df = self.cache.frame(symbol, bucket)
+        if df is not None:
+            return df
+        async with self._work:
+            df = await asyncio.to_thread(singleflight.fetch, symbol)
+            if df is None or df.empty:
+                raise HTTPError(404, f"{symbol} için veri bulunamadı")
+            df = await asyncio.to_thread(singleflight.indicators, symbol, df)
+        if df is None or df.empty:
+            raise HTTPError(500, f"{symbol} için göstergeler hesaplanamadı")
+        self.cache.put_frame(symbol, bucket, df)
+        return df
+
+    async def indicators(self, symbol):
+        return indicator_snapshot(symbol, await self.frame(symbol))
+
+    async def analysis(self, symbol):
+        """Son mum için AI analizi (mum başına bir kez)"""
+        df = await self.frame(symbol)
+        bar = df.index[-1]
+        payload = self.cache.analysis(symbol, bar)
+        if payload is not None:
+            return payload
+        async with self._ai:
+            answer, result = await asyncio.to_thread(singleflight.analysis, symbol, df)
+        if not answer:
+            raise HTTPError(503, "AI servislerine ulaşılamadı")
+        payload = {
+            'symbol': symbol,
+            'bar': bar.isoformat(),
+            'mode': borsa.AI_MODE,
+            'answer': answer,
+            'result': result.to_dict() if result is not None else None,
+        }
+        self.cache.put_analysis(symbol, bar, payload)
+        return payload
+
+    async def batch(self, handler, symbols):
+        """Sembolleri eşzamanlı işle; hatalar sembol bazında döner"""
+        results = await asyncio.gather(*(handler(symbol) for symbol in symbols), return_exceptions=True)
+        items, errors = [], {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, HTTPError):
+                errors[symbol] = str(result)
+            elif isinstance(result, Exception):
+                errors[symbol] = f"İç hata: {result}"
+            else:
+                items.append(result)
+        return {'results': items, 'errors': errors}
+
+    def status(self):
+        is_open, message = borsa.is_market_open()
+        return {'open': is_open, 'message': message,
+                'time': pd.Timestamp.now(tz=SESSION_TZ).isoformat()}
+
+    def stats(self):
+        return {
+            'uptime': round(time.time() - self.started, 1),
+            'requests': dict(self.requests),
+            'errors': dict(self.errors),
+            'concurrency': {'work': self.concurrency, 'ai': self.ai_concurrency},
+            'cache': self.cache.stats(),
+            'singleflight': singleflight.stage_stats(),
+        }
+
+    def collect_metrics(self):
+        """metrics.REGISTRY toplayıcısı: servis önbelleği ve istek sayıları"""
+        hits, misses = self.cache.hits, self.cache.misses
+        ratios = [({'cache': kind}, hits[kind] / (hits[kind] + misses[kind]))
+                  for kind in set(hits) | set(misses)]
+        return [
+            metrics.counter_from('bist_service_requests_total', "Servis istekleri", ['route'],
+                             [({'route': route}, n) for route, n in self.requests.items()]),
+            metrics.counter_from('bist_service_errors_total', "Hata ile dönen servis istekleri", ['status'],
+                             [({'status': status}, n) for status, n in self.errors.items()]),
+            metrics.gauge_from('bist_service_cache_hit_ratio', "Servis önbelleği isabet oranı", ['cache'], ratios),
+        ]
+
+    async def route(self, method, target):
+        """JSON gövdesi (sözlük) veya metrik metni"""
+        if method != 'GET':
+            raise HTTPError(405, "Yalnız GET desteklenir")
+        url = urlsplit(target)
+        parts = [p for p in url.path.split('/') if p]
+        if not parts:
+            raise HTTPError(404, "Bilinmeyen adres")
+        name = parts[0]
+        self.requests[name] += 1
+        if name == 'status' and len(parts) == 1:
+            return self.status()
+        if name == 'stats' and len(parts) == 1:
+            return self.stats()
+        if name == 'metrics' and len(parts) == 1:
+            return metrics.render()
+        if name in ('indicators', 'analysis'):
+            handler = self.indicators if name == 'indicators' else self.analysis
+            if len(parts) == 2:
+                return await handler(parse_symbol(parts[1]))
+            if len(parts) == 1:
+                return await self.batch(handler, parse_symbols(parse_qs(url.query).get('symbols', [])))
+        raise HTTPError(404, "Bilinmeyen adres")
+
+
+def parse_symbol(text):
+    symbol = text.strip().upper()
+    if symbol.endswith('.IS'):
+        symbol = symbol[:-3]
+    if not SYMBOL_PATTERN.match(symbol):
+        raise HTTPError(400, f"Geçersiz sembol: {text}")
+    return symbol
+
+
+def parse_symbols(values):
+    """?symbols=A,B&symbols=C -> [A, B, C] (tekrarlar atılır)"""
+    symbols = list(dict.fromkeys(parse_symbol(s) for value in values for s in value.split(',') if s.strip()))
+    if not symbols:
+        raise HTTPError(400, "symbols parametresi gerekli")
+    if len(symbols) > MAX_BATCH:
+        raise HTTPError(400, f"En fazla {MAX_BATCH} sembol istenebilir")
+    return symbols
+
+
+async def _readline(reader):
+    try:
+        return await reader.readline()
+    except ValueError:
+        # StreamReader sınırını (64 KB) aşan satır
+        raise HTTPError(400, "Satır çok uzun")
+
+
+async def _read_request(reader):
+    """İstek satırı ve başlıklar; bağlantı kapandıysa None
+
+    Bozuk istek satırı, fazla başlık ve geçersiz veya çok büyük Content-Length
+    HTTPError(400) verir.
+    """
+    line = await _readline(reader)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "Geçersiz istek satırı")
+    headers = {}
+    for _ in range(MAX_HEADERS + 1):
+        line = await _readline(reader)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, f"En fazla {MAX_HEADERS} başlık gönderilebilir")
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(400, "Geçersiz Content-Length")
+    if length < 0 or length > MAX_BODY:
+        raise HTTPError(400, "Geçersiz Content-Length")
+    if length:
+        await reader.readexactly(length)
+    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+    return method, target, keep_alive
+
+
+def _response(status, payload, keep_alive):
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), metrics.CONTENT_TYPE
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), "application/json; charset=utf-8"
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def handle_connection(service, reader, writer):
+    """Bağlantı başına döngü: HTTP/1.1 keep-alive ile art arda istekler"""
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(_read_request(reader), HEADER_TIMEOUT)
+            except HTTPError as e:
+                writer.write(_response(e.status, {'error': str(e)}, False))
+                break
+            if request is None:
+                break
+            method, target, keep_alive = request
+            try:
+                status, payload = 200, await service.route(method, target)
+            except HTTPError as e:
+                service.errors[e.status] += 1
+                status, payload = e.status, {'error': str(e)}
+            except Exception as e:
+                service.errors[500] += 1
+                print(f"Servis hatası ({target}): {str(e)}")
+                status, payload = 500, {'error': f"İç hata: {e}"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(host=SERVICE_HOST, port=SERVICE_PORT, preload=(), ready=None):
+    """Servisi başlat ve kapanana kadar çalıştır
+
+    preload: açılışta indirilip göstergeleri hesaplanacak semboller
+    ready: dinlemeye başlayınca (host, port) ile çağrılır
+    """
+    service = AnalysisService()
+    metrics.REGISTRY.add_collector(service.collect_metrics)
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    address = server.sockets[0].getsockname()
+    print(f"BIST analiz servisi: http://{address[0]}:{address[1]}")
+    if preload:
+        results = await service.batch(service.indicators, list(preload))
+        print(f"Önyükleme: {len(results['results'])}/{len(preload)} sembol hazır")
+    if ready is not None:
+        ready(address[0], address[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv):
+    host, port, preload = SERVICE_HOST, SERVICE_PORT, []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--host':
+            host = next(args)
+        elif arg == '--port':
+            port = int(next(args))
+        elif arg == '--preload':
+            preload = parse_symbols([next(args)])
+        else:
+            print(__doc__)
+            return
+    try:
+        asyncio.run(serve(host, port, preload))
+    except KeyboardInterrupt:
+        print("Servis durduruldu")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
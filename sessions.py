@@ -0,0 +1,164 @@
+"""Seans (işlem günü) bazlı gösterge çekirdekleri
+
+BIST'te bir seans yerel tarihe göre gruplanır; tam günlerde 32'den az, yarım
+günlerde daha da az 15 dakikalık mum bulunur. Bu yüzden "bugün" için sabit
+mum sayısı (tail(32), pct_change(32)) yerine seans numarası kullanılır:
+
+- Seans başında sıfırlanan VWAP (seans içi gruplanmış kümülatif toplamlar)
+- Gerçek günlük değişim: son fiyatın bir önceki seansın kapanışına göre değişimi
+- Günün açılışı, o ana kadarki en yüksek ve en düşük fiyatı
+
+Toplu hesap vektöreldir; SessionState aynı değerleri canlı mum akışında
+mum başına O(1) günceller.
+"""
+
+import numpy as np
+import pandas as pd
+
+SESSION_TZ = 'Europe/Istanbul'
+
+# calculate_indicators'a eklenen seans sütunları (VWAP ve Price_Change_1d mevcut sütunlardır)
+SESSION_COLUMNS = ['Session_Open', 'Session_High', 'Session_Low']
+
+
+def local_index(index):
+    """Zaman indeksini İstanbul yerel saatine çevir (saat dilimsiz indeks yerel kabul edilir)"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert(SESSION_TZ)
+    return index
+
+
+def session_ids(index):
+    """Her mum için seans numarası (0'dan başlar, yerel tarih değiştikçe bir artar)"""
+    n = len(index)
+    ids = np.zeros(n, dtype=np.int64)
+    if n > 1:
+        days = local_index(index).normalize().as_unit('ns').asi8
+        np.cumsum(days[1:] != days[:-1], out=ids[1:])
+    return ids
+
+
+def session_starts(ids):
+    """Her seansın ilk mumunun konumu"""
+    ids = np.asarray(ids)
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+
+
+def session_start_position(index, position, sessions_back=0):
+    """position'daki mumun seansından sessions_back önceki seansın ilk mumunun konumu"""
+    ids = session_ids(index)
+    if len(ids) == 0:
+        return 0
+    starts = session_starts(ids)
+    return int(starts[max(0, ids[min(position, len(ids) - 1)] - sessions_back)])
+
+
+def session_vwap(df, ids=None):
+    """Seans başında sıfırlanan hacim ağırlıklı ortalama fiyat
+
+    Seansın o ana kadarki hacmi sıfırsa tipik fiyat döner.
+    """
+    ids = session_ids(df.index) if ids is None else ids
+    typical_price = (df['High'] + df['Low'] + df['Close']) / 3
+    volume = df['Volume'].astype(np.float64)
+    cum_pv = (typical_price * volume).groupby(ids).cumsum()
+    cum_volume = volume.groupby(ids).cumsum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.where(cum_volume > 0, cum_pv / cum_volume, typical_price)
+    return pd.Series(vwap, index=df.index)
+
+
+def session_indicators(df):
+    """VWAP, Price_Change_1d ve Session_Open/High/Low sütunlarını tek seferde hesapla"""
+    ids = session_ids(df.index)
+    starts = session_starts(ids)
+    close = df['Close'].to_numpy(dtype=np.float64)
+
+    if len(close):
+        # Her seansın son kapanışı; ilk seansın öncesi bilinmiyor
+        session_close = close[np.r_[starts[1:] - 1, len(close) - 1]]
+        prev_close = np.r_[np.nan, session_close[:-1]][ids]
+    else:
+        prev_close = np.empty(0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = (close / prev_close - 1) * 100
+
+    return {
+        'VWAP': session_vwap(df, ids),
+        'Price_Change_1d': pd.Series(change, index=df.index),
+        'Session_Open': pd.Series(df['Open'].to_numpy(dtype=np.float64)[starts][ids], index=df.index),
+        'Session_High': df['High'].groupby(ids).cummax().astype(np.float64),
+        'Session_Low': df['Low'].groupby(ids).cummin().astype(np.float64),
+    }
+
+
+class SessionState:
+    """Canlı mum akışı için seans değerleri (mum başına O(1))
+
+    state = SessionState()
+    state.seed(df)                                  # geçmiş mumlar
+    values = state.update(ts, open, high, low, close, volume)
+    """
+
+    def __init__(self):
+        self.day = None
+        self.prev_close = np.nan
+        self.last_close = np.nan
+        self.open = np.nan
+        self.high = np.nan
+        self.low = np.nan
+        self.cum_pv = 0.0
+        self.cum_volume = 0.0
+
+    def _day(self, timestamp):
+        ts = pd.Timestamp(timestamp)
+        if ts.tz is not None:
+            ts = ts.tz_convert(SESSION_TZ)
+        return ts.date()
+
+    def update(self, timestamp, open_price, high, low, close, volume):
+        day = self._day(timestamp)
+        if day != self.day:
+            if self.day is not None:
+                self.prev_close = self.last_close
+            self.day = day
+            self.open, self.high, self.low = open_price, high, low
+            self.cum_pv = self.cum_volume = 0.0
+        else:
+            self.high = max(self.high, high)
+            self.low = min(self.low, low)
+
+        typical_price = (high + low + close) / 3
+        self.cum_pv += typical_price * volume
+        self.cum_volume += volume
+        self.last_close = close
+        return self.values(typical_price)
+
+    def values(self, typical_price=np.nan):
+        vwap = self.cum_pv / self.cum_volume if self.cum_volume > 0 else typical_price
+        change = (self.last_close / self.prev_close - 1) * 100 if self.prev_close > 0 else np.nan
+        return {
+            'VWAP': vwap,
+            'Price_Change_1d': change,
+            'Session_Open': self.open,
+            'Session_High': self.high,
+            'Session_Low': self.low,
+        }
+
+    def seed(self, df):
+        """Geçmiş mumlardan sadece son iki seansı okuyarak durumu kur; son değerleri döndür"""
+        if df is None or len(df) == 0:
+            return self.values()
+        ids = session_ids(df.index)
+        starts = session_starts(ids)
+        if len(starts) > 1:
+            self.day = self._day(df.index[starts[-1] - 1])
+            self.last_close = float(df['Close'].iloc[starts[-1] - 1])
+        result = {}
+        for row in df.iloc[starts[-1]:][['Open', 'High', 'Low', 'Close', 'Volume']].itertuples():
+            result = self.update(row.Index, row.Open, row.High, row.Low, row.Close, row.Volume)
+        return result
@@ -0,0 +1,154 @@
+"""Paylaşımlı bellek (multiprocessing.shared_memory) ile paralel gösterge hesaplama
+
+Çok sayıda hisse için calculate_indicators işçi süreçlere dağıtılırken
+DataFrame'lerin pickle ile gidip gelmesi hesaplamadan daha pahalı hale gelir.
+Bu modülde fiyat (OHLCV) ve gösterge dizileri tek seferde paylaşımlı bellek
+bloklarına yerleştirilir; işçiler kendi dilimlerini yerinde okuyup yazar ve
+süreçler arasında sadece küçük tanımlayıcılar (blok adı, şekil, satır sayısı) taşınır.
+"""
+
+import os
+import sys
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from borsa import PRICE_COLUMNS, INDICATOR_COLUMNS, calculate_indicators
+
+# return_arrays=True iken dönen dizinin sütunları
+ARRAY_COLUMNS = PRICE_COLUMNS + INDICATOR_COLUMNS
+
+# İşçi süreç içindeki bağlı bloklar (_init_worker tarafından doldurulur)
+_worker_blocks = {}
+
+
+def _attach(name):
+    """Var olan bir paylaşımlı bellek bloğuna bağlan (sahiplik ana süreçte kalır)
+
+    Havuz işçileri ana sürecin resource_tracker'ını paylaştığından ek bir
+    kayıt silme işlemine gerek yoktur; blokları yalnızca ana süreç siler.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(layout):
+    """İşçi başlatıcı - blokları süreç başına bir kez bağlar"""
+    for key, (name, shape, dtype) in layout.items():
+        shm = _attach(name)
+        _worker_blocks[key] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+def _compute_slice(task):
+    """Tek hisse: girdi dilimini oku, göstergeleri hesapla, çıktı dilimine yaz"""
+    row, length, tz = task
+    prices = _worker_blocks['prices'][1]
+    index = _worker_blocks['index'][1]
+    output = _worker_blocks['output'][1]
+    try:
+        dt_index = pd.to_datetime(index[row, :length], unit='ns', utc=True)
+        dt_index = dt_index.tz_convert(tz) if tz else dt_index.tz_localize(None)
+        df = pd.DataFrame(prices[row, :length, :], index=dt_index, columns=PRICE_COLUMNS)
+        result = calculate_indicators(df)
+        values = result.reindex(columns=INDICATOR_COLUMNS).to_numpy(dtype=np.float64)
+        output[row, :length, :] = values
+        return row, True
+    except Exception as e:
+        print(f"Paylaşımlı bellek işçi hatası (satır {row}): {e}")
+        return row, False
+
+
+def _release(blocks, unlink):
+    """Dizi görünümlerini bırakıp blokları kapat (ve gerekirse sil)"""
+    shms = [shm for shm, _ in blocks.values()]
+    blocks.clear()
+    for shm in shms:
+        try:
+            shm.close()
+        except BufferError:
+            # Hata izinde hâlâ bir görünüm varsa eşleme çöp toplayıcıyla kapanır
+            pass
+        if unlink:
+            shm.unlink()
+
+
+def _create_block(shape, dtype):
+    nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def calculate_indicators_shared(frames, processes=None, return_arrays=False):
+    """Birden çok hissenin göstergelerini paylaşımlı bellek üzerinden paralel hesapla
+
+    frames: {sembol: get_stock_data çıktısı DataFrame}
+    return_arrays: True ise DataFrame yerine (semboller, zaman indeksleri,
+        [sembol x zaman x sütun] dizisi) döner; sütunlar ARRAY_COLUMNS
+        (PRICE_COLUMNS + INDICATOR_COLUMNS) sırasındadır, dizi kopyadır.
+    """
+    symbols = [s for s, df in frames.items() if df is not None and len(df) > 0]
+    if not symbols:
+        return {} if not return_arrays else ([], [], np.empty((0, 0, len(ARRAY_COLUMNS))))
+
+    n_symbols = len(symbols)
+    max_len = max(len(frames[s]) for s in symbols)
+    processes = processes or os.cpu_count() or 1
+
+    blocks = {}
+    try:
+        blocks['prices'] = _create_block((n_symbols, max_len, len(PRICE_COLUMNS)), np.float64)
+        blocks['index'] = _create_block((n_symbols, max_len), np.int64)
+        blocks['output'] = _create_block((n_symbols, max_len, len(INDICATOR_COLUMNS)), np.float64)
+
+        prices, index, output = (blocks[k][1] for k in ('prices', 'index', 'output'))
+        # Kısa serilerin dolgu satırları NaN olmalı; sıfır dolgu geçerli mum sayılır
+        prices.fill(np.nan)
+        output.fill(np.nan)
+
+        tasks = []
+        for row, symbol in enumerate(symbols):
+            df = frames[symbol]
+            length = len(df)
+            prices[row, :length, :] = df.reindex(columns=PRICE_COLUMNS).to_numpy(dtype=np.float64)
+            dt_index = pd.DatetimeIndex(df.index)
+            tz = str(dt_index.tz) if dt_index.tz is not None else None
+            if tz is None:
+                dt_index = dt_index.tz_localize('UTC')
+            index[row, :length] = dt_index.as_unit('ns').asi8
+            tasks.append((row, length, tz))
+
+        layout = {k: (shm.name, arr.shape, arr.dtype.str) for k, (shm, arr) in blocks.items()}
+
+        if processes <= 1 or n_symbols == 1:
+            _init_worker(layout)
+            try:
+                statuses = [_compute_slice(task) for task in tasks]
+            finally:
+                _release(_worker_blocks, unlink=False)
+        else:
+            with mp.Pool(processes=min(processes, n_symbols), initializer=_init_worker,
+                         initargs=(layout,)) as pool:
+                statuses = pool.map(_compute_slice, tasks, chunksize=max(1, n_symbols // (processes * 4)))
+
+        failed = [symbols[row] for row, ok in statuses if not ok]
+        if failed:
+            print(f"Gösterge hesaplanamayan hisseler: {', '.join(failed)}")
+
+        if return_arrays:
+            indexes = [frames[s].index for s in symbols]
+            return symbols, indexes, np.concatenate([prices, output], axis=2)
+
+        results = {}
+        for row, symbol in enumerate(symbols):
+            df = frames[symbol]
+            length = len(df)
+            result = df.copy()
+            indicators = pd.DataFrame(output[row, :length, :].copy(), index=df.index, columns=INDICATOR_COLUMNS)
+            results[symbol] = pd.concat([result, indicators], axis=1)
+        return results
+
+    finally:
+        prices = index = output = None
+        _release(blocks, unlink=True)
@@ -0,0 +1,188 @@
+"""Deterministik kural tabanlı sinyal motoru (LLM'siz hızlı yol)
+
+Tüm AI sağlayıcıları başarısız olduğunda veya ağ erişimi olmadan hızlı sonuç
+gerektiğinde, şablondaki 1 saat / 1-5 saat / günlük / haftalık alanlarını
+(yön, Al/Sat, fiyat aralığı, kesin tahmin) doğrudan gösterge değerlerinden
+doldurur. Çekirdek hesap (analyze_values) düz float'larla çalışır ve sembol
+başına mikrosaniyeler sürer.
+"""
+
+import math
+import datetime
+
+from ai_schema import AnalysisResult, HorizonForecast
+
+PROVIDER_NAME = "Kural Motoru"
+
+# Ufuk: (mum sayısı, kısa vadeli ağırlık, trend ağırlığı)
+# Kısa ufuklarda momentum/dönüş sinyalleri, uzun ufuklarda trend sinyalleri baskındır
+HORIZON_WEIGHTS = {
+    '1h': (4, 0.7, 0.3),
+    '5h': (20, 0.5, 0.5),
+    'daily': (None, 0.4, 0.6),
+    'weekly': (None, 0.2, 0.8),
+}
+
+DIRECTION_THRESHOLD = 0.25
+STRONG_THRESHOLD = 0.6
+SESSION_CLOSE = datetime.time(18, 0)
+BARS_PER_SESSION = 32
+
+
+def _v(values, name):
+    value = values.get(name)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _clip(x, low=-1.0, high=1.0):
+    return max(low, min(high, x))
+
+
+def _mean(parts):
+    parts = [p for p in parts if p is not None]
+    return sum(parts) / len(parts) if parts else 0.0
+
+
+def short_term_score(values):
+    """Momentum ve aşırı alım/satım dönüş sinyallerinden [-1, 1] puan"""
+    rsi6 = _v(values, 'RSI_6')
+    rsi = _v(values, 'RSI')
+    stoch = _v(values, 'Stoch_K')
+    wr = _v(values, 'Williams_R')
+    hist = _v(values, 'MACD_histogram')
+    change = _v(values, 'Price_Change_1h')
+    close = _v(values, 'Close')
+    atr = _v(values, 'ATR')
+    parts = [
+        # Aşırı satım = yükseliş beklentisi (dönüş), aşırı alım = düşüş
+        _clip((50 - rsi6) / 25) if rsi6 is not None else None,
+        _clip((50 - rsi) / 20) * 0.5 if rsi is not None else None,
+        _clip((50 - stoch) / 30) if stoch is not None else None,
+        _clip((-50 - wr) / 30) if wr is not None else None,
+        _clip(hist / atr) if hist is not None and atr else None,
+        _clip(change / 1.5) * 0.5 if change is not None else None,
+    ]
+    if close is not None:
+        bb_upper, bb_lower = _v(values, 'BB_upper'), _v(values, 'BB_lower')
+        if bb_upper is not None and close > bb_upper:
+            parts.append(-1.0)
+        elif bb_lower is not None and close < bb_lower:
+            parts.append(1.0)
+    return _clip(_mean(parts))
+
+
+def trend_score(values):
+    """Hareketli ortalama, MACD, ADX, Ichimoku ve VWAP'tan [-1, 1] trend puanı"""
+    close = _v(values, 'Close')
+    if close is None:
+        return 0.0
+    parts = []
+    for name in ('EMA_5', 'EMA_20', 'SMA_20', 'SMA_50', 'VWAP'):
+        level = _v(values, name)
+        if level is not None:
+            parts.append(1.0 if close > level else -1.0)
+    ema5, ema20 = _v(values, 'EMA_5'), _v(values, 'EMA_20')
+    if ema5 is not None and ema20 is not None:
+        parts.append(1.0 if ema5 > ema20 else -1.0)
+    macd, signal = _v(values, 'MACD'), _v(values, 'MACD_signal')
+    if macd is not None and signal is not None:
+        parts.append(1.0 if macd > signal else -1.0)
+    adx, pos, neg = _v(values, 'ADX'), _v(values, 'ADX_pos'), _v(values, 'ADX_neg')
+    if adx is not None and pos is not None and neg is not None:
+        strength = _clip((adx - 15) / 25, 0.0, 1.0)
+        parts.append((1.0 if pos > neg else -1.0) * (0.5 + strength))
+    span_a, span_b = _v(values, 'Ichimoku_a'), _v(values, 'Ichimoku_b')
+    if span_a is not None and span_b is not None:
+        if close > max(span_a, span_b):
+            parts.append(1.0)
+        elif close < min(span_a, span_b):
+            parts.append(-1.0)
+    cmf = _v(values, 'CMF')
+    if cmf is not None:
+        parts.append(_clip(cmf / 0.1))
+    return _clip(_mean(parts))
+
+
+def _bars_left(timestamp):
+    """Günün ve haftanın kapanışına kalan 15 dakikalık mum sayısı"""
+    if timestamp is None:
+        return BARS_PER_SESSION // 2, BARS_PER_SESSION * 3
+    close_dt = datetime.datetime.combine(timestamp.date(), SESSION_CLOSE, tzinfo=timestamp.tzinfo)
+    today = max(1, int((close_dt - timestamp).total_seconds() // 900))
+    days_left = max(0, 4 - timestamp.weekday())
+    return today, today + days_left * BARS_PER_SESSION
+
+
+def _labels(score):
+    if score >= DIRECTION_THRESHOLD:
+        direction = 'Yükseliş'
+    elif score <= -DIRECTION_THRESHOLD:
+        direction = 'Düşüş'
+    else:
+        direction = 'Yatay'
+    buy = 'Güçlü Al' if score >= STRONG_THRESHOLD else ('Al' if score >= DIRECTION_THRESHOLD else 'Alma')
+    sell = 'Güçlü Sat' if score <= -STRONG_THRESHOLD else ('Sat' if score <= -DIRECTION_THRESHOLD else 'Satma')
+    return direction, buy, sell
+
+
+def _time_label(timestamp, bars_ahead):
+    if timestamp is None:
+        return "10:30"
+    moment = timestamp + datetime.timedelta(minutes=15 * bars_ahead)
+    latest = datetime.datetime.combine(timestamp.date(), datetime.time(17, 45), tzinfo=timestamp.tzinfo)
+    return min(moment, latest).strftime('%H:%M')
+
+
+def analyze_values(values, timestamp=None):
+    """Son mumun gösterge değerlerinden (sözlük) AnalysisResult üret
+
+    timestamp: son mumun zamanı (datetime); gün/hafta kapanışına kalan süreyi belirler.
+    """
+    close = _v(values, 'Close')
+    if close is None:
+        return None
+    atr = _v(values, 'ATR') or close * 0.005
+    short, trend = short_term_score(values), trend_score(values)
+    bars_today, bars_week = _bars_left(timestamp)
+
+    horizons = {}
+    for key, (bars, w_short, w_trend) in HORIZON_WEIGHTS.items():
+        if bars is None:
+            bars = bars_today if key == 'daily' else bars_week
+        score = _clip(w_short * short + w_trend * trend)
+        band = atr * math.sqrt(bars)
+        target = close + 0.5 * score * band
+        direction, buy, sell = _labels(score)
+        forecast = HorizonForecast(
+            direction=direction, buy_call=buy, sell_call=sell,
+            price_low=round(min(target, close) - 0.5 * band, 2),
+            price_high=round(max(target, close) + 0.5 * band, 2),
+            target=round(target, 2),
+        )
+        if key == 'daily':
+            # Yükselişte hemen al / kapanışa doğru sat, düşüşte tersi
+            early, late = _time_label(timestamp, 1), _time_label(timestamp, bars_today)
+            if direction == 'Düşüş':
+                forecast.buy_time, forecast.sell_time = late, early
+            else:
+                forecast.buy_time, forecast.sell_time = early, late
+        horizons[key] = forecast
+
+    return AnalysisResult(price=round(close, 2), horizons=horizons, provider=PROVIDER_NAME)
+
+
+def rule_based_analysis(df):
+    """calculate_indicators tablosunun son mumundan kural tabanlı analiz"""
+    try:
+        if df is None or len(df) == 0:
+            return None
+        timestamp = df.index[-1]
+        timestamp = timestamp.to_pydatetime() if hasattr(timestamp, 'to_pydatetime') else None
+        return analyze_values(df.iloc[-1].to_dict(), timestamp)
+    except Exception as e:
+        print(f"Kural motoru hatası: {str(e)}")
+        return None
@@ -0,0 +1,135 @@
+"""Aynı sembol için eşzamanlı indirme, gösterge ve analiz isteklerini birleştirme
+
+Birden çok panel veya işçi aynı anda THYAO isterse her biri kendi
+get_stock_data indirmesini, calculate_indicators hesabını ve query_ai
+çağrısını aynı girdilerle başlatır. Burada her aşama (fetch, indicators,
+analysis) için tek uçuş (single-flight) grubu vardır:
+
+- Anahtar (sembol, mum aralığı, mum zamanı): indirmede o anki 15 dakikalık
+  dilim, gösterge ve analizde tablonun son mumu.
+- Aynı anahtar için süren bir hesap varsa yeni çağıran onu bekler ve aynı
+  sonucu (veya aynı hatayı) alır; hesap bitince anahtar serbest kalır.
+- Aşama başına çağrı, çalıştırma ve paylaşım (isabet) sayıları tutulur.
+
+Paylaşılan tablolar tüm çağıranlar için aynı nesnedir; değiştirmeden önce kopyalayın.
+"""
+
+import threading
+import pandas as pd
+
+import borsa
+from indicator_cache import cached_calculate_indicators
+from sessions import SESSION_TZ
+
+STAGES = ('fetch', 'indicators', 'analysis')
+# get_stock_data'nın indirdiği mum aralığı
+BAR_INTERVAL = '15m'
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Anahtar başına tek çalışan hesap; eşzamanlı çağıranlar sonucu paylaşır"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.errors = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """func(*args, **kwargs) sonucunu döndür; aynı anahtar için süren hesap varsa onu bekle"""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            # Önce anahtarı bırak: bittikten sonra gelen çağrı yeni hesap başlatır
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'shared': self.shared,
+                'errors': self.errors,
+                'in_flight': len(self._flights),
+                'hit_rate': self.shared / self.calls if self.calls else 0.0,
+            }
+
+
+_stages = {stage: SingleFlight(stage) for stage in STAGES}
+
+
+def get_stage(stage):
+    return _stages[stage]
+
+
+def stage_stats():
+    """{aşama: {calls, executions, shared, errors, in_flight, hit_rate}}"""
+    return {stage: flight.stats() for stage, flight in _stages.items()}
+
+
+def bar_bucket(now=None, interval=BAR_INTERVAL):
+    """O anki mum diliminin başlangıcı (İstanbul saati)"""
+    now = pd.Timestamp.now(tz=SESSION_TZ) if now is None else pd.Timestamp(now)
+    return now.floor(pd.Timedelta(interval.replace('m', 'min')))
+
+
+def _last_bar(df):
+    return (df.index[-1], len(df))
+
+
+def fetch(symbol, now=None, interval=BAR_INTERVAL, verbose=True):
+    """get_stock_data: aynı mum diliminde eşzamanlı indirmeler tek indirmeyi paylaşır"""
+    key = (symbol, interval, bar_bucket(now, interval))
+    return _stages['fetch'].do(key, borsa.get_stock_data, symbol, verbose=verbose)
+
+
+def indicators(symbol, df, interval=BAR_INTERVAL):
+    """calculate_indicators (önbellekli): aynı son mum için tek hesap"""
+    if df is None or len(df) == 0:
+        return None
+    key = (symbol, interval) + _last_bar(df)
+    return _stages['indicators'].do(key, cached_calculate_indicators, df, symbol)
+
+
+def analysis(symbol, df, interval=BAR_INTERVAL):
+    """analyze_symbol: aynı son mum ve analiz modu için tek AI çağrısı; (cevap, AnalysisResult)"""
+    if df is None or len(df) == 0:
+        return None, None
+    key = (symbol, interval) + _last_bar(df) + (borsa.AI_MODE, borsa.STRUCTURED_OUTPUT)
+    return _stages['analysis'].do(key, borsa.analyze_symbol, symbol, df)
@@ -0,0 +1,161 @@
+"""Çok sayıda pencere uzunluğu için toplu gösterge hesaplama (parametre taraması)
+
+calculate_indicators pencereleri sabit kodlar (SMA/EMA 5/10/20/50, RSI 14/6,
+ATR 14 ...). Pencereleri hisse bazında ayarlamak için fonksiyonu yüzlerce kez
+çağırmak yerine burada bir gösterge ailesi, tüm pencere ızgarası ve tüm
+semboller için tek çağrıda hesaplanır:
+
+- SMA: kümülatif toplam farkı (pencere başına tek çıkarma)
+- EMA, RSI, ATR: scipy.signal.lfilter ile (zaman ekseninde) toplu özyineleme
+
+Sonuç her gösterge için (pencere x zaman x sembol) float32 dizidir. Isınma
+bölgesi NaN'dır; sonrasındaki değerler ta kütüphanesiyle aynıdır.
+"""
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Varsayılan tarama ızgarası
+SWEEP_WINDOWS = {
+    'SMA': [5, 10, 15, 20, 30, 50, 100],
+    'EMA': [5, 10, 15, 20, 30, 50, 100],
+    'RSI': [6, 9, 14, 21, 28],
+    'ATR': [7, 14, 21, 28],
+}
+
+# Göstergelerin ihtiyaç duyduğu fiyat sütunları
+SWEEP_COLUMNS = {
+    'SMA': ['Close'],
+    'EMA': ['Close'],
+    'RSI': ['Close'],
+    'ATR': ['High', 'Low', 'Close'],
+}
+
+
+def align_left(frames, columns):
+    """{sembol: tablo} sözlüğünü sola hizalı (zaman x sembol) dizilere çevir
+
+    Her sembol kendi ilk mumundan başlar; kısa seriler sonda NaN ile doldurulur.
+    Böylece özyinelemeler seri ortasında NaN görmez.
+    Döner: (semboller, indeksler, {sütun: dizi}, uzunluklar)
+    """
+    symbols = [s for s, df in frames.items() if df is not None and len(df) > 0]
+    lengths = np.array([len(frames[s]) for s in symbols], dtype=np.int64)
+    length = int(lengths.max()) if len(symbols) else 0
+    arrays = {}
+    for col in columns:
+        out = np.full((length, len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            out[:lengths[j], j] = frames[symbol][col].to_numpy(dtype=np.float64)
+        arrays[col] = out
+    return symbols, [frames[s].index for s in symbols], arrays, lengths
+
+
+def _ewm(values, alpha):
+    """adjust=False üssel ortalama: y0 = x0, yt = a*xt + (1-a)*y(t-1) (zaman ekseni 0)"""
+    if len(values) == 0:
+        return values.copy()
+    zi = ((1 - alpha) * values[0])[None, :]
+    result, _ = lfilter([alpha], [1.0, alpha - 1.0], values, axis=0, zi=zi)
+    return result
+
+
+def sma_sweep(close, windows, out=None):
+    """Kümülatif toplamla tüm pencereler için SMA (rolling(w).mean() ile aynı)"""
+    length = close.shape[0]
+    out = np.full((len(windows),) + close.shape, np.nan, dtype=np.float32) if out is None else out
+    csum = np.zeros((length + 1,) + close.shape[1:])
+    np.cumsum(close, axis=0, out=csum[1:])
+    for k, w in enumerate(windows):
+        if w <= length:
+            out[k, w - 1:] = (csum[w:] - csum[:-w]) / w
+    return out
+
+
+def ema_sweep(close, windows, out=None):
+    """EMAIndicator ile aynı: ewm(span=w, adjust=False, min_periods=w)"""
+    out = np.full((len(windows),) + close.shape, np.nan, dtype=np.float32) if out is None else out
+    for k, w in enumerate(windows):
+        if w <= close.shape[0]:
+            out[k, w - 1:] = _ewm(close, 2.0 / (w + 1))[w - 1:]
+    return out
+
+
+def rsi_sweep(close, windows, out=None):
+    """RSIIndicator ile aynı: Wilder ortalamalı yükseliş/düşüş oranı"""
+    out = np.full((len(windows),) + close.shape, np.nan, dtype=np.float32) if out is None else out
+    diff = np.zeros_like(close)
+    diff[1:] = close[1:] - close[:-1]
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    # Dolgu bölgesi NaN kalmalı
+    up[np.isnan(diff)] = np.nan
+    down[np.isnan(diff)] = np.nan
+    for k, w in enumerate(windows):
+        if w > close.shape[0]:
+            continue
+        emaup = _ewm(up, 1.0 / w)[w - 1:]
+        emadn = _ewm(down, 1.0 / w)[w - 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[k, w - 1:] = np.where(emadn == 0, 100.0, 100 - 100 / (1 + emaup / emadn))
+    return out
+
+
+def true_range(high, low, close):
+    """max(H-L, |H-önceki K|, |L-önceki K|); ilk mumda H-L"""
+    prev_close = np.full_like(close, np.nan)
+    prev_close[1:] = close[:-1]
+    tr = np.fmax(high - low, np.abs(high - prev_close))
+    return np.fmax(tr, np.abs(low - prev_close))
+
+
+def atr_sweep(high, low, close, windows, out=None):
+    """AverageTrueRange ile aynı: ilk değer w mumun TR ortalaması, sonrası Wilder"""
+    out = np.full((len(windows),) + close.shape, np.nan, dtype=np.float32) if out is None else out
+    tr = true_range(high, low, close)
+    for k, w in enumerate(windows):
+        if w > close.shape[0]:
+            continue
+        alpha = 1.0 / w
+        seed = tr[:w].mean(axis=0)
+        out[k, w - 1] = seed
+        if close.shape[0] > w:
+            zi = ((1 - alpha) * seed)[None, :]
+            out[k, w:], _ = lfilter([alpha], [1.0, alpha - 1.0], tr[w:], axis=0, zi=zi)
+    return out
+
+
+def sweep_indicators(frames, windows=None):
+    """Tüm semboller ve pencere ızgarası için göstergeleri tek çağrıda hesapla
+
+    frames: {sembol: OHLC tablosu} (get_stock_data veya calculate_indicators çıktısı)
+    windows: {gösterge: [pencereler]}; verilmezse SWEEP_WINDOWS kullanılır
+
+    Döner: (semboller, indeksler, {gösterge: (pencere x zaman x sembol) float32 dizi})
+    Zaman ekseni sola hizalıdır: [t, j] j. sembolün t. mumudur (indeksler[j][t]).
+    """
+    windows = windows or SWEEP_WINDOWS
+    unknown = set(windows) - set(SWEEP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen gösterge: {sorted(unknown)}")
+
+    columns = sorted({c for name in windows for c in SWEEP_COLUMNS[name]})
+    symbols, indexes, arrays, _ = align_left(frames, columns)
+
+    results = {}
+    for name, grid in windows.items():
+        grid = [int(w) for w in grid]
+        if name == 'SMA':
+            results[name] = sma_sweep(arrays['Close'], grid)
+        elif name == 'EMA':
+            results[name] = ema_sweep(arrays['Close'], grid)
+        elif name == 'RSI':
+            results[name] = rsi_sweep(arrays['Close'], grid)
+        elif name == 'ATR':
+            results[name] = atr_sweep(arrays['High'], arrays['Low'], arrays['Close'], grid)
+    return symbols, indexes, results
+
+
+def sweep_memory_report(results):
+    """Tarama dizilerinin bellek kullanımı (MB)"""
+    return {name: round(array.nbytes / 1024 ** 2, 2) for name, array in results.items()}
@@ -0,0 +1,253 @@
+"""Walk-forward parametre optimizasyonu (çok çekirdekli)
+
+Her hisse için geçmiş, kayan eğitim/test pencerelerine (fold) bölünür. Her
+fold'da parametre ızgarasındaki tüm kural setleri eğitim penceresinde
+backtest.evaluate_positions ile değerlendirilir, en iyi set seçilir ve sadece
+sonraki (görülmemiş) test penceresinde ölçülür. Rapor yalnızca örneklem dışı
+(out-of-sample) sonuçları içerir.
+
+- Göstergeler (sweep.sweep_indicators) ve pozisyon dizileri sembol başına bir
+  kez hesaplanır, fold'lar bu dizileri sadece dilimler. Göstergeler nedensel
+  olduğundan (t anındaki değer yalnızca t ve öncesini kullanır) test verisi
+  eğitime sızmaz.
+- Semboller parçalar halinde işçi süreçlere dağıtılır.
+
+Kullanım (mumlar tahmin defterinden okunur, bkz. ledger.py):
+    python walkforward.py [SEMBOLLER] [--processes N] [--train MUM] [--test MUM] [--out rapor.csv]
+"""
+
+import os
+import sys
+import itertools
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+from backtest import HORIZONS, FLAT_THRESHOLD_PCT, horizon_end_positions, evaluate_positions
+from sweep import sweep_indicators
+
+# Strateji: parametre ızgarası
+# rsi_reversion: RSI < low ise al, RSI > 100 - low ise sat, arada yatay
+# ema_cross: hızlı EMA yavaşın üstündeyse al, altındaysa sat
+PARAMETER_GRID = {
+    'rsi_reversion': {'window': [6, 9, 14, 21], 'low': [20, 25, 30, 35]},
+    'ema_cross': {'fast': [5, 10, 15, 20], 'slow': [20, 30, 50, 100]},
+}
+
+TRAIN_BARS = 32 * 20      # ~20 seans
+TEST_BARS = 32 * 5        # ~1 hafta
+OBJECTIVE = ('daily', 'avg_return_pct')
+MIN_TRADES = 20           # eğitimde bundan az Al/Sat sinyali olan set seçilmez
+CHUNK_SIZE = 8            # işçi başına sembol sayısı
+
+
+def parameter_sets(grid=None):
+    """Izgarayı [(strateji, {parametre: değer}), ...] listesine aç"""
+    grid = grid or PARAMETER_GRID
+    sets = []
+    for strategy, params in grid.items():
+        names = list(params)
+        for combo in itertools.product(*(params[name] for name in names)):
+            values = dict(zip(names, combo))
+            if strategy == 'ema_cross' and values['fast'] >= values['slow']:
+                continue
+            sets.append((strategy, values))
+    return sets
+
+
+def _sweep_windows(sets):
+    windows = {}
+    rsi = sorted({p['window'] for s, p in sets if s == 'rsi_reversion'})
+    ema = sorted({p[k] for s, p in sets if s == 'ema_cross' for k in ('fast', 'slow')})
+    if rsi:
+        windows['RSI'] = rsi
+    if ema:
+        windows['EMA'] = ema
+    return windows
+
+
+def position_matrix(results, windows, column, length, sets):
+    """Tek sembol için (zaman x parametre seti) pozisyon dizisi (+1/-1/0, NaN = sinyal yok)"""
+    out = np.full((length, len(sets)), np.nan)
+    for k, (strategy, p) in enumerate(sets):
+        if strategy == 'rsi_reversion':
+            rsi = results['RSI'][windows['RSI'].index(p['window']), :length, column].astype(np.float64)
+            pos = np.where(rsi < p['low'], 1.0, np.where(rsi > 100 - p['low'], -1.0, 0.0))
+            pos[np.isnan(rsi)] = np.nan
+        elif strategy == 'ema_cross':
+            ema = results['EMA'][:, :length, column].astype(np.float64)
+            pos = np.sign(ema[windows['EMA'].index(p['fast'])] - ema[windows['EMA'].index(p['slow'])])
+        else:
+            raise ValueError(f"Bilinmeyen strateji: {strategy}")
+        out[:, k] = pos
+    return out
+
+
+def make_folds(length, train_bars=TRAIN_BARS, test_bars=TEST_BARS, step=None):
+    """Kayan fold'lar: [(eğitim başı, test başı, test sonu), ...] (mum konumları)"""
+    step = step or test_bars
+    folds = []
+    start = 0
+    while start + train_bars + test_bars <= length:
+        folds.append((start, start + train_bars, start + train_bars + test_bars))
+        start += step
+    return folds
+
+
+def _slice_ends(ends, start, stop):
+    """Tüm seri için hesaplanmış ufuk sonlarını [start, stop) dilimine taşı"""
+    part = ends[start:stop]
+    local = part - start
+    local[(part < 0) | (part >= stop)] = -1
+    return local
+
+
+def _fold_metrics(close, positions, ends, start, stop, horizons, flat_threshold_pct, cost_pct):
+    fold_ends = {name: _slice_ends(ends[name], start, stop) for name in horizons}
+    block = close[start:stop]
+    return evaluate_positions(np.broadcast_to(block[:, None], (stop - start, positions.shape[1])),
+                              positions[start:stop], None, horizons=horizons,
+                              flat_threshold_pct=flat_threshold_pct, cost_pct=cost_pct, ends=fold_ends)
+
+
+def _objective_scores(metrics, objective, min_trades):
+    horizon, metric = objective
+    part = metrics[horizon]
+    trades = part['long'] + part['short']
+    return np.where(trades >= min_trades, np.nan_to_num(part[metric], nan=-np.inf), -np.inf)
+
+
+def walk_forward_symbol(symbol, close, index, positions, sets, folds, horizons=None, objective=OBJECTIVE,
+                        min_trades=MIN_TRADES, flat_threshold_pct=FLAT_THRESHOLD_PCT, cost_pct=0.0):
+    """Tek sembolün fold'larını değerlendir; fold başına bir rapor satırı döndür"""
+    horizons = horizons or HORIZONS
+    ends = {name: horizon_end_positions(index, horizon) for name, horizon in horizons.items()}
+    rows = []
+    for fold, (start, split, stop) in enumerate(folds):
+        train = _fold_metrics(close, positions, ends, start, split, horizons, flat_threshold_pct, cost_pct)
+        scores = _objective_scores(train, objective, min_trades)
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            continue
+
+        test = _fold_metrics(close, positions[:, [best]], ends, split, stop, horizons,
+                             flat_threshold_pct, cost_pct)
+        strategy, params = sets[best]
+        row = {
+            'symbol': symbol, 'fold': fold,
+            'train_start': index[start], 'test_start': index[split], 'test_end': index[stop - 1],
+            'strategy': strategy, 'params': ','.join(f"{k}={v}" for k, v in params.items()),
+            'train_score': float(scores[best]),
+        }
+        for name in horizons:
+            for metric in ('signals', 'hit_rate', 'avg_return_pct', 'total_return_pct'):
+                row[f"{name}_{metric}"] = float(test[name][metric][0])
+        rows.append(row)
+    return rows
+
+
+def _run_chunk(args):
+    """İşçi: sembol parçası için göstergeleri bir kez hesapla, tüm fold'ları değerlendir"""
+    frames, grid, train_bars, test_bars, step, options = args
+    sets = parameter_sets(grid)
+    windows = _sweep_windows(sets)
+    symbols, indexes, results = sweep_indicators(frames, windows)
+
+    rows = []
+    for j, symbol in enumerate(symbols):
+        length = len(indexes[j])
+        folds = make_folds(length, train_bars, test_bars, step)
+        if not folds:
+            continue
+        positions = position_matrix(results, windows, j, length, sets)
+        close = frames[symbol]['Close'].to_numpy(dtype=np.float64)
+        rows.extend(walk_forward_symbol(symbol, close, indexes[j], positions, sets, folds, **options))
+    return rows
+
+
+def walk_forward(frames, grid=None, train_bars=TRAIN_BARS, test_bars=TEST_BARS, step=None, processes=None,
+                 chunk_size=CHUNK_SIZE, horizons=None, objective=OBJECTIVE, min_trades=MIN_TRADES,
+                 flat_threshold_pct=FLAT_THRESHOLD_PCT, cost_pct=0.0):
+    """{sembol: OHLC tablosu} için walk-forward optimizasyonu
+
+    Döner: fold başına bir satırlık tablo (seçilen strateji/parametre, eğitim
+    puanı ve test penceresindeki ufuk metrikleri)
+    """
+    options = {'horizons': horizons, 'objective': objective, 'min_trades': min_trades,
+               'flat_threshold_pct': flat_threshold_pct, 'cost_pct': cost_pct}
+    symbols = [s for s, df in frames.items() if df is not None and len(df) >= train_bars + test_bars]
+    chunks = [{s: frames[s][['Close', 'High', 'Low']] for s in symbols[i:i + chunk_size]}
+              for i in range(0, len(symbols), chunk_size)]
+    tasks = [(chunk, grid, train_bars, test_bars, step, options) for chunk in chunks]
+
+    processes = processes or os.cpu_count() or 1
+    rows = []
+    if processes <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            rows.extend(_run_chunk(task))
+    else:
+        with mp.Pool(min(processes, len(tasks))) as pool:
+            for chunk_rows in pool.imap_unordered(_run_chunk, tasks):
+                rows.extend(chunk_rows)
+
+    report = pd.DataFrame(rows)
+    if len(report):
+        report = report.sort_values(['symbol', 'fold'], kind='stable').reset_index(drop=True)
+    return report
+
+
+def summarize_walkforward(report, objective=OBJECTIVE):
+    """Sembol başına örneklem dışı özet: ortalama test puanı, isabet, en sık seçilen parametre"""
+    if report is None or len(report) == 0:
+        return pd.DataFrame()
+    horizon, metric = objective
+    score = f"{horizon}_{metric}"
+    signals = report[f"{horizon}_signals"]
+    grouped = report.assign(_weighted_hits=report[f"{horizon}_hit_rate"].fillna(0) * signals).groupby('symbol')
+    summary = pd.DataFrame({
+        'folds': grouped.size(),
+        'train_score': grouped['train_score'].mean(),
+        'test_score': grouped[score].mean(),
+        'test_hit_rate': grouped['_weighted_hits'].sum() / grouped[f"{horizon}_signals"].sum(),
+        'test_total_return_pct': grouped[f"{horizon}_total_return_pct"].sum(),
+        'top_params': grouped.apply(lambda g: (g['strategy'] + ':' + g['params']).mode().iloc[0],
+                                    include_groups=False),
+    })
+    return summary.sort_values('test_score', ascending=False)
+
+
+def main(argv):
+    """Komut satırı: defterdeki mumlarla walk-forward çalıştır"""
+    import ledger
+
+    options = {'--processes': None, '--train': TRAIN_BARS, '--test': TEST_BARS, '--out': None}
+    symbols = []
+    args = iter(argv)
+    for arg in args:
+        if arg in options:
+            options[arg] = next(args)
+        else:
+            symbols.append(arg.upper())
+
+    conn = ledger.open_ledger()
+    symbols = symbols or ledger.bar_symbols(conn)
+    if not symbols:
+        print("Defterde mum bulunamadı. Önce: python ledger.py refresh SEMBOLLER")
+        return
+    frames = {s: ledger.load_bars(conn, s) for s in symbols}
+    conn.close()
+
+    processes = int(options['--processes']) if options['--processes'] else None
+    report = walk_forward(frames, train_bars=int(options['--train']), test_bars=int(options['--test']),
+                          processes=processes)
+    if len(report) == 0:
+        print("Yeterli veri yok: eğitim + test penceresinden uzun geçmiş gerekli.")
+        return
+    if options['--out']:
+        report.to_csv(options['--out'], index=False)
+        print(f"Fold raporu yazıldı: {options['--out']}")
+    print(summarize_walkforward(report).round(3).to_string())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])